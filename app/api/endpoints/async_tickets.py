@@ -1,7 +1,7 @@
 from typing import List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status as http_status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status as http_status, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, and_, desc
 from sqlalchemy.exc import SQLAlchemyError
@@ -10,10 +10,12 @@ from app.core.security import get_current_active_user
 from app.core.dependencies import get_current_agent_or_admin
 from app.core.logging import get_logger
 from app.db.async_database import get_async_db
+from app.db.load_plans import TICKET_LIST, TICKET_DETAIL
 from app.models.models import Ticket, User, UserRole, TicketStatus, TicketMessage
 from app.schemas.schemas import Ticket as TicketSchema
 from app.schemas.schemas import TicketCreate, TicketUpdate, TicketCloseWithMessage, TicketMessage as TicketMessageSchema
-from app.core.cache import global_cache
+from app.core.cache_tags import publish_ticket_change, ticket_list_etag
+from app.core.http_cache import not_modified_response
 
 router = APIRouter()
 logger = get_logger("api.async_tickets")
@@ -22,7 +24,6 @@ logger = get_logger("api.async_tickets")
 @router.post("/async", response_model=TicketSchema, status_code=http_status.HTTP_201_CREATED)
 async def create_ticket_async(
     ticket: TicketCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -46,8 +47,8 @@ async def create_ticket_async(
         await db.commit()
         await db.refresh(db_ticket)
         
-        # Инвалидируем кэш списка заявок
-        background_tasks.add_task(global_cache.invalidate_by_prefix, "tickets:")
+        # Инвалидируем кэш списка заявок и статистики
+        publish_ticket_change(db_ticket.id, db_ticket.creator_id, db_ticket.assigned_to_id)
         
         logger.info(f"Async ticket created: ID={db_ticket.id}, by user_id={current_user.id}")
         return db_ticket
@@ -62,6 +63,8 @@ async def create_ticket_async(
 
 @router.get("/async", response_model=List[TicketSchema])
 async def read_tickets_async(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = Query(None, description="Фильтр по статусу заявки"),
@@ -71,11 +74,16 @@ async def read_tickets_async(
     """
     Асинхронное получение списка заявок с пагинацией и фильтрацией
     """
+    # Версия списка известна без запроса к БД: если клиент уже получил ее, отвечаем 304
+    not_modified = not_modified_response(request, response, ticket_list_etag(current_user, skip, limit, status))
+    if not_modified is not None:
+        return not_modified
+    
     try:
         logger.debug(f"User {current_user.username} requested tickets list (async)")
         
-        # Строим запрос с учетом join для связанных данных
-        query = select(Ticket)
+        # Строим запрос, связанные данные загружаются согласно плану
+        query = TICKET_LIST.apply(select(Ticket))
         
         # Применяем фильтры
         if status:
@@ -118,7 +126,7 @@ async def read_ticket_async(
     """
     try:
         # Составляем запрос на получение заявки
-        query = select(Ticket).where(Ticket.id == ticket_id)
+        query = TICKET_DETAIL.apply(select(Ticket)).where(Ticket.id == ticket_id)
         result = await db.execute(query)
         ticket = result.scalars().first()
         
@@ -153,7 +161,6 @@ async def read_ticket_async(
 async def update_ticket_async(
     ticket_id: int,
     ticket_update: TicketUpdate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -162,7 +169,7 @@ async def update_ticket_async(
     """
     try:
         # Получаем заявку
-        query = select(Ticket).where(Ticket.id == ticket_id)
+        query = TICKET_DETAIL.apply(select(Ticket)).where(Ticket.id == ticket_id)
         result = await db.execute(query)
         db_ticket = result.scalars().first()
         
@@ -194,8 +201,8 @@ async def update_ticket_async(
             await db.execute(update_stmt)
             await db.commit()
             
-            # Инвалидируем кэш
-            background_tasks.add_task(global_cache.invalidate_by_prefix, f"tickets:{ticket_id}")
+            # Инвалидируем кэш заявки, списка заявок и статистики
+            publish_ticket_change(ticket_id, db_ticket.creator_id, db_ticket.assigned_to_id, ticket_data.get("assigned_to_id"))
             
             # Получаем обновленную заявку
             result = await db.execute(query)
@@ -4,12 +4,12 @@ from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, and_, func
-from sqlalchemy.orm import selectinload
 from fastapi.encoders import jsonable_encoder
 import json
 from fastapi.responses import JSONResponse
 
 from app.db.async_database import get_async_db
+from app.db.load_plans import AUDIT_LOG_LIST
 from app.models.models import AuditLog, User, UserRole
 from app.core.security import get_current_admin
 from app.core.dependencies import get_current_active_user
@@ -55,7 +55,7 @@ async def get_audit_logs(
                   f"from_date={from_date}, to_date={to_date}")
         
         # Начинаем строить запрос
-        query = select(AuditLog).options(selectinload(AuditLog.user))
+        query = AUDIT_LOG_LIST.apply(select(AuditLog))
         
         # Добавляем фильтры, если они указаны
         filters = []
@@ -212,7 +212,7 @@ async def broadcast_audit_log_update(
     Отправка обновления аудит-лога через WebSocket
     """
     # Получаем данные аудит-лога
-    query = select(AuditLog).options(selectinload(AuditLog.user)).where(AuditLog.id == audit_log_id)
+    query = AUDIT_LOG_LIST.apply(select(AuditLog)).where(AuditLog.id == audit_log_id)
     result = await db.execute(query)
     audit_log = result.scalars().first()
     
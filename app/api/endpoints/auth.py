@@ -1,14 +1,26 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, UTC
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.config import settings
-from app.core.security import verify_password, create_access_token, get_current_active_user
+from app.core.security import (
+    verify_password_async,
+    create_access_token,
+    create_refresh_token_async,
+    rotate_refresh_token_async,
+    revoke_refresh_token_async,
+    revoke_user_refresh_tokens_async,
+    decode_access_token,
+    get_current_active_user,
+    oauth2_scheme,
+)
+from app.core.token_revocation import token_revocation_list
 from app.db.async_database import get_async_db
 from app.models.models import User
-from app.schemas.schemas import Token
+from app.schemas.schemas import Token, RefreshTokenRequest, LogoutRequest
 from app.core.logging import log_user_action_async
 
 router = APIRouter()
@@ -21,7 +33,7 @@ async def authenticate_user_async(db: AsyncSession, username: str, password: str
     
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -55,15 +67,54 @@ async def login_for_access_token(
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = await create_refresh_token_async(db, user.id)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(
+    data: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Выдает новый токен доступа по refresh-токену без проверки пароля.
+    Refresh-токен одноразовый: в ответе возвращается новый.
+    """
+    user, refresh_token = await rotate_refresh_token_async(db, data.refresh_token)
+    
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
 
 @router.post("/logout")
 async def logout(
     request: Request,
+    data: Optional[LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    """
+    Завершает сессию: отзывает текущий токен доступа и цепочку переданного refresh-токена.
+    При all_sessions (или если refresh-токен не передан) отзываются все refresh-токены
+    пользователя, то есть сессии на всех устройствах.
+    """
+    # Отзываем текущий токен доступа до истечения его срока
+    payload = decode_access_token(token)
+    if payload.get("jti") and payload.get("exp"):
+        expires_at = datetime.fromtimestamp(payload["exp"], UTC).replace(tzinfo=None)
+        await token_revocation_list.revoke(db, payload["jti"], expires_at)
+    
+    # Отзываем refresh-токены, иначе по ним можно получить новый токен доступа.
+    # Без переданного refresh-токена (или если он не найден) завершаются все сессии пользователя
+    if data is None or data.all_sessions or not data.refresh_token or not await revoke_refresh_token_async(
+        db, data.refresh_token, current_user.id
+    ):
+        await revoke_user_refresh_tokens_async(db, current_user.id)
+    
     # Логируем выход пользователя из системы
     await log_user_action_async(
         db=db,
@@ -9,6 +9,8 @@ from pydantic import BaseModel
 from app.core.security import get_current_active_user
 from app.core.dependencies import get_current_admin
 from app.core.logging import get_logger
+from app.core.cache import cache_result
+from app.core.cache_tags import TAG_CATEGORIES, publish_category_change
 from app.db.async_database import get_async_db
 from app.models.models import TicketCategory, User, Ticket
 from app.schemas.schemas import TicketCategory as TicketCategorySchema
@@ -29,21 +31,9 @@ router = APIRouter()
 logger = get_logger("api.categories")
 
 
-@router.get("/", response_model=List[TicketCategorySchema])
-async def read_categories(
-    skip: int = 0,
-    limit: int = 100,
-    show_all: bool = False,
-    db: AsyncSession = Depends(get_async_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """
-    Получение списка категорий заявок.
-    Данные кэшируются на стороне клиента на 1 час.
-    Параметр show_all=True вернет все категории, включая неактивные.
-    """
-    logger.debug(f"Getting categories list, show_all={show_all}")
-    
+@cache_result(prefix="categories", ttl=300, key_params=("skip", "limit", "show_all"), tags=(TAG_CATEGORIES,), local=True)
+async def _list_categories(db: AsyncSession, skip: int, limit: int, show_all: bool) -> List[dict]:
+    """Загружает список категорий (справочник кэшируется в памяти каждого воркера)"""
     # Используем SQLAlchemy select и асинхронное выполнение
     if show_all:
         query = select(TicketCategory).offset(skip).limit(limit)
@@ -69,6 +59,25 @@ async def read_categories(
             "created_at": created_at,
             "updated_at": updated_at
         })
+    return data
+
+
+@router.get("/", response_model=List[TicketCategorySchema])
+async def read_categories(
+    skip: int = 0,
+    limit: int = 100,
+    show_all: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Получение списка категорий заявок.
+    Данные кэшируются на стороне клиента на 1 час.
+    Параметр show_all=True вернет все категории, включая неактивные.
+    """
+    logger.debug(f"Getting categories list, show_all={show_all}")
+    
+    data = await _list_categories(db, skip, limit, show_all)
     
     # Создаем JSON ответ
     response = JSONResponse(content=data)
@@ -155,6 +164,7 @@ async def create_category(
     db.add(category)
     await db.commit()
     await db.refresh(category)
+    publish_category_change(category.id)
     
     logger.info(f"Category created: {category_data.name} (ID: {category.id})")
     return category
@@ -203,6 +213,7 @@ async def update_category(
     
     await db.commit()
     await db.refresh(category)
+    publish_category_change(category.id)
     
     logger.info(f"Category updated: {category.name} (ID: {category.id})")
     return category
@@ -246,6 +257,8 @@ async def delete_category(
             await db.delete(category)
             await db.commit()
         
+        publish_category_change(category_id)
+        
         # Возвращаем 204 No Content
         logger.info(f"Category operation completed: {category.name} (ID: {category.id})")
         return Response(status_code=status.HTTP_204_NO_CONTENT)
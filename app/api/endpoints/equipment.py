@@ -8,12 +8,16 @@ from app.db.database import get_db
 from app.models.models import Equipment, User, UserRole, Maintenance, EquipmentStatus, TicketCategory
 from app.core.security import get_current_active_user
 from app.core.dependencies import get_current_agent_or_admin
+from app.core.cache import cache_result
+from app.core.cache_tags import TAG_EQUIPMENT, publish_equipment_change
+from app.core.bulkhead import bulkheads
 from app.schemas.schemas import Equipment as EquipmentSchema
 from app.schemas.schemas import EquipmentCreate, EquipmentUpdate
 from app.schemas.schemas import Maintenance as MaintenanceSchema
 from app.schemas.schemas import MaintenanceCreate
 
-router = APIRouter()
+# Синхронные обработчики выполняются в отдельном bulkhead и не занимают общий пул потоков
+router = APIRouter(route_class=bulkheads["equipment"].route_class())
 
 
 @router.get("/", response_model=List[EquipmentSchema])
@@ -76,6 +80,7 @@ def get_equipment_list(
 
 
 @router.get("/categories", response_model=List[str], status_code=status.HTTP_200_OK)
+@cache_result(prefix="equipment", ttl=300, key_params=(), tags=(TAG_EQUIPMENT,), local=True)
 def get_equipment_categories(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -97,6 +102,7 @@ def get_equipment_categories(
 
 
 @router.get("/locations", response_model=List[str], status_code=status.HTTP_200_OK)
+@cache_result(prefix="equipment", ttl=300, key_params=(), tags=(TAG_EQUIPMENT,), local=True)
 def get_equipment_locations(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -167,6 +173,7 @@ def create_equipment(
     db.add(db_equipment)
     db.commit()
     db.refresh(db_equipment)
+    publish_equipment_change(db_equipment.id)
     return db_equipment
 
 
@@ -206,6 +213,7 @@ def update_equipment(
     
     db.commit()
     db.refresh(db_equipment)
+    publish_equipment_change(db_equipment.id)
     return db_equipment
 
 
@@ -231,6 +239,7 @@ def delete_equipment(
     
     db.delete(db_equipment)
     db.commit()
+    publish_equipment_change(equipment_id)
     return None
 
 
@@ -307,6 +316,7 @@ def add_maintenance_record(
     db.add(new_maintenance)
     db.commit()
     db.refresh(new_maintenance)
+    publish_equipment_change(equipment_id)
     
     # Создаем словарь с нужными полями для ответа
     result = {
@@ -5,7 +5,16 @@ from sqlalchemy import text
 from app.core.resource_monitor import get_system_stats, resource_monitor
 from app.core.dependencies import get_current_admin
 from app.models.models import User
-from app.core.cache import cache_result
+from app.core.cache import cache_result, global_cache, local_cache, result_single_flight, stale_refresher
+from app.core.principal_cache import principal_cache
+from app.core.token_cache import verified_token_cache
+from app.core.token_revocation import token_revocation_list
+from app.core.password_pool import password_hashing_pool
+from app.core.invalidation_bus import invalidation_bus
+from app.core.compression import precompressed_cache
+from app.core.response_cache import response_cache
+from app.core.admission import admission_controller
+from app.core.bulkhead import bulkheads
 from app.core.logging import get_logger
 from app.db.database import get_db
 
@@ -14,7 +23,7 @@ logger = get_logger("api.monitoring")
 
 
 @router.get("/system", response_model=Dict[str, Any])
-@cache_result(prefix="monitor", ttl=60)  # Кэшируем на 1 минуту
+@cache_result(prefix="monitor", ttl=60, key_params=())  # Кэшируем на 1 минуту
 def get_system_metrics(
     current_user: User = Depends(get_current_admin)
 ):
@@ -84,6 +93,107 @@ def get_database_metrics(
         }
 
 
+@router.get("/principal-cache", response_model=Dict[str, Any])
+def get_principal_cache_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение счетчиков кэша аутентифицированных пользователей (только для администраторов)
+    """
+    return principal_cache.get_stats()
+
+
+@router.get("/token-cache", response_model=Dict[str, Any])
+def get_token_cache_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение размера и доли попаданий кэша проверенных токенов (только для администраторов)
+    """
+    return verified_token_cache.get_stats()
+
+
+@router.get("/token-revocation", response_model=Dict[str, Any])
+def get_token_revocation_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение счетчиков фильтра отозванных токенов (только для администраторов)
+    """
+    return token_revocation_list.get_stats()
+
+
+@router.get("/password-hashing", response_model=Dict[str, Any])
+def get_password_hashing_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение глубины очереди и задержек пула хеширования паролей (только для администраторов)
+    """
+    return password_hashing_pool.get_stats()
+
+
+@router.get("/cache", response_model=Dict[str, Any])
+def get_cache_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение счетчиков серверного кэша и кэша готовых ответов по префиксам ключей:
+    попадания, промахи, вытеснения, истечения, количество и объем записей,
+    сэкономленное время вычислений (только для администраторов)
+    """
+    return {
+        "global": {**global_cache.get_stats(), "prefixes": global_cache.get_prefix_stats()},
+        "local": {**local_cache.get_stats(), "prefixes": local_cache.get_prefix_stats()},
+        "responses": {**response_cache.get_stats(), "prefixes": response_cache.get_prefix_stats()},
+        "single_flight": result_single_flight.get_stats(),
+        "stale_refresh": stale_refresher.get_stats(),
+    }
+
+
+@router.get("/invalidation-bus", response_model=Dict[str, Any])
+def get_invalidation_bus_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение задержки доставки и счетчиков потерянных сообщений шины инвалидации кэша (только для администраторов)
+    """
+    return invalidation_bus.get_stats()
+
+
+@router.get("/compression", response_model=Dict[str, Any])
+def get_compression_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение размера и доли попаданий кэша сжатых ответов и доступных кодировок (только для администраторов)
+    """
+    return precompressed_cache.get_stats()
+
+
+@router.get("/admission", response_model=Dict[str, Any])
+def get_admission_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение загрузки, глубины очередей, задержек ожидания и количества отклоненных
+    запросов по классам маршрутов (только для администраторов)
+    """
+    if admission_controller is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission_controller.get_stats()}
+
+
+@router.get("/bulkheads", response_model=Dict[str, Any])
+def get_bulkhead_metrics(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Получение загрузки, очереди и времени ожидания потоков в bulkhead-ах роутеров (только для администраторов)
+    """
+    return {name: bulkhead.get_stats() for name, bulkhead in bulkheads.items()}
+
+
 @router.get("/health", status_code=status.HTTP_200_OK)
 def health_check():
     """
@@ -9,6 +9,7 @@ from app.models.models import Ticket, User, UserRole, TicketStatus
 from app.core.security import get_current_active_user
 from app.core.dependencies import get_current_admin
 from app.core.cache import cache_result
+from app.core.cache_tags import TAG_STATS
 from app.core.logging import get_logger
 
 router = APIRouter()
@@ -16,7 +17,7 @@ logger = get_logger("api.statistics")
 
 
 @router.get("/tickets-summary", response_model=Dict[str, Any])
-@cache_result(prefix="stats", ttl=600)  # Кэшируем на 10 минут
+@cache_result(prefix="stats", ttl=600, key_params=(), tags=(TAG_STATS,), stale_ttl=300)  # Кэшируем на 10 минут, общий результат для всех администраторов
 async def get_tickets_summary(
     db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
@@ -67,7 +68,7 @@ async def get_tickets_summary(
 
 
 @router.get("/agent-performance", response_model=List[Dict[str, Any]])
-@cache_result(prefix="stats", ttl=1800)  # Кэшируем на 30 минут
+@cache_result(prefix="stats", ttl=1800, key_params=("days",), tags=(TAG_STATS,), stale_ttl=300)  # Кэшируем на 30 минут
 async def get_agent_performance(
     days: int = 30,
     db: AsyncSession = Depends(get_async_db),
@@ -125,7 +126,7 @@ async def get_agent_performance(
 
 
 @router.get("/tickets-by-period", response_model=Dict[str, Any])
-@cache_result(prefix="stats", ttl=900)  # Кэшируем на 15 минут
+@cache_result(prefix="stats", ttl=900, key_params=("period",), tags=(TAG_STATS,), stale_ttl=300)  # Кэшируем на 15 минут
 async def get_tickets_by_period(
     period: str = "month",  # day, week, month, year
     db: AsyncSession = Depends(get_async_db),
@@ -180,7 +181,7 @@ async def get_tickets_by_period(
 
 
 @router.get("/user-activity", response_model=Dict[str, List[Dict[str, Any]]])
-@cache_result(prefix="stats", ttl=1200)  # Кэшируем на 20 минут
+@cache_result(prefix="stats", ttl=1200, key_params=("top",), tags=(TAG_STATS,), stale_ttl=300)  # Кэшируем на 20 минут
 async def get_user_activity(
     top: int = 10,
     db: AsyncSession = Depends(get_async_db),
@@ -2,7 +2,7 @@ from typing import List, Optional
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status as http_status, Query, Response, Request
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
@@ -10,13 +10,18 @@ from fastapi.responses import JSONResponse
 from app.core.security import get_current_active_user
 from app.core.dependencies import get_current_agent_or_admin
 from app.core.logging import get_logger, log_user_action
+from app.core.cache_tags import publish_ticket_change, ticket_list_etag
+from app.core.http_cache import not_modified_response
+from app.core.bulkhead import bulkheads
 from app.db.database import get_db
+from app.db.load_plans import TICKET_LIST, TICKET_DETAIL
 from app.models.models import Ticket, User, UserRole, TicketStatus, TicketMessage, TicketCategory
 from app.schemas.schemas import Ticket as TicketSchema
 from app.schemas.schemas import TicketCreate, TicketUpdate, TicketCloseWithMessage, TicketMessage as TicketMessageSchema
 from app.schemas.schemas import TicketCategory as TicketCategorySchema
 
-router = APIRouter()
+# Синхронные обработчики выполняются в отдельном bulkhead и не занимают общий пул потоков
+router = APIRouter(route_class=bulkheads["tickets"].route_class())
 logger = get_logger("api.tickets")
 
 
@@ -41,6 +46,7 @@ def create_ticket(
         db.add(db_ticket)
         db.commit()
         db.refresh(db_ticket)
+        publish_ticket_change(db_ticket.id, db_ticket.creator_id, db_ticket.assigned_to_id)
         
         # Логируем создание заявки
         log_user_action(
@@ -75,22 +81,25 @@ def create_ticket(
 # Получение списка заявок
 @router.get("/", response_model=List[TicketSchema])
 def read_tickets(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = Query(None, description="Фильтр по статусу заявки"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    # Версия списка известна без запроса к БД: если клиент уже получил ее, отвечаем 304
+    not_modified = not_modified_response(request, response, ticket_list_etag(current_user, skip, limit, status))
+    if not_modified is not None:
+        return not_modified
+    
     try:
         logger.debug(f"User {current_user.username} (role: {current_user.role}) requested tickets list")
         logger.debug(f"Query parameters - skip: {skip}, limit: {limit}, status: {status}")
         
-        # Строим запрос к БД с предварительной загрузкой связанных данных
-        query = db.query(Ticket).options(
-            joinedload(Ticket.creator),
-            joinedload(Ticket.assigned_to),
-            joinedload(Ticket.category)
-        )
+        # Строим запрос к БД, связанные данные загружаются согласно плану
+        query = TICKET_LIST.apply(db.query(Ticket))
         
         # Фильтрация по статусу, если указан
         if status:
@@ -130,12 +139,8 @@ def read_ticket(
     current_user: User = Depends(get_current_active_user)
 ):
     try:
-        # Получаем заявку с предварительной загрузкой связанных данных
-        ticket = db.query(Ticket).options(
-            joinedload(Ticket.creator),
-            joinedload(Ticket.assigned_to),
-            joinedload(Ticket.category)
-        ).filter(Ticket.id == ticket_id).first()
+        # Получаем заявку, связанные данные загружаются согласно плану
+        ticket = TICKET_DETAIL.apply(db.query(Ticket)).filter(Ticket.id == ticket_id).first()
         
         if not ticket:
             logger.warning(f"Ticket with ID {ticket_id} not found")
@@ -178,6 +183,7 @@ def update_ticket(
     db_ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
     if not db_ticket:
         raise HTTPException(status_code=404, detail="Заявка не найдена")
+    previous_assignee_id = db_ticket.assigned_to_id
     
     # Проверка прав на обновление заявки
     if current_user.role == UserRole.USER:
@@ -207,6 +213,7 @@ def update_ticket(
     
     db.commit()
     db.refresh(db_ticket)
+    publish_ticket_change(ticket_id, db_ticket.creator_id, previous_assignee_id, db_ticket.assigned_to_id)
     return db_ticket
 
 
@@ -229,12 +236,14 @@ def assign_ticket(
         raise HTTPException(status_code=404, detail="Агент не найден")
     
     # Назначаем заявку
+    previous_assignee_id = db_ticket.assigned_to_id
     db_ticket.assigned_to_id = agent_id
     if db_ticket.status == TicketStatus.NEW:
         db_ticket.status = TicketStatus.IN_PROGRESS
     
     db.commit()
     db.refresh(db_ticket)
+    publish_ticket_change(ticket_id, db_ticket.creator_id, previous_assignee_id, agent_id)
     return db_ticket
 
 
@@ -276,6 +285,7 @@ def update_ticket_status(
     
     db.commit()
     db.refresh(db_ticket)
+    publish_ticket_change(ticket_id, db_ticket.creator_id, db_ticket.assigned_to_id)
     return db_ticket
 
 
@@ -330,6 +340,7 @@ def assign_ticket_to_current_agent(
     
     db.commit()
     db.refresh(db_ticket)
+    publish_ticket_change(ticket_id, db_ticket.creator_id, old_assigned_to_id, current_user.id)
     return db_ticket
 
 
@@ -376,6 +387,7 @@ def close_ticket(
     
     db.commit()
     db.refresh(db_ticket)
+    publish_ticket_change(ticket_id, db_ticket.creator_id, db_ticket.assigned_to_id)
     return db_ticket
 
 
@@ -413,6 +425,7 @@ def close_ticket_with_message(
     
     db.commit()
     db.refresh(db_ticket)
+    publish_ticket_change(ticket_id, db_ticket.creator_id, db_ticket.assigned_to_id)
     return db_ticket
 
 
@@ -506,6 +519,9 @@ def delete_ticket(
     if not db_ticket:
         raise HTTPException(status_code=404, detail="Заявка не найдена")
     
+    # После удаления атрибуты заявки недоступны, запоминаем их для инвалидации
+    creator_id, assignee_id = db_ticket.creator_id, db_ticket.assigned_to_id
+    
     # Проверка прав на удаление заявки
     if current_user.role == UserRole.ADMIN:
         # Админ может удалить любую заявку полностью
@@ -522,4 +538,5 @@ def delete_ticket(
         )
     
     db.commit()
+    publish_ticket_change(ticket_id, creator_id, assignee_id)
     return None 
\ No newline at end of file
@@ -4,10 +4,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
 from pydantic import BaseModel
 
-from app.core.security import get_password_hash, get_current_active_user, verify_password
+from app.core.security import (
+    get_password_hash_async,
+    get_current_active_user,
+    verify_password_async,
+    revoke_user_refresh_tokens_async,
+)
 from app.core.dependencies import get_current_admin
+from app.core.cache_tags import publish_user_change, publish_password_change
 from app.db.async_database import get_async_db
-from app.models.models import User, UserRole
+from app.db.load_plans import USER_LIST
+from app.models.models import User, UserRole, RefreshToken
 from app.schemas.schemas import User as UserSchema
 from app.schemas.schemas import UserCreate, UserUpdate, UserMe
 
@@ -50,7 +57,7 @@ async def create_user(
         )
     
     # Создаем нового пользователя
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -61,6 +68,7 @@ async def create_user(
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    publish_user_change(db_user.id)
     return db_user
 
 
@@ -72,7 +80,7 @@ async def read_users(
     db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)
 ):
-    query = select(User).offset(skip).limit(limit)
+    query = USER_LIST.apply(select(User)).offset(skip).limit(limit)
     result = await db.execute(query)
     users = result.scalars().all()
     return users
@@ -107,8 +115,13 @@ async def change_password(
     Эндпоинт для смены пароля текущего пользователя
     Пользователь должен предоставить текущий пароль для подтверждения
     """
+    # Хеш пароля не хранится в кэше пользователей, поэтому получаем его из БД
+    query = select(User.hashed_password).where(User.id == current_user.id)
+    result = await db.execute(query)
+    current_hashed_password = result.scalar_one_or_none()
+    
     # Проверяем, что текущий пароль верный
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if current_hashed_password is None or not await verify_password_async(password_data.current_password, current_hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Неверный текущий пароль"
@@ -122,12 +135,16 @@ async def change_password(
         )
     
     # Хешируем и сохраняем новый пароль
-    hashed_password = get_password_hash(password_data.new_password)
+    hashed_password = await get_password_hash_async(password_data.new_password)
     
     # Используем update вместо прямого изменения объекта
     query = update(User).where(User.id == current_user.id).values(hashed_password=hashed_password)
     await db.execute(query)
     await db.commit()
+    publish_password_change(current_user.id)
+    
+    # После смены пароля ранее выданные refresh-токены больше не действуют
+    await revoke_user_refresh_tokens_async(db, current_user.id)
     
     return {"message": "Пароль успешно изменен"}
 
@@ -191,12 +208,17 @@ async def update_user(
     
     # Если передан пароль, хешируем его
     if "password" in user_data:
-        user_data["hashed_password"] = get_password_hash(user_data.pop("password"))
+        user_data["hashed_password"] = await get_password_hash_async(user_data.pop("password"))
     
     # Выполняем обновление
     query = update(User).where(User.id == user_id).values(**user_data)
     await db.execute(query)
     await db.commit()
+    publish_user_change(user_id)
+    
+    # При смене пароля или деактивации отзываем refresh-токены пользователя
+    if "hashed_password" in user_data or user_data.get("is_active") is False:
+        await revoke_user_refresh_tokens_async(db, user_id)
     
     # Получаем обновленного пользователя
     query = select(User).filter(User.id == user_id)
@@ -228,9 +250,11 @@ async def deactivate_user(
             detail="Нельзя удалить собственный аккаунт"
         )
     
-    # Удаляем пользователя
+    # Удаляем refresh-токены и самого пользователя
+    await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
     query = delete(User).where(User.id == user_id)
     await db.execute(query)
     await db.commit()
+    publish_user_change(user_id)
     
     return None 
\ No newline at end of file
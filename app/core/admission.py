@@ -0,0 +1,304 @@
+import asyncio
+import math
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("admission")
+
+# Классы маршрутов в порядке убывания приоритета
+CLASS_CRITICAL = "critical"
+CLASS_NORMAL = "normal"
+CLASS_LOW = "low"
+
+# Методы, которые изменяют данные
+_WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class _RouteClass:
+    """Очередь ожидания и счетчики одного класса маршрутов"""
+
+    def __init__(self, name: str, max_in_flight: int, max_wait: float, shed_on_overload: bool):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.shed_on_overload = shed_on_overload
+        self.in_flight = 0
+        # (future, время постановки в очередь); результат future - допущен ли запрос
+        self.waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+
+class AdmissionController:
+    """
+    Контроль допуска запросов к обработчикам, работающим с БД.
+
+    Одновременно выполняется не больше max_concurrency запросов (по умолчанию
+    столько, сколько соединений может выдать пул), остальные ждут в очередях
+    своего класса; освободившееся место получает запрос самого приоритетного
+    класса. Запросы низкого приоритета (отчеты, журнал аудита) занимают
+    не больше low_priority_limit мест.
+
+    Перегрузка определяется как в CoDel: если за интервал interval ни один
+    запрос не был допущен быстрее target_delay, очередь считается постоянной.
+    Пока она держится, запросы низкого приоритета отклоняются сразу (вместе
+    с уже ожидающими), а не копятся до истечения тайм-аута пула соединений.
+    Остальные запросы ждут не дольше max_wait.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        low_priority_limit: int,
+        target_delay: float = 0.05,
+        interval: float = 0.5,
+        max_wait: float = 10.0,
+        low_priority_max_wait: float = 1.0
+    ):
+        """
+        Args:
+            max_concurrency: Максимальное количество одновременно выполняемых запросов
+            low_priority_limit: Сколько из них могут занимать запросы низкого приоритета
+            target_delay: Допустимая задержка в очереди в секундах
+            interval: Интервал, за который оценивается задержка, в секундах
+            max_wait: Максимальное время ожидания в очереди для обычных и важных запросов
+            low_priority_max_wait: Максимальное время ожидания для запросов низкого приоритета
+        """
+        self.max_concurrency = max_concurrency
+        self.target_delay = target_delay
+        self.interval = interval
+        self.classes: Dict[str, _RouteClass] = {
+            CLASS_CRITICAL: _RouteClass(CLASS_CRITICAL, max_concurrency, max_wait, shed_on_overload=False),
+            CLASS_NORMAL: _RouteClass(CLASS_NORMAL, max_concurrency, max_wait, shed_on_overload=False),
+            CLASS_LOW: _RouteClass(CLASS_LOW, max(1, min(low_priority_limit, max_concurrency)),
+                                   low_priority_max_wait, shed_on_overload=True),
+        }
+        self.in_flight = 0
+        self.overloaded = False
+        self.overload_periods = 0
+        self._interval_start = time.monotonic()
+        self._interval_min_delay = math.inf
+        self._lock = Lock()
+
+    def _can_admit(self, route_class: _RouteClass) -> bool:
+        return self.in_flight < self.max_concurrency and route_class.in_flight < route_class.max_in_flight
+
+    def _admit(self, route_class: _RouteClass, wait_time: float) -> None:
+        self.in_flight += 1
+        route_class.in_flight += 1
+        route_class.admitted += 1
+        route_class.total_wait_time += wait_time
+        route_class.max_wait_time = max(route_class.max_wait_time, wait_time)
+        self._interval_min_delay = min(self._interval_min_delay, wait_time)
+
+    def _update_state(self, now: float) -> None:
+        """Завершает интервал измерения и обновляет признак перегрузки (под блокировкой)"""
+        if now - self._interval_start < self.interval:
+            return
+        if self._interval_min_delay == math.inf:
+            # Никто не был допущен за интервал: перегрузка, если кто-то ждет дольше target_delay
+            overloaded = any(
+                waiters and now - waiters[0][1] > self.target_delay
+                for waiters in (c.waiters for c in self.classes.values())
+            )
+        else:
+            overloaded = self._interval_min_delay > self.target_delay
+        if overloaded and not self.overloaded:
+            self.overload_periods += 1
+            logger.warning(f"Admission queue delay above {self.target_delay * 1000:.0f} ms, shedding low-priority requests")
+        self.overloaded = overloaded
+        self._interval_start = now
+        self._interval_min_delay = math.inf
+        if overloaded:
+            for route_class in self.classes.values():
+                if route_class.shed_on_overload:
+                    while route_class.waiters:
+                        future, _ = route_class.waiters.popleft()
+                        if not future.done():
+                            route_class.shed += 1
+                            future.set_result(False)
+
+    def _dispatch(self, now: float) -> None:
+        """Передает освободившиеся места ожидающим запросам по приоритету (под блокировкой)"""
+        for route_class in self.classes.values():
+            waiters = route_class.waiters
+            while waiters and self._can_admit(route_class):
+                future, enqueued_at = waiters.popleft()
+                if future.done():
+                    continue
+                self._admit(route_class, now - enqueued_at)
+                future.set_result(True)
+            if self.in_flight >= self.max_concurrency:
+                return
+
+    async def acquire(self, class_name: str) -> bool:
+        """
+        Ожидает места для запроса
+
+        Args:
+            class_name: Класс маршрута (CLASS_CRITICAL, CLASS_NORMAL или CLASS_LOW)
+
+        Returns:
+            True, если запрос допущен (после выполнения нужно вызвать release),
+            False, если его нужно отклонить
+        """
+        route_class = self.classes[class_name]
+        now = time.monotonic()
+        with self._lock:
+            self._update_state(now)
+            if route_class.shed_on_overload and self.overloaded:
+                route_class.shed += 1
+                return False
+            if not route_class.waiters and self._can_admit(route_class):
+                self._admit(route_class, 0.0)
+                return True
+            future = asyncio.get_running_loop().create_future()
+            route_class.waiters.append((future, now))
+
+        try:
+            return await asyncio.wait_for(future, route_class.max_wait)
+        except BaseException as e:
+            with self._lock:
+                if future.done() and not future.cancelled():
+                    # Место уже было выделено, но запрос отменен: возвращаем его
+                    if future.result():
+                        self._release(route_class)
+                elif isinstance(e, asyncio.TimeoutError):
+                    route_class.timed_out += 1
+            if isinstance(e, asyncio.TimeoutError):
+                return False
+            raise
+
+    def _release(self, route_class: _RouteClass) -> None:
+        self.in_flight -= 1
+        route_class.in_flight -= 1
+        now = time.monotonic()
+        self._update_state(now)
+        self._dispatch(now)
+
+    def release(self, class_name: str) -> None:
+        """Освобождает место после выполнения запроса"""
+        with self._lock:
+            self._release(self.classes[class_name])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает загрузку, глубину очередей и задержки ожидания по классам маршрутов"""
+        with self._lock:
+            classes = {}
+            for name, route_class in self.classes.items():
+                admitted = route_class.admitted
+                classes[name] = {
+                    "max_in_flight": route_class.max_in_flight,
+                    "in_flight": route_class.in_flight,
+                    "queue_depth": sum(1 for future, _ in route_class.waiters if not future.done()),
+                    "admitted": admitted,
+                    "shed": route_class.shed,
+                    "timed_out": route_class.timed_out,
+                    "avg_wait_ms": route_class.total_wait_time / admitted * 1000 if admitted else 0.0,
+                    "max_wait_ms": route_class.max_wait_time * 1000,
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "target_delay_ms": self.target_delay * 1000,
+                "overloaded": self.overloaded,
+                "overload_periods": self.overload_periods,
+                "classes": classes,
+            }
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware контроля допуска запросов к API.
+
+    Определяет класс маршрута по методу и префиксу пути: изменения по префиксам
+    critical_paths (создание заявок, смена статуса, назначение) - важные,
+    запросы по префиксам low_priority_paths - низкоприоритетные, остальные - обычные.
+    Отклоненный запрос получает 503 с заголовком Retry-After.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: Optional[AdmissionController] = None,
+        include_paths: Tuple[str, ...] = ("/api/",),
+        exclude_paths: Tuple[str, ...] = (),
+        critical_paths: Tuple[str, ...] = (),
+        low_priority_paths: Tuple[str, ...] = (),
+        retry_after: int = 5
+    ):
+        """
+        Args:
+            app: ASGI приложение
+            controller: Контроллер допуска (по умолчанию глобальный admission_controller)
+            include_paths: Префиксы путей, к которым применяется контроль
+            exclude_paths: Префиксы путей, которые пропускаются без контроля
+            critical_paths: Префиксы путей, изменения по которым имеют высший приоритет
+            low_priority_paths: Префиксы путей с низким приоритетом
+            retry_after: Значение заголовка Retry-After в секундах
+        """
+        self.app = app
+        self.controller = controller if controller is not None else admission_controller
+        self.include_paths = tuple(include_paths)
+        self.exclude_paths = tuple(exclude_paths)
+        self.critical_paths = tuple(critical_paths)
+        self.low_priority_paths = tuple(low_priority_paths)
+        self._retry_after = str(retry_after)
+
+    def _classify(self, method: str, path: str) -> str:
+        if path.startswith(self.low_priority_paths):
+            return CLASS_LOW
+        if method in _WRITE_METHODS and path.startswith(self.critical_paths):
+            return CLASS_CRITICAL
+        return CLASS_NORMAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or self.controller is None
+            or scope["method"] == "OPTIONS"
+            or not path.startswith(self.include_paths)
+            or path.startswith(self.exclude_paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        class_name = self._classify(scope["method"], path)
+        if not await self.controller.acquire(class_name):
+            logger.warning(f"Rejecting {class_name} request {scope['method']} {path}: server overloaded")
+            response = JSONResponse(
+                content={"detail": "Сервер перегружен, повторите попытку позже"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": self._retry_after}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(class_name)
+
+
+# Глобальный контроллер допуска (None, если контроль отключен)
+admission_controller = AdmissionController(
+    max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+    low_priority_limit=settings.ADMISSION_LOW_PRIORITY_LIMIT,
+    target_delay=settings.ADMISSION_TARGET_DELAY_MS / 1000,
+    interval=settings.ADMISSION_INTERVAL_MS / 1000,
+    max_wait=settings.ADMISSION_MAX_WAIT_MS / 1000,
+    low_priority_max_wait=settings.ADMISSION_LOW_PRIORITY_MAX_WAIT_MS / 1000,
+) if settings.ADMISSION_MAX_CONCURRENCY > 0 else None
@@ -0,0 +1,121 @@
+import functools
+import inspect
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Type
+
+import anyio
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+
+class Bulkhead:
+    """
+    Отдельный лимит потоков для синхронных обработчиков одного роутера.
+
+    FastAPI выполняет обработчики def в общем пуле потоков anyio (40 мест
+    на процесс), поэтому медленные запросы одного роутера могут занять его
+    целиком. Обработчики роутера с bulkhead выполняются с собственным
+    CapacityLimiter и не расходуют места общего пула; их зависимости
+    по-прежнему выполняются в общем пуле.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        """
+        Args:
+            name: Название (используется в метриках)
+            capacity: Максимальное количество одновременно выполняемых обработчиков
+        """
+        self.name = name
+        self.capacity = capacity
+        self.limiter = anyio.CapacityLimiter(capacity)
+        self._lock = Lock()
+        self._waiting = 0
+        self._running = 0
+        self.peak_running = 0
+        self.completed = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Выполняет синхронную функцию в потоке с лимитом этого bulkhead"""
+        enqueued_at = time.monotonic()
+        started = False
+        with self._lock:
+            self._waiting += 1
+
+        def task():
+            nonlocal started
+            started_at = time.monotonic()
+            with self._lock:
+                started = True
+                self._waiting -= 1
+                self._running += 1
+                self.peak_running = max(self.peak_running, self._running)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record(started_at - enqueued_at, time.monotonic() - started_at)
+
+        try:
+            return await anyio.to_thread.run_sync(task, limiter=self.limiter)
+        finally:
+            # Запрос отменен, пока ждал свободного места
+            with self._lock:
+                if not started:
+                    self._waiting -= 1
+
+    def _record(self, wait_time: float, run_time: float) -> None:
+        with self._lock:
+            self._running -= 1
+            self.completed += 1
+            self.total_wait_time += wait_time
+            self.total_run_time += run_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            self.max_run_time = max(self.max_run_time, run_time)
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Превращает синхронный обработчик в асинхронный, выполняемый в этом bulkhead"""
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await self.run(func, *args, **kwargs)
+        return wrapper
+
+    def route_class(self) -> Type[APIRoute]:
+        """Возвращает класс маршрутов для APIRouter(route_class=...)"""
+        bulkhead = self
+
+        class BulkheadRoute(APIRoute):
+            def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+                if not inspect.iscoroutinefunction(endpoint):
+                    endpoint = bulkhead.wrap(endpoint)
+                super().__init__(path, endpoint, **kwargs)
+
+        return BulkheadRoute
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает загрузку, очередь и задержки выполнения"""
+        with self._lock:
+            completed = self.completed
+            return {
+                "capacity": self.capacity,
+                "running": self._running,
+                "occupancy": self._running / self.capacity if self.capacity else 0.0,
+                "peak_running": self.peak_running,
+                "waiting": self._waiting,
+                "completed": completed,
+                "avg_wait_ms": self.total_wait_time / completed * 1000 if completed else 0.0,
+                "max_wait_ms": self.max_wait_time * 1000,
+                "avg_run_ms": self.total_run_time / completed * 1000 if completed else 0.0,
+                "max_run_ms": self.max_run_time * 1000,
+            }
+
+
+# Bulkhead-ы роутеров с синхронными обработчиками
+bulkheads: Dict[str, Bulkhead] = {
+    "tickets": Bulkhead("tickets", settings.BULKHEAD_TICKETS_THREADS),
+    "equipment": Bulkhead("equipment", settings.BULKHEAD_EQUIPMENT_THREADS),
+}
@@ -1,69 +1,408 @@
 import time
+import sys
+import heapq
+import logging
+import pickle
+import random
+import sqlite3
+import zlib
 import asyncio
-from typing import Dict, Any, Optional, Callable, TypeVar, Generic
-from threading import RLock
+import inspect
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from typing import Dict, Any, Optional, Callable, TypeVar, Generic, List, Tuple, Sequence, Set, Iterable
+from threading import Event, Lock, Thread, local
 from functools import wraps
 
+import anyio
+from fastapi import params
+
+from app.core.config import settings
 from app.core.logging import get_logger
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
 logger = get_logger("cache")
 
 T = TypeVar('T')
 
 
-class Cache:
+# Доля операций с кэшем, для которых пишется отладочная запись в лог
+_LOG_SAMPLE_RATE = settings.CACHE_LOG_SAMPLE_RATE
+
+
+def _log_sampled() -> bool:
+    """Решает, писать ли отладочную запись об операции (пишется только выборка операций)"""
+    return _LOG_SAMPLE_RATE > 0 and logger.isEnabledFor(logging.DEBUG) and random.random() < _LOG_SAMPLE_RATE
+
+
+def _key_prefix(key: str) -> str:
+    """Префикс ключа (часть до первого двоеточия), по которому ведется статистика"""
+    return key.partition(":")[0] if ":" in key else ""
+
+
+class _PrefixCounters:
+    """Счетчики операций с ключами одного префикса"""
+    __slots__ = ("hits", "misses", "evictions", "expirations", "entries", "bytes")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.entries = 0
+        self.bytes = 0
+
+    def add_to(self, totals: Dict[str, int]) -> None:
+        for name in self.__slots__:
+            totals[name] = totals.get(name, 0) + getattr(self, name)
+
+
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Приблизительно оценивает размер значения в байтах
+    (с обходом вложенных коллекций на ограниченную глубину)
+    """
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate_size(item, _depth + 1)
+    return size
+
+
+class _CacheEntry:
+    """Запись кэша с собственным временем истечения и тегами"""
+    __slots__ = ("value", "expires_at", "size", "tags")
+
+    def __init__(self, value: Any, expires_at: float, size: int, tags: Tuple[str, ...] = ()):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
+
+class _TagIndex:
+    """
+    Обратный индекс тег -> ключи.
+
+    Позволяет инвалидировать записи по тегу, просматривая только ключи с этим
+    тегом. Блокировка индекса берется после блокировки сегмента (но не наоборот).
     """
-    Простой кэш в памяти с поддержкой TTL
+    def __init__(self):
+        self.keys_by_tag: Dict[str, Set[str]] = {}
+        self.lock = Lock()
+
+    def add(self, key: str, tags: Iterable[str]) -> None:
+        with self.lock:
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+
+    def discard(self, key: str, tags: Iterable[str]) -> None:
+        with self.lock:
+            for tag in tags:
+                keys = self.keys_by_tag.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.keys_by_tag[tag]
+
+    def pop(self, tag: str) -> Set[str]:
+        with self.lock:
+            return self.keys_by_tag.pop(tag, set())
+
+    def clear(self) -> None:
+        with self.lock:
+            self.keys_by_tag.clear()
+
+
+class _CacheShard:
     """
+    Сегмент кэша со своей блокировкой.
+
+    Записи хранятся в порядке последнего использования (для LRU-вытеснения),
+    а куча (expires_at, key) позволяет удалять истекшие записи постепенно,
+    не просматривая весь сегмент.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, tag_index: _TagIndex):
+        self.entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self.lock = Lock()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tag_index = tag_index
+        self.bytes = 0
+        # Счетчики по префиксам ключей ведутся в каждом сегменте отдельно,
+        # чтобы обновляться под блокировкой сегмента
+        self.counters: Dict[str, _PrefixCounters] = {}
+
+    def counters_for(self, key: str) -> _PrefixCounters:
+        prefix = _key_prefix(key)
+        counters = self.counters.get(prefix)
+        if counters is None:
+            counters = self.counters[prefix] = _PrefixCounters()
+        return counters
+
+    def add(self, key: str, entry: _CacheEntry) -> None:
+        self.entries[key] = entry
+        self.bytes += entry.size
+        counters = self.counters_for(key)
+        counters.entries += 1
+        counters.bytes += entry.size
+        if entry.tags:
+            self.tag_index.add(key, entry.tags)
+
+    def remove(self, key: str) -> _CacheEntry:
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        counters = self.counters_for(key)
+        counters.entries -= 1
+        counters.bytes -= entry.size
+        if entry.tags:
+            self.tag_index.discard(key, entry.tags)
+        return entry
+
+
+class CacheBackend(ABC):
+    """
+    Интерфейс хранилища кэша.
+
+    Реализации: Cache (память процесса), SQLiteCacheBackend (общий файл SQLite
+    для всех процессов на одной машине) и RedisCacheBackend (сервер по протоколу
+    Redis). Хранилище выбирается настройкой CACHE_BACKEND.
+    """
+    name = "base"
+
     def __init__(self, ttl: int = 300):
+        """
+        Args:
+            ttl: Время жизни элементов кэша по умолчанию в секундах
+        """
+        self.ttl = ttl
+        self._expiry_thread: Optional[Thread] = None
+        self._running = False
+        # Префикс -> [количество вычислений, суммарное время вычислений, сэкономленное время]
+        self._compute_lock = Lock()
+        self._compute: Dict[str, List[float]] = {}
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        """Возвращает значение или default при промахе"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """Сохраняет значение с TTL и тегами"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Удаляет значение"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Удаляет все значения"""
+
+    @abstractmethod
+    def invalidate_tags(self, *tags: str) -> int:
+        """Удаляет значения, помеченные хотя бы одним из тегов, и возвращает их количество"""
+
+    @abstractmethod
+    def invalidate_by_prefix(self, prefix: str) -> None:
+        """Удаляет значения, ключи которых начинаются с префикса"""
+
+    def expire_some(self, limit: int = 100) -> int:
+        """Удаляет часть истекших значений (для хранилищ без собственного механизма истечения)"""
+        return 0
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики хранилища"""
+
+    async def get_async(self, key: str, default: Any = None) -> Optional[Any]:
+        """Вариант get для асинхронного кода: обращение к хранилищу выполняется в пуле потоков"""
+        return await anyio.to_thread.run_sync(self.get, key, default)
+
+    async def set_async(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """Вариант set для асинхронного кода: обращение к хранилищу выполняется в пуле потоков"""
+        await anyio.to_thread.run_sync(self.set, key, value, ttl, tags)
+
+    def record_compute(self, prefix: str, seconds: float) -> None:
+        """Учитывает время вычисления значения, сохраненного в кэш (вызывается cache_result)"""
+        with self._compute_lock:
+            stats = self._compute.setdefault(prefix, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+
+    def record_saving(self, prefix: str) -> None:
+        """Учитывает попадание как сэкономленное среднее время вычисления"""
+        with self._compute_lock:
+            stats = self._compute.get(prefix)
+            if stats is not None:
+                stats[2] += stats[1] / stats[0]
+
+    def _prefix_counters(self) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    def get_prefix_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает счетчики хранилища и сэкономленное время вычислений по префиксам ключей"""
+        prefixes = self._prefix_counters()
+        with self._compute_lock:
+            compute = {prefix: list(stats) for prefix, stats in self._compute.items()}
+        for prefix, (computations, compute_time, saved_time) in compute.items():
+            stats = prefixes.setdefault(prefix, {})
+            stats["computations"] = int(computations)
+            stats["avg_compute_ms"] = compute_time / computations * 1000 if computations else 0.0
+            stats["compute_time_saved_ms"] = saved_time * 1000
+        for stats in prefixes.values():
+            total = stats.get("hits", 0) + stats.get("misses", 0)
+            stats["hit_rate"] = stats.get("hits", 0) / total if total else 0.0
+        return prefixes
+
+    def _expiry_loop(self, interval: float) -> None:
+        while self._running:
+            try:
+                self.expire_some()
+            except Exception as e:
+                logger.error(f"Error expiring cache entries: {str(e)}")
+            time.sleep(interval)
+
+    def start_expiry(self, interval: float = 1.0) -> None:
+        """Запускает фоновое удаление истекших записей в отдельном потоке"""
+        if self._running:
+            return
+        self._running = True
+        self._expiry_thread = Thread(target=self._expiry_loop, args=(interval,), daemon=True)
+        self._expiry_thread.start()
+
+    def stop_expiry(self) -> None:
+        """Останавливает фоновое удаление истекших записей"""
+        self._running = False
+        if self._expiry_thread:
+            self._expiry_thread.join(timeout=5)
+            self._expiry_thread = None
+
+
+class Cache(CacheBackend):
+    """
+    Кэш в памяти с TTL для каждой записи, ограничением по количеству записей
+    и по объему, LRU-вытеснением и постепенным удалением истекших записей.
+
+    Кэш разделен на сегменты со своими блокировками, поэтому одновременные
+    обращения к разным ключам не конкурируют за одну общую блокировку.
+    """
+    name = "memory"
+
+    def __init__(
+        self,
+        ttl: int = 300,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        num_shards: int = 16
+    ):
         """
         Инициализирует кэш
         
         Args:
-            ttl: Время жизни элементов кэша в секундах (по умолчанию 5 минут)
+            ttl: Время жизни элементов кэша по умолчанию в секундах (по умолчанию 5 минут)
+            max_entries: Максимальное количество записей
+            max_bytes: Максимальный суммарный размер записей в байтах (приблизительно)
+            num_shards: Количество сегментов кэша
         """
-        self.cache: Dict[str, Dict[str, Any]] = {}
-        self.ttl = ttl
-        self.lock = RLock()  # Для потокобезопасного доступа
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._tag_index = _TagIndex()
+        self._shards = [
+            _CacheShard(max(1, max_entries // num_shards), max(1, max_bytes // num_shards), self._tag_index)
+            for _ in range(num_shards)
+        ]
+
+    def _shard(self, key: str) -> _CacheShard:
+        return self._shards[hash(key) % len(self._shards)]
         
-    def get(self, key: str) -> Optional[Any]:
+    async def get_async(self, key: str, default: Any = None) -> Optional[Any]:
+        # Кэш в памяти процесса не блокирует цикл событий, поток не нужен
+        return self.get(key, default)
+
+    async def set_async(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        self.set(key, value, ttl, tags)
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
         """
         Получает значение из кэша
         
         Args:
             key: Ключ для поиска
+            default: Значение, возвращаемое при промахе (позволяет кэшировать None)
             
         Returns:
-            Значение из кэша или None, если ключ не найден или устарел
+            Значение из кэша или default, если ключ не найден или устарел
         """
-        with self.lock:
-            if key not in self.cache:
-                return None
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                shard.counters_for(key).misses += 1
+                return default
             
-            entry = self.cache[key]
             # Проверяем не устарело ли значение
-            if time.time() - entry["timestamp"] > self.ttl:
-                logger.debug(f"Cache entry expired: {key}")
-                del self.cache[key]
-                return None
-                
-            logger.debug(f"Cache hit: {key}")
-            return entry["value"]
+            if time.monotonic() >= entry.expires_at:
+                shard.remove(key)
+                counters = shard.counters_for(key)
+                counters.expirations += 1
+                counters.misses += 1
+                return default
+            
+            shard.entries.move_to_end(key)
+            shard.counters_for(key).hits += 1
+        if _log_sampled():
+            logger.debug(f"Cache hit (sampled): {key}")
+        return entry.value
     
-    def set(self, key: str, value: Any) -> None:
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
         """
         Сохраняет значение в кэше
         
         Args:
             key: Ключ
             value: Значение для сохранения
+            ttl: Время жизни записи в секундах (по умолчанию - TTL кэша)
+            tags: Теги записи для инвалидации через invalidate_tags
         """
-        with self.lock:
-            logger.debug(f"Cache set: {key}")
-            self.cache[key] = {
-                "value": value,
-                "timestamp": time.time()
-            }
+        tags = tuple(tags)
+        size = _estimate_size(value)
+        shard = self._shard(key)
+        if size > shard.max_bytes:
+            logger.warning(f"Cache value too large, skipping: {key} ({size} bytes)")
+            return
+        
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with shard.lock:
+            if key in shard.entries:
+                shard.remove(key)
+            shard.add(key, _CacheEntry(value, expires_at, size, tags))
+            heapq.heappush(shard.expiry_heap, (expires_at, key))
+            
+            # Вытесняем давно не использованные записи при превышении лимитов
+            while len(shard.entries) > shard.max_entries or shard.bytes > shard.max_bytes:
+                oldest_key = next(iter(shard.entries))
+                shard.remove(oldest_key)
+                shard.counters_for(oldest_key).evictions += 1
+            
+            # Куча может содержать устаревшие элементы для перезаписанных ключей
+            if len(shard.expiry_heap) > 2 * len(shard.entries) + 64:
+                shard.expiry_heap = [(e.expires_at, k) for k, e in shard.entries.items()]
+                heapq.heapify(shard.expiry_heap)
+        if _log_sampled():
+            logger.debug(f"Cache set (sampled): {key} ({size} bytes)")
     
     def delete(self, key: str) -> None:
         """
@@ -72,16 +411,23 @@ class Cache:
         Args:
             key: Ключ для удаления
         """
-        with self.lock:
-            if key in self.cache:
-                logger.debug(f"Cache delete: {key}")
-                del self.cache[key]
+        shard = self._shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.remove(key)
     
     def clear(self) -> None:
         """Очищает весь кэш"""
-        with self.lock:
-            logger.debug("Cache cleared")
-            self.cache.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.expiry_heap.clear()
+                shard.bytes = 0
+                for counters in shard.counters.values():
+                    counters.entries = 0
+                    counters.bytes = 0
+        self._tag_index.clear()
+        logger.debug("Cache cleared")
             
     def invalidate_by_prefix(self, prefix: str) -> None:
         """
@@ -90,18 +436,837 @@ class Cache:
         Args:
             prefix: Префикс ключей для инвалидации
         """
-        with self.lock:
-            keys_to_delete = [k for k in self.cache.keys() if k.startswith(prefix)]
-            for key in keys_to_delete:
-                logger.debug(f"Cache invalidate by prefix: {key}")
-                del self.cache[key]
+        for shard in self._shards:
+            with shard.lock:
+                keys_to_delete = [k for k in shard.entries if k.startswith(prefix)]
+                for key in keys_to_delete:
+                    shard.remove(key)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        Инвалидирует все записи, помеченные хотя бы одним из тегов
+        
+        Args:
+            tags: Теги для инвалидации
+            
+        Returns:
+            Количество удаленных записей
+        """
+        removed = 0
+        for tag in tags:
+            for key in self._tag_index.pop(tag):
+                shard = self._shard(key)
+                with shard.lock:
+                    if key in shard.entries:
+                        shard.remove(key)
+                        removed += 1
+        if removed:
+            logger.debug(f"Cache invalidate by tags {tags}: {removed} entries")
+        return removed
+
+    def expire_some(self, limit: int = 100) -> int:
+        """
+        Удаляет истекшие записи, не более limit за вызов в каждом сегменте
+        
+        Returns:
+            Количество удаленных записей
+        """
+        removed = 0
+        now = time.monotonic()
+        for shard in self._shards:
+            with shard.lock:
+                checked = 0
+                while shard.expiry_heap and checked < limit and shard.expiry_heap[0][0] <= now:
+                    expires_at, key = heapq.heappop(shard.expiry_heap)
+                    checked += 1
+                    entry = shard.entries.get(key)
+                    # Пропускаем элементы кучи для перезаписанных или удаленных ключей
+                    if entry is not None and entry.expires_at == expires_at:
+                        shard.remove(key)
+                        shard.counters_for(key).expirations += 1
+                        removed += 1
+        return removed
+
+    def _prefix_counters(self) -> Dict[str, Dict[str, Any]]:
+        prefixes: Dict[str, Dict[str, Any]] = {}
+        for shard in self._shards:
+            with shard.lock:
+                for prefix, counters in shard.counters.items():
+                    counters.add_to(prefixes.setdefault(prefix, {}))
+        return prefixes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики и текущий размер кэша"""
+        stats = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for counters in self._prefix_counters().values():
+            for name in stats:
+                stats[name] += counters[name]
+        total = stats["hits"] + stats["misses"]
+        with self._tag_index.lock:
+            stats["tags"] = len(self._tag_index.keys_by_tag)
+        stats["backend"] = self.name
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
+
+
+# Значения в общих хранилищах сериализуются pickle; крупные значения сжимаются
+_COMPRESS_THRESHOLD = 1024
+_FORMAT_PICKLE = b"p"
+_FORMAT_PICKLE_ZLIB = b"z"
+
+
+def _serialize(value: Any) -> bytes:
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) > _COMPRESS_THRESHOLD:
+        compressed = zlib.compress(data, 1)
+        if len(compressed) < len(data):
+            return _FORMAT_PICKLE_ZLIB + compressed
+    return _FORMAT_PICKLE + data
+
+
+def _deserialize(data: bytes) -> Any:
+    if data[:1] == _FORMAT_PICKLE_ZLIB:
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Общий кэш в файле SQLite (режим WAL) для нескольких процессов на одной машине.
+
+    Ключи и теги хранятся с префиксом "<namespace>:v<version>:", поэтому смена
+    версии делает недоступными все записи, сохраненные в прежнем формате.
+    Каждый поток использует собственное соединение.
+    """
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        ttl: int = 300,
+        max_entries: int = 10000,
+        namespace: str = "cache",
+        version: str = "1"
+    ):
+        """
+        Инициализирует хранилище и создает таблицы
+
+        Args:
+            path: Путь к файлу SQLite
+            ttl: Время жизни элементов кэша по умолчанию в секундах
+            max_entries: Максимальное количество записей (при превышении удаляются
+                записи, истекающие раньше других)
+            namespace: Пространство имен ключей
+            version: Версия формата ключей и значений
+        """
+        super().__init__(ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self.key_prefix = f"{namespace}:v{version}:"
+        self._local = local()
+        self._lock = Lock()
+        self._sets_since_trim = 0
+        self._counters: Dict[str, _PrefixCounters] = {}
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at);
+                CREATE TABLE IF NOT EXISTS cache_tags (
+                    tag TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (tag, key)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key);
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str, keys: Iterable[str]) -> None:
+        # Счетчики ведутся в этом процессе по префиксам ключей без пространства имен
+        offset = len(self.key_prefix)
+        with self._lock:
+            for key in keys:
+                prefix = _key_prefix(key[offset:])
+                counters = self._counters.get(prefix)
+                if counters is None:
+                    counters = self._counters[prefix] = _PrefixCounters()
+                setattr(counters, counter, getattr(counters, counter) + 1)
+
+    def _delete_keys(self, conn: sqlite3.Connection, keys: List[str]) -> None:
+        conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+        conn.executemany("DELETE FROM cache_tags WHERE key = ?", [(k,) for k in keys])
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        """Получает значение из общего кэша"""
+        full_key = self.key_prefix + key
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (full_key,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            self._count("misses", [full_key])
+            return default
+        self._count("hits", [full_key])
+        if _log_sampled():
+            logger.debug(f"Cache hit (sampled): {key}")
+        return _deserialize(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """Сохраняет значение в общем кэше"""
+        full_key = self.key_prefix + key
+        data = _serialize(value)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (full_key, data, expires_at)
+            )
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (full_key,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)",
+                [(self.key_prefix + tag, full_key) for tag in tags]
+            )
+
+        # Ограничение количества записей проверяется не при каждой записи
+        with self._lock:
+            self._sets_since_trim += 1
+            trim = self._sets_since_trim >= 100
+            if trim:
+                self._sets_since_trim = 0
+        if trim:
+            self._trim()
+
+    def _trim(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            (count,) = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+            excess = count - self.max_entries
+            if excess <= 0:
+                return
+            keys = [k for (k,) in conn.execute(
+                "SELECT key FROM cache_entries ORDER BY expires_at LIMIT ?", (excess,)
+            )]
+            self._delete_keys(conn, keys)
+        self._count("evictions", keys)
+
+    def delete(self, key: str) -> None:
+        """Удаляет значение из общего кэша"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._delete_keys(conn, [self.key_prefix + key])
 
+    def clear(self) -> None:
+        """Удаляет все значения текущего пространства имен и версии"""
+        pattern = self.key_prefix.replace("%", r"\%").replace("_", r"\_") + "%"
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(r"DELETE FROM cache_entries WHERE key LIKE ? ESCAPE '\'", (pattern,))
+            conn.execute(r"DELETE FROM cache_tags WHERE key LIKE ? ESCAPE '\'", (pattern,))
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Удаляет значения, помеченные хотя бы одним из тегов"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = set()
+            for tag in tags:
+                keys.update(k for (k,) in conn.execute(
+                    "SELECT key FROM cache_tags WHERE tag = ?", (self.key_prefix + tag,)
+                ))
+            self._delete_keys(conn, list(keys))
+        return len(keys)
+
+    def invalidate_by_prefix(self, prefix: str) -> None:
+        """Удаляет значения, ключи которых начинаются с префикса"""
+        full_prefix = self.key_prefix + prefix
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = [k for (k,) in conn.execute(
+                "SELECT key FROM cache_entries WHERE key >= ? AND key < ?", (full_prefix, full_prefix + "\uffff")
+            )]
+            self._delete_keys(conn, keys)
+
+    def expire_some(self, limit: int = 100) -> int:
+        """Удаляет не более limit истекших записей"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = [k for (k,) in conn.execute(
+                "SELECT key FROM cache_entries WHERE expires_at <= ? LIMIT ?", (time.time(), limit)
+            )]
+            self._delete_keys(conn, keys)
+        self._count("expirations", keys)
+        return len(keys)
+
+    def _prefix_counters(self) -> Dict[str, Dict[str, Any]]:
+        prefixes: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for prefix, counters in self._counters.items():
+                counters.add_to(prefixes.setdefault(prefix, {}))
+        # Количество и объем записей берутся из общего хранилища
+        offset = len(self.key_prefix) + 1
+        rows = self._connection().execute(
+            """
+            SELECT substr(key, ?, instr(substr(key, ?), ':') - 1) AS prefix, COUNT(*), SUM(LENGTH(value))
+            FROM cache_entries WHERE key >= ? AND key < ? GROUP BY prefix
+            """,
+            (offset, offset, self.key_prefix, self.key_prefix + "\uffff")
+        ).fetchall()
+        for stats in prefixes.values():
+            stats["entries"] = 0
+            stats["bytes"] = 0
+        for prefix, entries, size in rows:
+            stats = prefixes.setdefault(prefix, {})
+            stats["entries"] = entries
+            stats["bytes"] = size
+        return prefixes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики этого процесса и размер общего хранилища"""
+        stats = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for counters in self._prefix_counters().values():
+            for name in stats:
+                stats[name] += counters.get(name, 0)
+        total = stats["hits"] + stats["misses"]
+        stats["backend"] = self.name
+        stats["path"] = self.path
+        stats["max_entries"] = self.max_entries
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Общий кэш на сервере с протоколом Redis (Redis, Valkey, KeyDB и т.п.).
+
+    Истечение записей выполняет сам сервер, теги хранятся в множествах
+    "<namespace>:v<version>:tag:<тег>". Требует пакет redis и сервер Redis 7+.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int = 300, namespace: str = "cache", version: str = "1"):
+        """
+        Args:
+            url: URL сервера, например redis://localhost:6379/0
+            ttl: Время жизни элементов кэша по умолчанию в секундах
+            namespace: Пространство имен ключей
+            version: Версия формата ключей и значений
+        """
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        super().__init__(ttl)
+        self.url = url
+        self.key_prefix = f"{namespace}:v{version}:"
+        self.tag_prefix = self.key_prefix + "tag:"
+        self._client = redis.Redis.from_url(url)
+        self._lock = Lock()
+        self._counters: Dict[str, _PrefixCounters] = {}
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        """Получает значение из общего кэша"""
+        data = self._client.get(self.key_prefix + key)
+        prefix = _key_prefix(key)
+        with self._lock:
+            counters = self._counters.get(prefix)
+            if counters is None:
+                counters = self._counters[prefix] = _PrefixCounters()
+            if data is None:
+                counters.misses += 1
+            else:
+                counters.hits += 1
+        return default if data is None else _deserialize(data)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """Сохраняет значение в общем кэше"""
+        full_key = self.key_prefix + key
+        seconds = max(1, int(self.ttl if ttl is None else ttl))
+        pipe = self._client.pipeline()
+        pipe.set(full_key, _serialize(value), ex=seconds)
+        for tag in tags:
+            pipe.sadd(self.tag_prefix + tag, full_key)
+            # Множество тега живет не меньше самой долгой записи с этим тегом
+            pipe.expire(self.tag_prefix + tag, seconds, gt=True)
+            pipe.expire(self.tag_prefix + tag, seconds, nx=True)
+        pipe.execute()
+
+    def delete(self, key: str) -> None:
+        """Удаляет значение из общего кэша"""
+        self._client.delete(self.key_prefix + key)
+
+    def clear(self) -> None:
+        """Удаляет все значения текущего пространства имен и версии"""
+        for keys in self._scan_batches(self.key_prefix + "*"):
+            self._client.delete(*keys)
+
+    def _scan_batches(self, pattern: str, batch_size: int = 500):
+        batch = []
+        for key in self._client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Удаляет значения, помеченные хотя бы одним из тегов"""
+        removed = 0
+        for tag in tags:
+            tag_key = self.tag_prefix + tag
+            pipe = self._client.pipeline()
+            pipe.smembers(tag_key)
+            pipe.delete(tag_key)
+            keys, _ = pipe.execute()
+            if keys:
+                removed += self._client.delete(*keys)
+        return removed
+
+    def invalidate_by_prefix(self, prefix: str) -> None:
+        """Удаляет значения, ключи которых начинаются с префикса"""
+        for keys in self._scan_batches(self.key_prefix + prefix + "*"):
+            self._client.delete(*keys)
+
+    def _prefix_counters(self) -> Dict[str, Dict[str, Any]]:
+        # Истечение и вытеснение выполняет сервер, поэтому в процессе известны только попадания и промахи
+        with self._lock:
+            return {
+                prefix: {"hits": counters.hits, "misses": counters.misses}
+                for prefix, counters in self._counters.items()
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики этого процесса"""
+        hits = misses = 0
+        for counters in self._prefix_counters().values():
+            hits += counters["hits"]
+            misses += counters["misses"]
+        total = hits + misses
+        return {
+            "backend": self.name,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+def create_cache_backend(backend: Optional[str] = None) -> CacheBackend:
+    """
+    Создает хранилище кэша по настройкам
+
+    Args:
+        backend: Тип хранилища ("memory", "sqlite" или "redis"), по умолчанию CACHE_BACKEND
+    """
+    backend = backend or settings.CACHE_BACKEND
+    if backend == "memory":
+        return Cache(
+            ttl=300,
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            max_bytes=settings.CACHE_MAX_BYTES,
+        )
+    if backend == "sqlite":
+        return SQLiteCacheBackend(
+            settings.CACHE_URL or "./cache.db",
+            ttl=300,
+            max_entries=settings.CACHE_MAX_ENTRIES,
+            namespace=settings.CACHE_NAMESPACE,
+            version=settings.CACHE_VERSION,
+        )
+    if backend == "redis":
+        return RedisCacheBackend(
+            settings.CACHE_URL or "redis://localhost:6379/0",
+            ttl=300,
+            namespace=settings.CACHE_NAMESPACE,
+            version=settings.CACHE_VERSION,
+        )
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+# Создаем кэш с TTL 5 минут по умолчанию в выбранном хранилище
+global_cache = create_cache_backend()
+
+# Локальный кэш процесса (L1) для часто читаемых справочных данных; согласованность
+# между воркерами обеспечивает шина инвалидации (app.core.invalidation_bus)
+local_cache = Cache(
+    ttl=300,
+    max_entries=settings.L1_CACHE_MAX_ENTRIES,
+    max_bytes=settings.L1_CACHE_MAX_BYTES,
+)
+
+
+# Признак промаха кэша (в отличие от закэшированного значения None)
+_MISSING = object()
+
+# Сколько секунд ожидать результата уже выполняющегося вычисления того же ключа
+DEFAULT_WAIT_TIMEOUT = 30.0
+
+
+class _SyncCall:
+    """Выполняющееся в одном из потоков вычисление"""
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вычислений одного ключа.
+
+    Первый вызов для ключа выполняет вычисление, а вызовы, пришедшие до его
+    завершения, ждут и получают тот же результат или то же исключение.
+    Если ожидание превышает timeout, ожидающий вызов выполняет вычисление сам.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._async_calls: Dict[str, asyncio.Future] = {}
+        self._sync_calls: Dict[str, _SyncCall] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def do_async(self, key: str, func: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет корутинную функцию func не более одного раза для одновременных вызовов с ключом key
+        
+        Args:
+            key: Ключ вычисления
+            func: Функция без аргументов, возвращающая корутину
+            timeout: Максимальное время ожидания чужого вычисления в секундах
+        """
+        # Словарь используется только из потока цикла событий, блокировка не нужна
+        future = self._async_calls.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._async_calls[key] = future
+            self.leaders += 1
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                # Ожидающие вызовы выполнят вычисление сами
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # Помечаем исключение как полученное, даже если ожидающих нет
+                future.exception()
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                del self._async_calls[key]
+
+        self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Timed out waiting for in-flight computation of {key}, computing it again")
+            return await func()
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return await func()
+            raise
+
+    def do_sync(self, key: str, func: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет функцию func не более одного раза для одновременных вызовов с ключом key из разных потоков
+        
+        Args:
+            key: Ключ вычисления
+            func: Функция без аргументов
+            timeout: Максимальное время ожидания чужого вычисления в секундах
+        """
+        with self._lock:
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = _SyncCall()
+                self._sync_calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = func()
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._sync_calls[key]
+                call.event.set()
+
+        if not call.event.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"Timed out waiting for in-flight computation of {key}, computing it again")
+            return func()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает количество выполненных, объединенных и прерванных по таймауту ожиданий"""
+        with self._lock:
+            return {
+                "in_flight": len(self._async_calls) + len(self._sync_calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+            }
+
+
+# Объединение одновременных промахов в cache_result
+result_single_flight = SingleFlight()
+
+# Области видимости закэшированного результата
+CACHE_SCOPE_GLOBAL = "global"
+CACHE_SCOPE_ROLE = "role"
+CACHE_SCOPE_USER = "user"
+
+
+def _build_key_function(
+    func: Callable,
+    prefix: str,
+    key_params: Optional[Sequence[str]],
+    scope: str,
+    user_param: str,
+    tags: Sequence[str] = ()
+) -> Callable[..., Tuple[str, Tuple[str, ...]]]:
+    """
+    Создает функцию построения кэш-ключа и тегов записи по спецификации декоратора.
+
+    Параметры-зависимости FastAPI (со значением по умолчанию Depends(...)),
+    например сессия БД и текущий пользователь, в ключ не попадают.
+    Теги могут ссылаться на аргументы функции: "ticket:{ticket_id}".
+    """
+    signature = inspect.signature(func)
+    if key_params is None:
+        key_params = [
+            name for name, param in signature.parameters.items()
+            if not isinstance(param.default, params.Depends)
+        ]
+    else:
+        unknown = set(key_params) - set(signature.parameters)
+        if unknown:
+            raise ValueError(f"Unknown key params for {func.__name__}: {sorted(unknown)}")
+    key_params = sorted(key_params)
+    
+    if scope not in (CACHE_SCOPE_GLOBAL, CACHE_SCOPE_ROLE, CACHE_SCOPE_USER):
+        raise ValueError(f"Unknown cache scope: {scope}")
+    if scope != CACHE_SCOPE_GLOBAL and user_param not in signature.parameters:
+        raise ValueError(f"{func.__name__} has no '{user_param}' parameter for scope '{scope}'")
+    
+    base = f"{prefix}:{func.__name__}"
+    static_tags = tuple(tag for tag in tags if "{" not in tag)
+    tag_templates = tuple(tag for tag in tags if "{" in tag)
+    
+    def build_key(*args, **kwargs) -> Tuple[str, Tuple[str, ...]]:
+        bound = signature.bind_partial(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        
+        key_parts = [base]
+        if scope == CACHE_SCOPE_ROLE:
+            key_parts.append(f"role={getattr(arguments[user_param], 'role', None)}")
+        elif scope == CACHE_SCOPE_USER:
+            key_parts.append(f"user={getattr(arguments[user_param], 'id', None)}")
+        for name in key_params:
+            key_parts.append(f"{name}={arguments.get(name)}")
+        entry_tags = static_tags + tuple(template.format(**arguments) for template in tag_templates)
+        return ":".join(key_parts), entry_tags
+    
+    return build_key
 
-# Создаем экземпляр кэша с TTL 5 минут
-global_cache = Cache(ttl=300)
 
+class StaleRefresher:
+    """
+    Фоновое обновление устаревших результатов cache_result (режим stale_ttl).
 
-def cache_result(prefix: str = "", ttl: Optional[int] = None):
+    Для каждого ключа одновременно выполняется не более одного обновления.
+    После неудачного обновления следующие попытки откладываются с экспоненциально
+    растущей паузой, а клиенты продолжают получать последний удачный результат.
+    """
+    def __init__(self, backoff_base: float = 1.0, backoff_max: float = 60.0, max_workers: int = 2):
+        """
+        Args:
+            backoff_base: Пауза после первой неудачи в секундах
+            backoff_max: Максимальная пауза между попытками в секундах
+            max_workers: Количество потоков для обновления синхронных функций
+        """
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+        self._refreshing: Set[str] = set()
+        # Ключ -> (количество неудач подряд, время следующей попытки)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.backoff_skips = 0
+
+    def claim(self, key: str) -> bool:
+        """Отмечает выдачу устаревшего значения и решает, нужно ли запускать обновление"""
+        with self._lock:
+            self.stale_hits += 1
+            if key in self._refreshing:
+                return False
+            failure = self._failures.get(key)
+            if failure is not None and time.monotonic() < failure[1]:
+                self.backoff_skips += 1
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _finish(self, key: str, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            if error is None:
+                self.refreshes += 1
+                self._failures.pop(key, None)
+                return
+            self.refresh_errors += 1
+            count = self._failures.get(key, (0, 0.0))[0] + 1
+            delay = min(self.backoff_base * 2 ** (count - 1), self.backoff_max)
+            self._failures[key] = (count, time.monotonic() + delay)
+        logger.warning(f"Background refresh of {key} failed ({count} in a row), next attempt in {delay:.0f}s: {error}")
+
+    async def run_async(self, key: str, func: Callable[[], Any]) -> None:
+        try:
+            await func()
+        except Exception as e:
+            self._finish(key, e)
+        except BaseException:
+            with self._lock:
+                self._refreshing.discard(key)
+            raise
+        else:
+            self._finish(key, None)
+
+    def schedule_async(self, coroutine) -> None:
+        """Запускает обновление как задачу текущего цикла событий"""
+        task = asyncio.get_running_loop().create_task(coroutine)
+        # Храним ссылку на задачу до ее завершения
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def schedule_sync(self, key: str, func: Callable[[], Any]) -> None:
+        """Запускает обновление в потоке пула"""
+        def run():
+            try:
+                func()
+            except Exception as e:
+                self._finish(key, e)
+            else:
+                self._finish(key, None)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cache-refresh")
+            executor = self._executor
+        executor.submit(run)
+
+    def shutdown(self) -> None:
+        """Отменяет фоновые задачи и останавливает потоки"""
+        for task in list(self._tasks):
+            task.cancel()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики выдачи устаревших значений и фоновых обновлений"""
+        with self._lock:
+            return {
+                "stale_hits": self.stale_hits,
+                "refreshing": len(self._refreshing),
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "backoff_skips": self.backoff_skips,
+                "keys_in_backoff": len(self._failures),
+            }
+
+
+# Фоновое обновление устаревших результатов
+stale_refresher = StaleRefresher()
+
+
+def _fresh_dependencies(signature: inspect.Signature) -> List[Tuple[str, Callable]]:
+    """
+    Находит параметры-зависимости, которые нужно открыть заново при фоновом обновлении.
+
+    Зависимости-генераторы без параметров (сессии БД) закрываются вместе с запросом,
+    поэтому фоновое обновление получает собственные экземпляры. Остальные
+    зависимости (например, текущий пользователь) берутся из исходного вызова.
+    """
+    dependencies = []
+    for name, param in signature.parameters.items():
+        dependency = getattr(param.default, "dependency", None)
+        if not isinstance(param.default, params.Depends) or dependency is None:
+            continue
+        if inspect.isasyncgenfunction(dependency) or inspect.isgeneratorfunction(dependency):
+            if not inspect.signature(dependency).parameters:
+                dependencies.append((name, dependency))
+    return dependencies
+
+
+async def _call_with_fresh_dependencies_async(func, bound: inspect.BoundArguments, dependencies) -> Any:
+    async with AsyncExitStack() as stack:
+        for name, dependency in dependencies:
+            if inspect.isasyncgenfunction(dependency):
+                bound.arguments[name] = await stack.enter_async_context(asynccontextmanager(dependency)())
+            else:
+                bound.arguments[name] = stack.enter_context(contextmanager(dependency)())
+        return await func(*bound.args, **bound.kwargs)
+
+
+def _call_with_fresh_dependencies_sync(func, bound: inspect.BoundArguments, dependencies) -> Any:
+    with ExitStack() as stack:
+        for name, dependency in dependencies:
+            if inspect.isasyncgenfunction(dependency):
+                raise TypeError(f"Async dependency '{name}' cannot be refreshed in a sync function")
+            bound.arguments[name] = stack.enter_context(contextmanager(dependency)())
+        return func(*bound.args, **bound.kwargs)
+
+
+def cache_result(
+    prefix: str = "",
+    ttl: Optional[int] = None,
+    key_params: Optional[Sequence[str]] = None,
+    scope: str = CACHE_SCOPE_GLOBAL,
+    user_param: str = "current_user",
+    tags: Sequence[str] = (),
+    wait_timeout: Optional[float] = DEFAULT_WAIT_TIMEOUT,
+    stale_ttl: Optional[int] = None,
+    local: bool = False
+):
     """
     Декоратор для кэширования результатов функций с поддержкой как синхронных,
     так и асинхронных функций.
@@ -109,79 +1274,118 @@ def cache_result(prefix: str = "", ttl: Optional[int] = None):
     Args:
         prefix: Префикс для кэш-ключа
         ttl: Время жизни кэша для этой функции (переопределяет глобальное)
+        key_params: Параметры функции, участвующие в ключе
+            (по умолчанию все, кроме зависимостей FastAPI)
+        scope: Область видимости результата: "global" - общий для всех,
+            "role" - отдельный для каждой роли, "user" - для каждого пользователя
+        user_param: Имя параметра с текущим пользователем (для scope "role" и "user")
+        tags: Теги результата для инвалидации (см. app.core.cache_tags)
+        wait_timeout: Сколько секунд ждать результата уже выполняющегося вычисления
+            того же ключа, прежде чем вычислить его самостоятельно (None - без ограничения)
+        stale_ttl: Сколько секунд после истечения ttl возвращать устаревший результат,
+            обновляя его в фоне (по умолчанию режим выключен)
+        local: Хранить результат в локальном кэше процесса (local_cache), а не в общем
     """
     def decorator(func):
+        build_key = _build_key_function(func, prefix, key_params, scope, user_param, tags)
+        cache = local_cache if local else global_cache
+        fresh_ttl = cache.ttl if ttl is None else ttl
+        signature = inspect.signature(func)
+        fresh_dependencies = _fresh_dependencies(signature) if stale_ttl else []
+        
+        def entry(result, started_at):
+            # Учитываем время вычисления, чтобы оценивать сэкономленное попаданиями время
+            cache.record_compute(prefix, time.perf_counter() - started_at)
+            # Результат хранится с TTL этой функции; в режиме stale_ttl
+            # запись хранится дольше и помечается временем, до которого она свежая
+            if stale_ttl:
+                return (time.time() + fresh_ttl, result), fresh_ttl + stale_ttl
+            return result, fresh_ttl
+        
+        def store(cache_key, result, entry_tags, started_at):
+            value, entry_ttl = entry(result, started_at)
+            cache.set(cache_key, value, ttl=entry_ttl, tags=entry_tags)
+        
+        async def store_async(cache_key, result, entry_tags, started_at):
+            value, entry_ttl = entry(result, started_at)
+            await cache.set_async(cache_key, value, entry_ttl, entry_tags)
+        
+        def unwrap(cache_key, cached):
+            # Возвращает (значение, нужно_обновить)
+            cache.record_saving(prefix)
+            if not stale_ttl:
+                return cached, False
+            fresh_until, result = cached
+            if time.time() < fresh_until:
+                return result, False
+            return result, stale_refresher.claim(cache_key)
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            # Создаем ключ на основе аргументов функции
-            key_parts = [prefix, func.__name__]
-            
-            # Добавляем аргументы в ключ
-            for arg in args:
-                key_parts.append(str(arg))
-            
-            # Добавляем именованные аргументы в ключ, сортируем для стабильности
-            for k in sorted(kwargs.keys()):
-                key_parts.append(f"{k}={kwargs[k]}")
-            
-            # Формируем финальный ключ
-            cache_key = ":".join(key_parts)
+            cache_key, entry_tags = build_key(*args, **kwargs)
             
             # Пытаемся получить результат из кэша
-            result = global_cache.get(cache_key)
-            if result is not None:
+            # Общее хранилище (SQLite, Redis) опрашивается в пуле потоков, не блокируя цикл событий
+            cached = await cache.get_async(cache_key, _MISSING)
+            if cached is not _MISSING:
+                result, refresh = unwrap(cache_key, cached)
+                if refresh:
+                    bound = signature.bind(*args, **kwargs)
+                    
+                    async def refresh_in_background():
+                        async def compute():
+                            started_at = time.perf_counter()
+                            result = await _call_with_fresh_dependencies_async(func, bound, fresh_dependencies)
+                            await store_async(cache_key, result, entry_tags, started_at)
+                            return result
+                        await stale_refresher.run_async(
+                            cache_key, lambda: result_single_flight.do_async(cache_key, compute, wait_timeout)
+                        )
+                    
+                    stale_refresher.schedule_async(refresh_in_background())
                 return result
             
-            # Если кэш промах, вызываем оригинальную функцию
-            result = await func(*args, **kwargs)
+            # Если кэш промах, вызываем оригинальную функцию; одновременные
+            # промахи по тому же ключу дожидаются одного вычисления
+            async def compute():
+                started_at = time.perf_counter()
+                result = await func(*args, **kwargs)
+                await store_async(cache_key, result, entry_tags, started_at)
+                return result
             
-            # Сохраняем результат в кэше
-            if ttl is not None:
-                # Временно изменяем TTL для этого ключа
-                old_ttl = global_cache.ttl
-                global_cache.ttl = ttl
-                global_cache.set(cache_key, result)
-                global_cache.ttl = old_ttl
-            else:
-                global_cache.set(cache_key, result)
-                
-            return result
+            return await result_single_flight.do_async(cache_key, compute, wait_timeout)
             
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            # Создаем ключ на основе аргументов функции
-            key_parts = [prefix, func.__name__]
-            
-            # Добавляем аргументы в ключ
-            for arg in args:
-                key_parts.append(str(arg))
-            
-            # Добавляем именованные аргументы в ключ, сортируем для стабильности
-            for k in sorted(kwargs.keys()):
-                key_parts.append(f"{k}={kwargs[k]}")
-            
-            # Формируем финальный ключ
-            cache_key = ":".join(key_parts)
+            cache_key, entry_tags = build_key(*args, **kwargs)
             
             # Пытаемся получить результат из кэша
-            result = global_cache.get(cache_key)
-            if result is not None:
+            cached = cache.get(cache_key, _MISSING)
+            if cached is not _MISSING:
+                result, refresh = unwrap(cache_key, cached)
+                if refresh:
+                    bound = signature.bind(*args, **kwargs)
+                    
+                    def compute_in_background():
+                        started_at = time.perf_counter()
+                        result = _call_with_fresh_dependencies_sync(func, bound, fresh_dependencies)
+                        store(cache_key, result, entry_tags, started_at)
+                        return result
+                    
+                    stale_refresher.schedule_sync(
+                        cache_key, lambda: result_single_flight.do_sync(cache_key, compute_in_background, wait_timeout)
+                    )
                 return result
             
-            # Если кэш промах, вызываем оригинальную функцию
-            result = func(*args, **kwargs)
+            # Если кэш промах, вызываем оригинальную функцию; одновременные
+            # промахи по тому же ключу дожидаются одного вычисления
+            def compute():
+                started_at = time.perf_counter()
+                result = func(*args, **kwargs)
+                store(cache_key, result, entry_tags, started_at)
+                return result
             
-            # Сохраняем результат в кэше
-            if ttl is not None:
-                # Временно изменяем TTL для этого ключа
-                old_ttl = global_cache.ttl
-                global_cache.ttl = ttl
-                global_cache.set(cache_key, result)
-                global_cache.ttl = old_ttl
-            else:
-                global_cache.set(cache_key, result)
-                
-            return result
+            return result_single_flight.do_sync(cache_key, compute, wait_timeout)
             
         # Выбираем нужный враппер в зависимости от типа функции
         if asyncio.iscoroutinefunction(func):
@@ -189,4 +1393,4 @@ def cache_result(prefix: str = "", ttl: Optional[int] = None):
         else:
             return sync_wrapper
             
-    return decorator 
\ No newline at end of file
+    return decorator
@@ -0,0 +1,153 @@
+from typing import Any, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.cache import global_cache, local_cache
+from app.core.invalidation_bus import invalidation_bus
+from app.core.principal_cache import principal_cache
+from app.core.response_cache import response_cache
+from app.core.tag_versions import tag_versions
+from app.core.token_revocation import REVOKED_TOKEN_TAG_PREFIX, token_revocation_list
+
+# Теги записей кэша. Результат помечается тегами данных, от которых он зависит,
+# а обработчики изменений публикуют теги измененных данных.
+TAG_STATS = "stats"
+TAG_TICKETS_LIST = "tickets:list"
+TAG_USERS_LIST = "users:list"
+TAG_CATEGORIES = "categories"
+TAG_EQUIPMENT = "equipment"
+
+# Версии тегов ведутся в памяти процесса и отражают изменения других воркеров
+# только через шину инвалидации, поэтому без шины им можно доверять лишь при одном воркере
+TAG_VERSIONS_COHERENT = settings.INVALIDATION_BUS != "none" or settings.WEB_CONCURRENCY <= 1
+
+
+def ticket_tag(ticket_id: int) -> str:
+    return f"ticket:{ticket_id}"
+
+
+def ticket_creator_tag(user_id: int) -> str:
+    return f"tickets:creator:{user_id}"
+
+
+def ticket_assignee_tag(user_id: int) -> str:
+    return f"tickets:assignee:{user_id}"
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+_USER_TAG_PREFIX = user_tag("")
+
+
+def category_tag(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+def equipment_tag(equipment_id: int) -> str:
+    return f"equipment:{equipment_id}"
+
+
+def _invalidate_principals(tags: Iterable[str]) -> None:
+    """Удаляет из кэша аутентифицированных пользователей тех, чьи теги инвалидированы"""
+    for tag in tags:
+        if tag.startswith(_USER_TAG_PREFIX):
+            principal_cache.invalidate_user(int(tag[len(_USER_TAG_PREFIX):]))
+
+
+def invalidate_tags(*tags: str) -> None:
+    """
+    Инвалидирует записи с тегами в общем и локальном кэше этого процесса
+    и публикует теги для остальных воркеров
+    """
+    global_cache.invalidate_tags(*tags)
+    local_cache.invalidate_tags(*tags)
+    response_cache.invalidate_tags(*tags)
+    _invalidate_principals(tags)
+    tag_versions.bump(tags)
+    invalidation_bus.publish(tags)
+
+
+def apply_remote_invalidation(tags: List[str]) -> None:
+    """Обрабатывает теги, инвалидированные другим воркером"""
+    local_cache.invalidate_tags(*tags)
+    response_cache.invalidate_tags(*tags)
+    # Снимок пользователя на этом воркере мог устареть (деактивация, смена роли или пароля)
+    _invalidate_principals(tags)
+    # Токены, отозванные на другом воркере, сразу отклоняются и здесь
+    for tag in tags:
+        if tag.startswith(REVOKED_TOKEN_TAG_PREFIX):
+            token_revocation_list.add(tag[len(REVOKED_TOKEN_TAG_PREFIX):])
+    tag_versions.bump(tags)
+    # Кэш в памяти процесса не виден другим воркерам, поэтому его тоже нужно инвалидировать
+    if global_cache.name == "memory":
+        global_cache.invalidate_tags(*tags)
+
+
+def reset_local_caches() -> None:
+    """Очищает кэши процесса, если сообщения об инвалидации были потеряны"""
+    local_cache.clear()
+    response_cache.clear()
+    principal_cache.clear()
+    # Сообщения об отозванных токенах тоже могли потеряться
+    token_revocation_list.request_rebuild()
+    tag_versions.reset()
+    if global_cache.name == "memory":
+        global_cache.clear()
+
+
+def ticket_list_etag(user: Any, *params: Any) -> Optional[str]:
+    """
+    Возвращает ETag списка заявок, видимого пользователю, без обращения к БД
+
+    Пользователь с ролью USER видит только свои заявки, поэтому его список зависит
+    от версии заявок автора; агенты и администраторы видят общий список.
+
+    Args:
+        user: Текущий пользователь
+        params: Параметры запроса (пагинация, фильтры)
+
+    Returns:
+        ETag или None, если несколько воркеров работают без шины инвалидации
+        и версия могла не учесть изменения на других воркерах
+    """
+    if not TAG_VERSIONS_COHERENT:
+        return None
+    role = getattr(user.role, "value", user.role)
+    if role == "user":
+        return tag_versions.etag(ticket_creator_tag(user.id), role, user.id, *params)
+    return tag_versions.etag(TAG_TICKETS_LIST, role, *params)
+
+
+def publish_ticket_change(ticket_id: int, creator_id: int, *assignee_ids: Optional[int]) -> None:
+    """
+    Инвалидирует кэш после создания, изменения или удаления заявки
+
+    Args:
+        ticket_id: ID заявки
+        creator_id: ID автора заявки
+        assignee_ids: ID исполнителей до и после изменения
+    """
+    tags = [ticket_tag(ticket_id), TAG_TICKETS_LIST, TAG_STATS, ticket_creator_tag(creator_id)]
+    tags.extend({ticket_assignee_tag(user_id) for user_id in assignee_ids if user_id is not None})
+    invalidate_tags(*tags)
+
+
+def publish_user_change(user_id: int) -> None:
+    """Инвалидирует кэш после изменения пользователя (имя и роль попадают в статистику)"""
+    invalidate_tags(user_tag(user_id), TAG_USERS_LIST, TAG_STATS)
+
+
+def publish_password_change(user_id: int) -> None:
+    """Инвалидирует снимок пользователя на всех воркерах после смены пароля"""
+    invalidate_tags(user_tag(user_id))
+
+
+def publish_category_change(category_id: int) -> None:
+    """Инвалидирует кэш после изменения категории заявок"""
+    invalidate_tags(category_tag(category_id), TAG_CATEGORIES)
+
+
+def publish_equipment_change(equipment_id: int) -> None:
+    """Инвалидирует кэш после изменения оборудования или истории его обслуживания"""
+    invalidate_tags(equipment_tag(equipment_id), TAG_EQUIPMENT)
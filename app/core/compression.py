@@ -1,122 +1,371 @@
-import gzip
-from io import BytesIO
-from typing import Callable, Optional
+import hashlib
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.config import settings
 from app.core.logging import get_logger
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = get_logger("compression")
 
+# Параметр wbits, при котором zlib пишет формат gzip (заголовок и контрольная сумма)
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Z_SYNC_FLUSH отдает клиенту все данные фрагмента, не дожидаясь следующего
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+# Кодировки в порядке предпочтения сервера: кодировщик, уровень для потокового сжатия
+# и уровень для ответов, сжатый вариант которых сохраняется в кэше (сжимаются один раз)
+_ENCODERS: Dict[str, Tuple[Any, Optional[int], int]] = {}
+if brotli is not None:
+    _ENCODERS["br"] = (_BrotliEncoder, 4, 11)
+if zstandard is not None:
+    _ENCODERS["zstd"] = (_ZstdEncoder, 3, 19)
+# Уровень gzip для потокового сжатия задается параметром compression_level
+_ENCODERS["gzip"] = (_GzipEncoder, None, 9)
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Возвращает кодировки, для которых установлены библиотеки, в порядке предпочтения"""
+    return tuple(_ENCODERS)
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str, encodings: Tuple[str, ...]) -> Optional[str]:
+    """
+    Выбирает кодировку ответа по заголовку Accept-Encoding
+
+    Args:
+        accept_encoding: Значение заголовка Accept-Encoding
+        encodings: Поддерживаемые кодировки в порядке предпочтения сервера
+
+    Returns:
+        Кодировка с наибольшим весом q у клиента (при равных весах - по порядку сервера)
+        или None, если клиент не принимает ни одну из них
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class PrecompressedCache:
+    """
+    Кэш сжатых тел ответов.
+
+    Ключ - хеш исходного тела и кодировка, поэтому одинаковые ответы разным
+    пользователям сжимаются один раз, а изменившийся ответ получает новый ключ.
+    Размер ограничен суммарным объемом сжатых данных, вытесняются давно
+    не использованные записи.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Максимальный суммарный объем сжатых данных в байтах
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(body: bytes) -> bytes:
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, digest: bytes, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            compressed = self._entries.get((digest, encoding))
+            if compressed is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((digest, encoding))
+            self.hits += 1
+            return compressed
+
+    def set(self, digest: bytes, encoding: str, compressed: bytes) -> None:
+        if len(compressed) > self.max_bytes:
+            return
+        with self._lock:
+            key = (digest, encoding)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = compressed
+            self._bytes += len(compressed)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает размер кэша и долю попаданий"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "encodings": list(available_encodings()),
+            }
+
+
+# Глобальный кэш сжатых ответов
+precompressed_cache = PrecompressedCache(max_bytes=settings.COMPRESSION_CACHE_MAX_BYTES)
+
 
-class GzipMiddleware(BaseHTTPMiddleware):
+class GzipMiddleware:
     """
-    Middleware для сжатия ответов с помощью gzip
-    
-    Этот middleware проверяет, поддерживает ли клиент gzip (наличие заголовка Accept-Encoding: gzip)
-    и сжимает ответ, если его размер превышает минимальный порог.
+    ASGI middleware для сжатия ответов (gzip, а также br и zstd, если установлены brotli и zstandard)
+
+    Этот middleware выбирает кодировку по заголовку Accept-Encoding (предпочитая br и zstd,
+    если клиент принимает их с тем же весом, что и gzip) и сжимает ответ,
+    если его размер превышает минимальный порог.
+
+    Ответ сжимается по мере отправки: каждое сообщение http.response.body сжимается
+    отдельно и сразу передается клиенту, поэтому StreamingResponse и FileResponse
+    не собираются в памяти целиком. Фрагменты больше offload_threshold сжимаются
+    в пуле потоков, чтобы не блокировать цикл событий.
+
+    Ответы путей из precompress_paths (одинаковые для всех пользователей справочники
+    и схема OpenAPI) сжимаются с максимальным уровнем один раз: результат хранится
+    в precompressed_cache по хешу тела и кодировке.
     """
     def __init__(
-        self, 
-        app: ASGIApp, 
+        self,
+        app: ASGIApp,
         minimum_size: int = 1000,
         compression_level: int = 6,
         exclude_paths: Optional[list] = None,
-        exclude_content_types: Optional[list] = None
+        exclude_content_types: Optional[list] = None,
+        offload_threshold: int = 64 * 1024,
+        precompress_paths: Optional[list] = None,
+        encodings: Optional[list] = None
     ):
         """
-        Инициализация middleware для сжатия gzip
-        
+        Инициализация middleware для сжатия
+
         Args:
             app: ASGI приложение
             minimum_size: Минимальный размер ответа для сжатия (в байтах)
             compression_level: Уровень сжатия gzip (1-9)
             exclude_paths: Список путей, которые не нужно сжимать
             exclude_content_types: Список типов контента, которые не нужно сжимать
+            offload_threshold: Размер фрагмента (в байтах), начиная с которого сжатие выполняется в отдельном потоке
+            precompress_paths: Список путей, сжатые ответы которых сохраняются в кэше
+            encodings: Разрешенные кодировки в порядке предпочтения (по умолчанию все доступные)
         """
-        super().__init__(app)
+        self.app = app
         self.minimum_size = minimum_size
         self.compression_level = compression_level
-        self.exclude_paths = exclude_paths or ["/docs", "/openapi.json", "/redoc"]
-        self.exclude_content_types = exclude_content_types or [
+        self.offload_threshold = offload_threshold
+        # Префиксы собираются в кортежи один раз, чтобы проверять их одним вызовом startswith
+        self.exclude_paths = tuple(exclude_paths or ["/docs", "/openapi.json", "/redoc"])
+        self.exclude_content_types = tuple(exclude_content_types or [
             "image/", "video/", "audio/", "application/zip", "application/gzip"
-        ]
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        ])
+        self.precompress_paths = tuple(precompress_paths or [
+            "/api/v1/categories",
+            "/api/v1/equipment",
+            "/api/v1/users/basic",
+            "/api/v1/openapi.json"
+        ])
+        self.encodings = tuple(
+            encoding for encoding in (encodings or available_encodings()) if encoding in _ENCODERS
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Проверяем, нужно ли исключить этот запрос из сжатия
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
-        
-        # Проверяем, поддерживает ли клиент gzip
-        accept_encoding = request.headers.get("Accept-Encoding", "")
-        if "gzip" not in accept_encoding.lower():
-            return await call_next(request)
-        
-        # Получаем оригинальный ответ
-        response = await call_next(request)
-        
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        # Выбираем кодировку, которую поддерживает клиент
+        encoding = None
+        if scope["method"] != "HEAD":
+            accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+            encoding = negotiate_encoding(accept_encoding, self.encodings) if accept_encoding else None
+        precompress = scope["path"].startswith(self.precompress_paths)
+
+        start_message: Optional[Message] = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, encoder, passthrough
+
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not self._is_compressible(message["status"], headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Ответ зависит от Accept-Encoding, даже если этот клиент получит его несжатым
+                headers.add_vary_header("Accept-Encoding")
+                content_length = headers.get("Content-Length")
+                if encoding is None or (content_length is not None and int(content_length) < self.minimum_size):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Откладываем заголовки до первого фрагмента тела
+                start_message = message
+                return
+
+            if passthrough or start_message is None or message_type != "http.response.body":
+                if start_message is not None and encoder is None:
+                    # Например, http.response.pathsend: тело отправляет сервер, сжать его нельзя
+                    await send(start_message)
+                    start_message = None
+                    passthrough = True
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = MutableHeaders(scope=start_message)
+                if not more_body:
+                    passthrough = True
+                    compressed_body = None
+                    if len(body) >= self.minimum_size:
+                        if precompress:
+                            compressed_body = await self._compress_cached(body, encoding)
+                        else:
+                            compressed_body = await self._compress(self._encoder(encoding), body, final=True)
+                    # Если сжатие не дало выигрыша, отправляем оригинальный ответ
+                    if compressed_body is not None and len(compressed_body) < len(body):
+                        headers["Content-Encoding"] = encoding
+                        headers["Content-Length"] = str(len(compressed_body))
+                        logger.debug(f"Compressed response ({encoding}) from {len(body)} to {len(compressed_body)} bytes")
+                        message = {"type": "http.response.body", "body": compressed_body}
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                # Итоговый размер заранее неизвестен, ответ передается по частям
+                encoder = self._encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                if "Content-Length" in headers:
+                    del headers["Content-Length"]
+                await send(start_message)
+
+            compressed_body = await self._compress(encoder, body, final=not more_body)
+            await send({"type": "http.response.body", "body": compressed_body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _is_compressible(self, status_code: int, headers: Headers) -> bool:
+        """Проверяет по статусу и заголовкам ответа, можно ли его сжимать"""
+        # Ответы без тела и частичные ответы не сжимаются
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+
         # Проверяем, не исключен ли тип контента
-        content_type = response.headers.get("Content-Type", "")
-        if any(content_type.startswith(excluded) for excluded in self.exclude_content_types):
-            return response
-        
-        # Если размер ответа неизвестен или меньше минимального,
-        # или контент-кодирование уже установлено, возвращаем оригинальный ответ
-        if (
-            "Content-Length" not in response.headers or
-            int(response.headers["Content-Length"]) < self.minimum_size or
-            "Content-Encoding" in response.headers
-        ):
-            return response
-        
-        # Сжимаем тело ответа
-        try:
-            body = b"" if response.body is None else response.body
-            compressed_body = self._compress(body)
-            
-            # Если сжатие не дало выигрыша, возвращаем оригинальный ответ
-            if len(compressed_body) >= len(body):
-                return response
-            
-            # Создаем новый ответ со сжатым телом
-            new_response = Response(
-                content=compressed_body,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type
-            )
-            
-            # Обновляем заголовки
-            new_response.headers["Content-Encoding"] = "gzip"
-            new_response.headers["Content-Length"] = str(len(compressed_body))
-            new_response.headers["Vary"] = "Accept-Encoding"
-            
-            logger.debug(f"Compressed response from {len(body)} to {len(compressed_body)} bytes")
-            return new_response
-        
-        except Exception as e:
-            # В случае ошибки сжатия, логируем и возвращаем оригинальный ответ
-            logger.error(f"Error compressing response: {str(e)}")
-            return response
-    
-    def _compress(self, data: bytes) -> bytes:
+        if headers.get("Content-Type", "").startswith(self.exclude_content_types):
+            return False
+
+        # Если контент-кодирование уже установлено, ответ не сжимается
+        return "Content-Encoding" not in headers
+
+    def _encoder(self, encoding: str, cached: bool = False):
+        """Создает кодировщик для одного ответа"""
+        encoder_class, stream_level, cached_level = _ENCODERS[encoding]
+        if cached:
+            return encoder_class(cached_level)
+        return encoder_class(stream_level if stream_level is not None else self.compression_level)
+
+    async def _compress(self, encoder, data: bytes, final: bool) -> bytes:
         """
-        Сжимает данные с помощью gzip
-        
+        Сжимает очередной фрагмент тела ответа
+
         Args:
-            data: Исходные данные для сжатия
-            
+            encoder: Кодировщик этого ответа
+            data: Исходные данные фрагмента
+            final: Последний ли это фрагмент
+
         Returns:
-            Сжатые данные
+            Сжатые данные, которые можно сразу отправить клиенту
         """
-        buffer = BytesIO()
-        with gzip.GzipFile(
-            fileobj=buffer, 
-            mode="wb",
-            compresslevel=self.compression_level
-        ) as gzip_file:
-            gzip_file.write(data)
-        
-        return buffer.getvalue() 
\ No newline at end of file
+        if len(data) >= self.offload_threshold:
+            return await anyio.to_thread.run_sync(encoder.compress, data, final)
+        return encoder.compress(data, final)
+
+    async def _compress_cached(self, body: bytes, encoding: str) -> bytes:
+        """Возвращает сжатое тело из кэша или сжимает его с максимальным уровнем и сохраняет"""
+        digest = precompressed_cache.digest(body)
+        compressed_body = precompressed_cache.get(digest, encoding)
+        if compressed_body is None:
+            # Максимальные уровни медленные, поэтому сжатие всегда выполняется в отдельном потоке
+            encoder = self._encoder(encoding, cached=True)
+            compressed_body = await anyio.to_thread.run_sync(encoder.compress, body, True)
+            precompressed_cache.set(digest, encoding, compressed_body)
+        return compressed_body
@@ -25,6 +25,7 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
     
     # Развернутый список разрешенных источников CORS
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -80,7 +81,96 @@ class Settings(BaseSettings):
     # Настройки для оптимизации
     DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "5"))
     DATABASE_POOL_TIMEOUT: int = int(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
-    
+
+    # Кэш аутентифицированных пользователей (время жизни в секундах и размер)
+    PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+    # Кэш проверенных JWT-токенов (0 отключает кэш)
+    VERIFIED_TOKEN_CACHE_SIZE: int = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "2048"))
+
+    # Отзыв токенов: размер фильтра Блума в битах, интервал его перестроения
+    # и очистки таблицы (в секундах), размер пачки при очистке
+    TOKEN_REVOCATION_FILTER_BITS: int = int(os.getenv("TOKEN_REVOCATION_FILTER_BITS", str(1 << 20)))
+    TOKEN_REVOCATION_SYNC_INTERVAL: int = int(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "60"))
+    TOKEN_REVOCATION_PURGE_BATCH: int = int(os.getenv("TOKEN_REVOCATION_PURGE_BATCH", "500"))
+
+    # Хранилище серверного кэша результатов: "memory" (память процесса),
+    # "sqlite" (общий файл для всех процессов, путь в CACHE_URL) или "redis" (URL в CACHE_URL).
+    # Смена CACHE_VERSION делает недоступными записи, сохраненные прежней версией
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL: str = os.getenv("CACHE_URL", "")
+    CACHE_NAMESPACE: str = os.getenv("CACHE_NAMESPACE", "ticket-system")
+    CACHE_VERSION: str = os.getenv("CACHE_VERSION", "1")
+
+    # Ограничения серверного кэша результатов (количество записей и объем в байтах)
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Доля операций с кэшем, попадающих в отладочный лог (0 отключает записи)
+    CACHE_LOG_SAMPLE_RATE: float = float(os.getenv("CACHE_LOG_SAMPLE_RATE", "0.01"))
+
+    # Локальный кэш каждого процесса для часто читаемых справочных данных
+    L1_CACHE_MAX_ENTRIES: int = int(os.getenv("L1_CACHE_MAX_ENTRIES", "1000"))
+    L1_CACHE_MAX_BYTES: int = int(os.getenv("L1_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+    # Шина инвалидации кэша между воркерами: "none" (один процесс), "sqlite"
+    # (общий файл, путь в INVALIDATION_BUS_URL) или "postgres" (LISTEN/NOTIFY,
+    # по умолчанию DATABASE_URL); интервал опроса SQLite и время хранения сообщений
+    INVALIDATION_BUS: str = os.getenv("INVALIDATION_BUS", "none")
+    INVALIDATION_BUS_URL: str = os.getenv("INVALIDATION_BUS_URL", "")
+    INVALIDATION_BUS_POLL_MS: int = int(os.getenv("INVALIDATION_BUS_POLL_MS", "20"))
+    INVALIDATION_BUS_RETENTION: int = int(os.getenv("INVALIDATION_BUS_RETENTION", "300"))
+
+    # Количество воркеров приложения (та же переменная, что у gunicorn и uvicorn --workers)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # Серверный кэш готовых ответов для справочных эндпоинтов: включен ли он, время жизни
+    # ответов в секундах, количество записей и объем в байтах
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    # Общие для воркеров лимиты запросов: "local" (отдельно в каждом процессе), "sqlite"
+    # (общий файл, путь в RATE_LIMIT_URL) или "redis" (URL в RATE_LIMIT_URL); сколько токенов
+    # процесс берет из хранилища за раз и сколько миллисекунд может их расходовать,
+    # через сколько секунд повторить обращение к недоступному хранилищу
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "local")
+    RATE_LIMIT_URL: str = os.getenv("RATE_LIMIT_URL", "")
+    RATE_LIMIT_LEASE_SIZE: int = int(os.getenv("RATE_LIMIT_LEASE_SIZE", "10"))
+    RATE_LIMIT_LEASE_MS: int = int(os.getenv("RATE_LIMIT_LEASE_MS", "1000"))
+    RATE_LIMIT_BACKEND_RETRY: int = int(os.getenv("RATE_LIMIT_BACKEND_RETRY", "5"))
+
+    # Контроль допуска запросов к API: сколько запросов выполняется одновременно
+    # (по умолчанию размер пула соединений плюс переполнение SQLAlchemy, 0 отключает контроль),
+    # сколько из них могут занимать отчеты и журнал аудита, допустимая задержка в очереди
+    # и интервал ее оценки, максимальное время ожидания (в миллисекундах)
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", str(DATABASE_POOL_SIZE + 10)))
+    ADMISSION_LOW_PRIORITY_LIMIT: int = int(os.getenv("ADMISSION_LOW_PRIORITY_LIMIT", str(max(1, ADMISSION_MAX_CONCURRENCY // 3))))
+    ADMISSION_TARGET_DELAY_MS: int = int(os.getenv("ADMISSION_TARGET_DELAY_MS", "50"))
+    ADMISSION_INTERVAL_MS: int = int(os.getenv("ADMISSION_INTERVAL_MS", "500"))
+    ADMISSION_MAX_WAIT_MS: int = int(os.getenv("ADMISSION_MAX_WAIT_MS", "10000"))
+    ADMISSION_LOW_PRIORITY_MAX_WAIT_MS: int = int(os.getenv("ADMISSION_LOW_PRIORITY_MAX_WAIT_MS", "1000"))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+    # Bulkhead-ы: сколько синхронных обработчиков роутеров заявок и оборудования
+    # может выполняться одновременно (отдельно от общего пула потоков на 40 мест)
+    BULKHEAD_TICKETS_THREADS: int = int(os.getenv("BULKHEAD_TICKETS_THREADS", "16"))
+    BULKHEAD_EQUIPMENT_THREADS: int = int(os.getenv("BULKHEAD_EQUIPMENT_THREADS", "8"))
+
+    # Срок выполнения запросов к API и отдельно к отчетам и журналу аудита
+    # (в миллисекундах, 0 отключает срок); по его истечении запрос к БД прерывается
+    REQUEST_DEADLINE_MS: int = int(os.getenv("REQUEST_DEADLINE_MS", "10000"))
+    REPORT_REQUEST_DEADLINE_MS: int = int(os.getenv("REPORT_REQUEST_DEADLINE_MS", "15000"))
+
+    # Объем кэша сжатых ответов для справочников и схемы OpenAPI (в байтах)
+    COMPRESSION_CACHE_MAX_BYTES: int = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    # Пул для хеширования паролей (количество потоков и размер очереди ожидания)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+
     # Токен для Telegram бота
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
 
@@ -0,0 +1,218 @@
+import math
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.util import await_only
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import get_logger
+
+logger = get_logger("deadline")
+
+# SQLSTATE отмены запроса в PostgreSQL (в том числе по statement_timeout)
+_QUERY_CANCELED = "57014"
+
+# Через сколько инструкций виртуальной машины SQLite проверять срок запроса
+_SQLITE_PROGRESS_STEPS = 1000
+
+_DETAIL = "Превышено время обработки запроса"
+
+
+class Deadline:
+    """Срок выполнения запроса (по time.monotonic) и признак того, что он был превышен"""
+
+    __slots__ = ("timeout", "expires_at", "exceeded")
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.exceeded = False
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def disarm(self) -> None:
+        """Снимает срок: фоновые задачи наследуют контекст запроса, но не должны прерываться"""
+        self.expires_at = math.inf
+
+
+class DeadlineExceeded(HTTPException):
+    """Срок запроса истек во время работы с БД (ответ 504)"""
+
+    def __init__(self, deadline: Deadline):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=_DETAIL)
+        self.deadline = deadline
+
+
+# Срок текущего запроса; переходит в потоки обработчиков и в greenlet-ы асинхронных сессий
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Возвращает срок текущего запроса или None, если он не задан"""
+    return _current_deadline.get()
+
+
+def install_deadline_hooks(engine: Engine) -> None:
+    """
+    Ограничивает запросы к БД сроком текущего HTTP-запроса
+
+    SQLite: обработчик прогресса прерывает запрос, когда срок истек. Он вызывается
+    в потоке драйвера (у aiosqlite - в собственном потоке), поэтому срок передается
+    через info записи пула при выдаче соединения. PostgreSQL: в начале транзакции
+    устанавливается SET LOCAL statement_timeout на оставшееся время.
+    Ошибка прерванного запроса заменяется на DeadlineExceeded.
+
+    Args:
+        engine: Синхронный движок (для асинхронного - async_engine.sync_engine)
+    """
+    dialect = engine.dialect
+
+    if dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _install_progress_handler(dbapi_connection: Any, connection_record: Any) -> None:
+            info = connection_record.info
+
+            def check_deadline() -> int:
+                deadline = info.get("deadline")
+                if deadline is not None and deadline.expired():
+                    deadline.exceeded = True
+                    return 1
+                return 0
+
+            if dialect.is_async:
+                await_only(connection_record.driver_connection.set_progress_handler(
+                    check_deadline, _SQLITE_PROGRESS_STEPS
+                ))
+            else:
+                dbapi_connection.set_progress_handler(check_deadline, _SQLITE_PROGRESS_STEPS)
+
+        @event.listens_for(engine, "checkout")
+        def _bind_deadline(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+            connection_record.info["deadline"] = current_deadline()
+
+        @event.listens_for(engine, "checkin")
+        def _unbind_deadline(dbapi_connection: Any, connection_record: Any) -> None:
+            if connection_record is not None:
+                connection_record.info.pop("deadline", None)
+
+    elif dialect.name == "postgresql":
+        @event.listens_for(engine, "begin")
+        def _set_statement_timeout(conn: Any) -> None:
+            deadline = current_deadline()
+            if deadline is not None:
+                timeout_ms = max(1, int(deadline.remaining() * 1000))
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _check_deadline(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        # Не начинаем новый запрос, если срок уже истек
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired():
+            deadline.exceeded = True
+            raise DeadlineExceeded(deadline)
+
+    @event.listens_for(engine, "handle_error")
+    def _translate_interrupt(context: Any) -> None:
+        deadline = current_deadline()
+        if deadline is None:
+            return
+        original = context.original_exception
+        sqlstate = getattr(original, "pgcode", None) or getattr(original, "sqlstate", None)
+        if deadline.exceeded or deadline.expired() or sqlstate == _QUERY_CANCELED:
+            deadline.exceeded = True
+            logger.warning(f"Database statement interrupted after {deadline.timeout:.1f} s deadline")
+            raise DeadlineExceeded(deadline) from original
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware, задающий срок выполнения запросов к API.
+
+    Срок выбирается по самому длинному совпавшему префиксу пути из route_timeouts
+    (или default_timeout) и хранится в контекстной переменной, откуда его берут
+    обработчики событий движков БД (install_deadline_hooks). Если срок истек,
+    а обработчик превратил ошибку БД в ответ 500, ответ заменяется на 504.
+    После отправки ответа срок снимается, чтобы не прерывать фоновые задачи.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_timeout: float,
+        route_timeouts: Optional[Dict[str, float]] = None,
+        include_paths: tuple = ("/api/",),
+        exclude_paths: tuple = ()
+    ):
+        """
+        Args:
+            app: ASGI приложение
+            default_timeout: Срок выполнения запроса в секундах (0 отключает сроки)
+            route_timeouts: Сроки в секундах по префиксам путей
+            include_paths: Префиксы путей, к которым применяются сроки
+            exclude_paths: Префиксы путей без срока
+        """
+        self.app = app
+        self.default_timeout = default_timeout
+        self.route_timeouts = dict(route_timeouts or {})
+        self.include_paths = tuple(include_paths)
+        self.exclude_paths = tuple(exclude_paths)
+        # Более длинные префиксы проверяются первыми
+        prefixes = sorted(self.route_timeouts, key=len, reverse=True)
+        self._timeouts_regex = re.compile("|".join(re.escape(prefix) for prefix in prefixes) or r"(?!)")
+
+    def _timeout(self, path: str) -> float:
+        match = self._timeouts_regex.match(path)
+        return self.route_timeouts[match.group(0)] if match is not None else self.default_timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or not path.startswith(self.include_paths)
+            or path.startswith(self.exclude_paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self._timeout(path)
+        if timeout <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(timeout)
+        replaced = False
+
+        async def send_with_deadline(message: Message) -> None:
+            nonlocal replaced
+            if message["type"] == "http.response.start" and deadline.exceeded and message["status"] >= 500:
+                replaced = message["status"] != status.HTTP_504_GATEWAY_TIMEOUT
+            if replaced:
+                if message["type"] == "http.response.start":
+                    response = JSONResponse(
+                        content={"detail": _DETAIL},
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT
+                    )
+                    await response(scope, receive, send)
+                    deadline.disarm()
+                # Тело исходного ответа 500 не отправляется
+                return
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                deadline.disarm()
+
+        token = _current_deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send_with_deadline)
+        finally:
+            deadline.disarm()
+            _current_deadline.reset(token)
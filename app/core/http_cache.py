@@ -1,21 +1,76 @@
-from typing import Callable, Dict, List, Optional, Union
+import hashlib
+import re
+import time
+from typing import Dict, List, Optional, Union
 from datetime import timedelta
+from wsgiref.handlers import format_date_time
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.logging import get_logger
 
 logger = get_logger("http_cache")
 
 
-class HTTPCacheMiddleware(BaseHTTPMiddleware):
+def make_etag(body: bytes) -> str:
+    """Возвращает сильный ETag для тела ответа"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Проверяет, совпадает ли ETag с одним из значений заголовка If-None-Match
+    
+    Для If-None-Match используется слабое сравнение: префикс W/ не учитывается.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified_response(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """
+    Проверяет ETag, построенный обработчиком до обращения к БД
+
+    Args:
+        request: Объект запроса
+        response: Ответ обработчика, в который добавляется ETag
+        etag: ETag текущей версии данных (None, если версия неизвестна)
+
+    Returns:
+        Ответ 304 Not Modified, если клиент уже получил эту версию, иначе None
     """
-    Middleware для добавления HTTP-заголовков кэширования в ответы.
+    if etag is None:
+        return None
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+class HTTPCacheMiddleware:
+    """
+    ASGI middleware для добавления HTTP-заголовков кэширования в ответы.
     
     Это позволяет клиентам (браузерам, мобильным приложениям) кэшировать ответы
     и не делать повторных запросов, что снижает нагрузку на сервер.
+    Заголовки добавляются в сообщение http.response.start, тело ответа
+    передается клиенту без изменений. Правила путей компилируются при создании.
+    
+    Успешные ответы на GET-запросы получают сильный ETag (хеш тела или значение,
+    заданное обработчиком), и при совпадении с If-None-Match клиент получает
+    304 Not Modified без тела. Потоковые ответы без заданного ETag не хешируются.
     """
     
     def __init__(
@@ -24,7 +79,8 @@ class HTTPCacheMiddleware(BaseHTTPMiddleware):
         cache_control_by_path: Optional[Dict[str, Dict[str, Union[str, int]]]] = None,
         cache_paths_regex: Optional[List[str]] = None,
         default_max_age: int = 60,  # 1 минута по умолчанию
-        exclude_paths: Optional[List[str]] = None
+        exclude_paths: Optional[List[str]] = None,
+        etags: bool = True
     ):
         """
         Инициализация middleware для HTTP-кэширования
@@ -35,11 +91,13 @@ class HTTPCacheMiddleware(BaseHTTPMiddleware):
             cache_paths_regex: Список регулярных выражений для путей, которые нужно кэшировать
             default_max_age: Время кэширования по умолчанию (в секундах)
             exclude_paths: Список путей, которые не нужно кэшировать
+            etags: Добавлять ли ETag к ответам на GET-запросы и отвечать 304 на совпадающий If-None-Match
         """
-        super().__init__(app)
+        self.app = app
+        self.etags = etags
         self.cache_control_by_path = cache_control_by_path or {}
         self.default_max_age = default_max_age
-        self.exclude_paths = exclude_paths or [
+        self.exclude_paths = tuple(exclude_paths or [
             "/api/v1/auth",
             "/api/v1/users/me",
             # Все действия с заявками (изменение статуса, назначение, создание)
@@ -47,7 +105,7 @@ class HTTPCacheMiddleware(BaseHTTPMiddleware):
             "/api/v1/tickets/assign",  # Назначение заявки
             "/api/v1/tickets/status",  # Изменение статуса
             "/api/v1/tickets/close"  # Закрытие заявки
-        ]
+        ])
         
         # Пути, которые не изменяются и могут кэшироваться дольше
         self.static_paths = [
@@ -76,96 +134,160 @@ class HTTPCacheMiddleware(BaseHTTPMiddleware):
             "/api/v1/monitoring/system",
             "/api/v1/monitoring/database"
         ]
+        
+        self._compile_rules()
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # ETag считается для всех GET-запросов, в том числе для путей без Cache-Control:
+        # ответ с данными пользователя браузер может хранить у себя и проверять по ETag
+        use_etag = self.etags and scope["method"] == "GET"
         # Пропускаем пути, которые не нужно кэшировать
-        if self._should_skip_cache(request):
-            return await call_next(request)
+        skip_cache = self._should_skip_cache(scope)
+        if skip_cache and not use_etag:
+            await self.app(scope, receive, send)
+            return
         
-        # Получаем оригинальный ответ
-        response = await call_next(request)
+        path = scope["path"]
+        if_none_match = Headers(scope=scope).get("If-None-Match") if use_etag else None
+        start_message: Optional[Message] = None
+        not_modified = False
         
-        # Добавляем заголовки кэширования только для GET-запросов с успешным ответом
-        if request.method == "GET" and 200 <= response.status_code < 300:
-            self._add_cache_headers(request, response)
-        else:
-            # Для других методов и статусов запрещаем кэширование
-            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-            response.headers["Pragma"] = "no-cache"
+        async def send_not_modified(message: Message) -> None:
+            # Ответ 304 повторяет заголовки кэширования, но не содержит тела
+            headers = MutableHeaders(scope=message)
+            for name in ("Content-Length", "Content-Type", "Content-Encoding"):
+                if name in headers:
+                    del headers[name]
+            message["status"] = 304
+            await send(message)
+            await send({"type": "http.response.body", "body": b""})
+        
+        async def send_with_cache_headers(message: Message) -> None:
+            nonlocal start_message, not_modified
+            
+            if not_modified:
+                # Тело исходного ответа клиенту не нужно
+                return
+            
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not skip_cache:
+                    # Добавляем заголовки кэширования только для успешных ответов
+                    if 200 <= message["status"] < 300:
+                        self._add_cache_headers(path, headers)
+                    else:
+                        # Для остальных статусов запрещаем кэширование
+                        headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+                        headers["Pragma"] = "no-cache"
+                
+                if not use_etag or message["status"] != 200:
+                    await send(message)
+                    return
+                
+                etag = headers.get("ETag")
+                if etag is not None:
+                    # ETag задан обработчиком (например, по версии ресурса), тело не хешируется
+                    if if_none_match is not None and etag_matches(if_none_match, etag):
+                        not_modified = True
+                        await send_not_modified(message)
+                        return
+                    await send(message)
+                    return
+                
+                # Откладываем заголовки, пока не станет известно тело ответа
+                start_message = message
+                return
+            
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            pending, start_message = start_message, None
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Потоковый ответ: хеш тела станет известен только после отправки заголовков
+                await send(pending)
+                await send(message)
+                return
+            
+            etag = make_etag(body)
+            MutableHeaders(scope=pending)["ETag"] = etag
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                not_modified = True
+                await send_not_modified(pending)
+                return
+            await send(pending)
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_cache_headers)
     
-    def _should_skip_cache(self, request: Request) -> bool:
+    def _should_skip_cache(self, scope: Scope) -> bool:
         """Проверяет, нужно ли пропустить кэширование для этого запроса"""
         # Пропускаем запросы с методами, отличными от GET
-        if request.method != "GET":
+        if scope["method"] != "GET":
             return True
         
         # Пропускаем запросы, содержащие заголовок Cache-Control: no-cache
-        cache_control = request.headers.get("Cache-Control", "")
+        cache_control = Headers(scope=scope).get("Cache-Control", "")
         if "no-cache" in cache_control or "no-store" in cache_control:
             return True
         
         # Пропускаем исключенные пути
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
+        if scope["path"].startswith(self.exclude_paths):
             return True
         
         return False
     
-    def _add_cache_headers(self, request: Request, response: Response) -> None:
+    def _add_cache_headers(self, path: str, headers: MutableHeaders) -> None:
         """Добавляет заголовки кэширования в ответ"""
-        path = request.url.path
-        
         # Проверяем, есть ли для пути специальные настройки Cache-Control
         if path in self.cache_control_by_path:
             cache_settings = self.cache_control_by_path[path]
             cache_control = cache_settings.get("Cache-Control")
             if cache_control:
-                response.headers["Cache-Control"] = cache_control
+                headers["Cache-Control"] = cache_control
                 logger.debug(f"Added custom Cache-Control for {path}: {cache_control}")
                 return
         
-        # Статические пути кэшируются дольше
-        if any(path.startswith(static_path) for static_path in self.static_paths):
-            max_age = 86400  # 24 часа
-            response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate=60"
-            response.headers["Expires"] = self._format_expires(timedelta(seconds=max_age))
-            logger.debug(f"Added Cache-Control for static path {path}: max-age={max_age}")
-            return
-        
-        # Полустатические пути
-        if any(path.startswith(semi_static) for semi_static in self.semi_static_paths):
-            max_age = 3600  # 1 час
-            response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate=60"
-            response.headers["Expires"] = self._format_expires(timedelta(seconds=max_age))
-            logger.debug(f"Added Cache-Control for semi-static path {path}: max-age={max_age}")
-            return
-        
-        # Пути статистики кэшируются на среднее время
-        if any(path.startswith(stats_path) for stats_path in self.statistics_paths):
-            max_age = 300  # 5 минут
-            response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate=60"
-            response.headers["Expires"] = self._format_expires(timedelta(seconds=max_age))
-            logger.debug(f"Added Cache-Control for statistics path {path}: max-age={max_age}")
-            return
+        # Первая подходящая группа путей определяет время кэширования
+        match = self._rules_regex.match(path)
+        if match is not None:
+            kind, max_age, stale = self._rules[match.lastgroup]
+        else:
+            kind, max_age, stale = "default", self.default_max_age, 30
         
-        # Пути мониторинга кэшируются на короткое время
-        if any(path.startswith(monitor_path) for monitor_path in self.monitoring_paths):
-            max_age = 30  # 30 секунд
-            response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate=10"
-            response.headers["Expires"] = self._format_expires(timedelta(seconds=max_age))
-            logger.debug(f"Added Cache-Control for monitoring path {path}: max-age={max_age}")
-            return
+        headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate={stale}"
+        headers["Expires"] = self._format_expires(timedelta(seconds=max_age))
+        logger.debug(f"Added Cache-Control for {kind} path {path}: max-age={max_age}")
+    
+    def _compile_rules(self) -> None:
+        """
+        Собирает группы путей в одно регулярное выражение.
         
-        # По умолчанию кэшируем на короткое время
-        response.headers["Cache-Control"] = f"public, max-age={self.default_max_age}, stale-while-revalidate=30"
-        response.headers["Expires"] = self._format_expires(timedelta(seconds=self.default_max_age))
-        logger.debug(f"Added default Cache-Control for {path}: max-age={self.default_max_age}")
+        Альтернативы проверяются по порядку, поэтому имя совпавшей группы
+        соответствует первой подходящей группе, как при последовательной проверке.
+        """
+        groups = [
+            # Статические пути кэшируются дольше
+            ("static", self.static_paths, 86400, 60),  # 24 часа
+            # Полустатические пути
+            ("semi_static", self.semi_static_paths, 3600, 60),  # 1 час
+            # Пути статистики кэшируются на среднее время
+            ("statistics", self.statistics_paths, 300, 60),  # 5 минут
+            # Пути мониторинга кэшируются на короткое время
+            ("monitoring", self.monitoring_paths, 30, 10),  # 30 секунд
+        ]
+        self._rules = {kind: (kind, max_age, stale) for kind, _, max_age, stale in groups}
+        self._rules_regex = re.compile("|".join(
+            f"(?P<{kind}>{'|'.join(re.escape(path) for path in paths)})"
+            for kind, paths, _, _ in groups if paths
+        ) or r"(?!)")
     
     def _format_expires(self, delta: timedelta) -> str:
         """Форматирует заголовок Expires с указанным временем жизни"""
-        import time
-        from wsgiref.handlers import format_date_time
-        
         expire_time = time.time() + delta.total_seconds()
-        return format_date_time(expire_time) 
\ No newline at end of file
+        return format_date_time(expire_time) 
@@ -0,0 +1,366 @@
+import json
+import os
+import queue
+import re
+import socket
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+logger = get_logger("invalidation_bus")
+
+# Обработчик полученных тегов и обработчик потери сообщений
+TagsHandler = Callable[[List[str]], None]
+ResetHandler = Callable[[], None]
+
+
+class InvalidationBus(ABC):
+    """
+    Шина инвалидации кэша между процессами (воркерами).
+
+    Каждый процесс публикует теги, инвалидированные у себя, и получает теги,
+    опубликованные другими процессами, чтобы удалить соответствующие записи
+    из своего кэша в памяти. Если сообщения были потеряны, вызывается
+    обработчик сброса, который очищает локальный кэш целиком.
+    Публикация не блокирует обработчик запроса: сообщения отправляются
+    отдельным потоком, а накопившиеся теги объединяются в одно сообщение.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._on_tags: Optional[TagsHandler] = None
+        self._on_reset: Optional[ResetHandler] = None
+        self._lock = Lock()
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.resets = 0
+        self.errors = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self._outbox: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._sender: Optional[Thread] = None
+
+    def publish(self, tags: Iterable[str]) -> None:
+        """Публикует инвалидированные теги для других процессов"""
+        tags = list(tags)
+        if tags and self._sender is not None:
+            self._outbox.put((tags, time.time()))
+
+    @abstractmethod
+    def _send(self, tags: List[str], created_at: float) -> None:
+        """Отправляет сообщение с тегами другим процессам (вызывается потоком отправки)"""
+
+    def _send_loop(self) -> None:
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            batch = [item]
+            while True:
+                try:
+                    item = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._outbox.put(None)
+                    break
+                batch.append(item)
+            tags = sorted({tag for item_tags, _ in batch for tag in item_tags})
+            try:
+                self._send(tags, min(created_at for _, created_at in batch))
+                with self._lock:
+                    self.published += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Error publishing cache invalidation: {str(e)}")
+
+    def _start_sender(self) -> None:
+        if self._sender is None:
+            self._sender = Thread(target=self._send_loop, daemon=True, name="cache-invalidation-sender")
+            self._sender.start()
+
+    def _stop_sender(self) -> None:
+        if self._sender is not None:
+            self._outbox.put(None)
+            self._sender.join(timeout=5)
+            self._sender = None
+
+    def start(self, on_tags: TagsHandler, on_reset: ResetHandler) -> None:
+        """Запускает получение сообщений"""
+        self._on_tags = on_tags
+        self._on_reset = on_reset
+
+    def stop(self) -> None:
+        """Останавливает получение и отправку сообщений"""
+
+    def _deliver(self, tags: List[str], created_at: float) -> None:
+        lag = max(0.0, time.time() - created_at)
+        with self._lock:
+            self.received += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+        if self._on_tags is not None:
+            self._on_tags(tags)
+
+    def _lost(self, count: Optional[int]) -> None:
+        # count = None, если количество потерянных сообщений неизвестно
+        with self._lock:
+            self.dropped += count or 0
+            self.resets += 1
+        logger.warning(f"Cache invalidation messages lost ({count if count is not None else 'unknown'}), resetting local cache")
+        if self._on_reset is not None:
+            self._on_reset()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики сообщений и задержку доставки"""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "origin": self.origin,
+                "published": self.published,
+                "received": self.received,
+                "dropped": self.dropped,
+                "resets": self.resets,
+                "errors": self.errors,
+                "avg_lag_ms": self.total_lag / self.received * 1000 if self.received else 0.0,
+                "max_lag_ms": self.max_lag * 1000,
+            }
+
+
+class NullInvalidationBus(InvalidationBus):
+    """Шина для одного процесса: сообщения никуда не передаются и не приходят"""
+    name = "none"
+
+    def _send(self, tags: List[str], created_at: float) -> None:
+        pass
+
+
+class SQLiteInvalidationBus(InvalidationBus):
+    """
+    Шина на основе таблицы с возрастающим номером сообщения в общем файле SQLite.
+
+    Подходит для нескольких воркеров на одной машине. Каждый процесс опрашивает
+    таблицу с интервалом poll_interval и читает сообщения с номером больше
+    последнего прочитанного. Старые сообщения удаляются через retention секунд;
+    пропуск в номерах означает, что процесс не успел их прочитать.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, poll_interval: float = 0.02, retention: int = 300):
+        """
+        Args:
+            path: Путь к файлу SQLite
+            poll_interval: Интервал опроса в секундах
+            retention: Время хранения сообщений в секундах
+        """
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._publish_conn: Optional[sqlite3.Connection] = None
+        self._thread: Optional[Thread] = None
+        self._running = False
+        self._last_seq = 0
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_invalidations (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    origin TEXT NOT NULL,
+                    tags TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _send(self, tags: List[str], created_at: float) -> None:
+        if self._publish_conn is None:
+            self._publish_conn = self._connect()
+        self._publish_conn.execute(
+            "INSERT INTO cache_invalidations (origin, tags, created_at) VALUES (?, ?, ?)",
+            (self.origin, json.dumps(tags), created_at)
+        )
+
+    def start(self, on_tags: TagsHandler, on_reset: ResetHandler) -> None:
+        """Запоминает текущий номер сообщения и запускает опрос в отдельном потоке"""
+        super().start(on_tags, on_reset)
+        if self._running:
+            return
+        conn = self._connect()
+        try:
+            self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations").fetchone()[0]
+        finally:
+            conn.close()
+        self._running = True
+        self._thread = Thread(target=self._poll_loop, daemon=True, name="cache-invalidation-bus")
+        self._thread.start()
+        self._start_sender()
+
+    def stop(self) -> None:
+        self._stop_sender()
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _poll_loop(self) -> None:
+        conn = self._connect()
+        last_purge = time.monotonic()
+        while self._running:
+            try:
+                self._poll(conn)
+                if time.monotonic() - last_purge >= 10:
+                    last_purge = time.monotonic()
+                    conn.execute(
+                        "DELETE FROM cache_invalidations WHERE created_at < ?",
+                        (time.time() - self.retention,)
+                    )
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Error polling cache invalidations: {str(e)}")
+            time.sleep(self.poll_interval)
+        conn.close()
+
+    def _poll(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute(
+            "SELECT seq, origin, tags, created_at FROM cache_invalidations WHERE seq > ? ORDER BY seq LIMIT 1000",
+            (self._last_seq,)
+        ).fetchall()
+        for seq, origin, tags, created_at in rows:
+            if seq > self._last_seq + 1:
+                # Сообщения с пропущенными номерами уже удалены
+                self._lost(seq - self._last_seq - 1)
+            self._last_seq = seq
+            if origin != self.origin:
+                self._deliver(json.loads(tags), created_at)
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """
+    Шина на основе LISTEN/NOTIFY PostgreSQL для воркеров на разных машинах.
+
+    Сообщения содержат порядковый номер отправителя, поэтому пропущенные
+    сообщения обнаруживаются по разрыву в номерах. При переподключении
+    слушателя сообщения могли быть потеряны, и локальный кэш сбрасывается.
+    Требует пакет psycopg.
+    """
+    name = "postgres"
+    channel = "cache_invalidation"
+
+    def __init__(self, dsn: str):
+        """
+        Args:
+            dsn: Строка подключения к PostgreSQL
+        """
+        if psycopg is None:
+            raise RuntimeError("INVALIDATION_BUS=postgres requires the 'psycopg' package")
+        super().__init__()
+        # URL SQLAlchemy (postgresql+psycopg://...) приводим к виду, понятному psycopg
+        self.dsn = re.sub(r"^postgresql\+\w+://", "postgresql://", dsn)
+        self._seq = 0
+        self._last_seq_by_origin: Dict[str, int] = {}
+        self._publish_conn = None
+        self._thread: Optional[Thread] = None
+        self._running = False
+
+    def _send(self, tags: List[str], created_at: float) -> None:
+        if self._publish_conn is None or self._publish_conn.closed:
+            self._publish_conn = psycopg.connect(self.dsn, autocommit=True)
+        # Номер увеличивается до отправки: неудачная отправка видна получателям как потеря
+        self._seq += 1
+        payload = json.dumps({"o": self.origin, "s": self._seq, "t": tags, "ts": created_at})
+        self._publish_conn.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    def start(self, on_tags: TagsHandler, on_reset: ResetHandler) -> None:
+        """Запускает слушателя в отдельном потоке"""
+        super().start(on_tags, on_reset)
+        if self._running:
+            return
+        self._running = True
+        self._thread = Thread(target=self._listen_loop, daemon=True, name="cache-invalidation-bus")
+        self._thread.start()
+        self._start_sender()
+
+    def stop(self) -> None:
+        self._stop_sender()
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _listen_loop(self) -> None:
+        connected_before = False
+        while self._running:
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {self.channel}")
+                    if connected_before:
+                        # Пока слушатель был отключен, сообщения не доставлялись
+                        self._lost(None)
+                    connected_before = True
+                    while self._running:
+                        for notify in conn.notifies(timeout=1.0):
+                            self._handle(notify.payload)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+                time.sleep(1)
+
+    def _handle(self, payload: str) -> None:
+        message = json.loads(payload)
+        origin = message["o"]
+        if origin == self.origin:
+            return
+        last_seq = self._last_seq_by_origin.get(origin)
+        if last_seq is not None and message["s"] > last_seq + 1:
+            self._lost(message["s"] - last_seq - 1)
+        self._last_seq_by_origin[origin] = message["s"]
+        self._deliver(message["t"], message["ts"])
+
+
+def create_invalidation_bus(backend: Optional[str] = None) -> InvalidationBus:
+    """
+    Создает шину инвалидации по настройкам
+
+    Args:
+        backend: Тип шины ("none", "sqlite" или "postgres"), по умолчанию INVALIDATION_BUS
+    """
+    backend = backend or settings.INVALIDATION_BUS
+    if backend == "none":
+        return NullInvalidationBus()
+    if backend == "sqlite":
+        return SQLiteInvalidationBus(
+            settings.INVALIDATION_BUS_URL or "./cache_bus.db",
+            poll_interval=settings.INVALIDATION_BUS_POLL_MS / 1000,
+            retention=settings.INVALIDATION_BUS_RETENTION,
+        )
+    if backend == "postgres":
+        return PostgresInvalidationBus(settings.INVALIDATION_BUS_URL or settings.DATABASE_URL)
+    raise ValueError(f"Unknown invalidation bus: {backend}")
+
+
+# Глобальная шина инвалидации
+invalidation_bus = create_invalidation_bus()
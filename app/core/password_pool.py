@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("password_pool")
+
+
+class PasswordHashingPool:
+    """
+    Выделенный пул потоков для хеширования и проверки паролей (bcrypt).
+
+    bcrypt освобождает GIL, поэтому вычисления в отдельных потоках не блокируют
+    цикл событий. Количество одновременных вычислений ограничено числом потоков,
+    а очередь ожидания - max_queue. Если очередь заполнена, запрос сразу
+    отклоняется с кодом 503, вместо того чтобы копить задержку.
+    """
+    def __init__(self, max_workers: int = 2, max_queue: int = 32):
+        """
+        Инициализирует пул
+
+        Args:
+            max_workers: Максимальное количество одновременных вычислений
+            max_queue: Максимальное количество задач, ожидающих свободного потока
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = Lock()
+        self._queued = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет функцию в пуле и возвращает ее результат
+
+        Raises:
+            HTTPException: 503, если очередь ожидания заполнена
+        """
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                logger.warning(f"Password hashing queue is full ({self._queued} waiting), rejecting request")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Сервер перегружен, повторите попытку позже",
+                    headers={"Retry-After": "1"}
+                )
+            self._queued += 1
+
+        enqueued_at = time.monotonic()
+
+        def task():
+            started_at = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.monotonic()
+                self._record(started_at - enqueued_at, finished_at - started_at)
+
+        future = self._executor.submit(task)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Если задача еще не начала выполняться, убираем ее из очереди
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def _record(self, wait_time: float, run_time: float) -> None:
+        with self._lock:
+            self._running -= 1
+            self.completed += 1
+            self.total_wait_time += wait_time
+            self.total_run_time += run_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            self.max_run_time = max(self.max_run_time, run_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает глубину очереди и задержки выполнения"""
+        with self._lock:
+            completed = self.completed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": self.total_wait_time / completed * 1000 if completed else 0.0,
+                "max_wait_ms": self.max_wait_time * 1000,
+                "avg_run_ms": self.total_run_time / completed * 1000 if completed else 0.0,
+                "max_run_ms": self.max_run_time * 1000,
+            }
+
+    def shutdown(self) -> None:
+        """Останавливает потоки пула"""
+        self._executor.shutdown(wait=False)
+
+
+# Глобальный пул для хеширования паролей
+password_hashing_pool = PasswordHashingPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
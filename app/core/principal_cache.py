@@ -0,0 +1,153 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import RLock
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("principal_cache")
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Легковесный снимок аутентифицированного пользователя.
+
+    Содержит только поля, которые используются обработчиками запросов
+    (id, роль, статус активности и т.д.), и не держит ссылок на ORM-сессию
+    и связанные объекты. Хеш пароля намеренно не хранится.
+    """
+    id: int
+    username: str
+    email: Optional[str]
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: Any) -> "UserSnapshot":
+        """Создает снимок из ORM-объекта пользователя"""
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            is_active=user.is_active,
+        )
+
+
+class PrincipalCache:
+    """
+    Кэш аутентифицированных пользователей, ключом которого является subject токена (username).
+
+    Ограничен по времени жизни записей и по количеству записей (вытесняются
+    наименее недавно использованные). Записи явно инвалидируются при изменении,
+    деактивации пользователя и смене пароля.
+    """
+    def __init__(self, ttl: int = 60, max_size: int = 1024):
+        """
+        Инициализирует кэш
+
+        Args:
+            ttl: Время жизни записи в секундах
+            max_size: Максимальное количество записей в кэше
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[UserSnapshot, float]]" = OrderedDict()
+        self._usernames_by_id: Dict[int, str] = {}
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username: str) -> Optional[UserSnapshot]:
+        """
+        Возвращает снимок пользователя или None, если записи нет или она устарела
+
+        Args:
+            username: Subject токена
+        """
+        with self.lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            snapshot, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._remove(username)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return snapshot
+
+    def set(self, username: str, snapshot: UserSnapshot) -> None:
+        """
+        Сохраняет снимок пользователя
+
+        Args:
+            username: Subject токена
+            snapshot: Снимок пользователя
+        """
+        with self.lock:
+            if username in self._entries:
+                self._remove(username)
+            self._entries[username] = (snapshot, time.monotonic() + self.ttl)
+            self._usernames_by_id[snapshot.id] = username
+
+            while len(self._entries) > self.max_size:
+                oldest_username = next(iter(self._entries))
+                self._remove(oldest_username)
+                self.evictions += 1
+
+    def invalidate(self, username: str) -> None:
+        """Удаляет запись по имени пользователя"""
+        with self.lock:
+            if username in self._entries:
+                self._remove(username)
+                logger.debug(f"Principal cache invalidated: {username}")
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Удаляет запись по ID пользователя (в том числе после смены username)"""
+        with self.lock:
+            username = self._usernames_by_id.get(user_id)
+            if username is not None:
+                self.invalidate(username)
+
+    def clear(self) -> None:
+        """Очищает кэш"""
+        with self.lock:
+            self._entries.clear()
+            self._usernames_by_id.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики попаданий и промахов"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _remove(self, username: str) -> None:
+        snapshot, _ = self._entries.pop(username)
+        if self._usernames_by_id.get(snapshot.id) == username:
+            del self._usernames_by_id[snapshot.id]
+
+
+# Глобальный кэш аутентифицированных пользователей
+principal_cache = PrincipalCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+)
@@ -1,161 +1,632 @@
+import math
+import re
+import sqlite3
 import time
-from typing import Dict, Tuple, Callable, Optional
-from fastapi import Request, Response, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock, local
+from typing import Dict, List, Tuple, Optional
 
+import anyio
+from fastapi import Request, HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
 from app.core.logging import get_logger
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
 logger = get_logger("rate_limiter")
 
 
 class RateLimiter:
     """
-    Простой класс для отслеживания и ограничения частоты запросов
+    Ограничение частоты запросов по алгоритму token bucket.
+
+    У каждого клиента есть корзина емкостью rate_limit токенов, которая равномерно
+    пополняется до полной за time_window секунд; запрос расходует cost токенов.
+    Проверка выполняется за O(1). Количество отслеживаемых клиентов ограничено
+    max_clients: при переполнении вытесняется клиент, который дольше всех
+    не обращался (его корзина к этому времени почти или полностью пополнена).
     """
-    def __init__(self, rate_limit: int, time_window: int = 60):
+    def __init__(self, rate_limit: int, time_window: int = 60, max_clients: int = 10000):
         """
         Инициализирует rate limiter
-        
+
         Args:
-            rate_limit: Максимальное количество запросов
-            time_window: Временное окно в секундах (по умолчанию 60 секунд)
+            rate_limit: Максимальное количество запросов (емкость корзины)
+            time_window: Время полного пополнения корзины в секундах (по умолчанию 60 секунд)
+            max_clients: Максимальное количество отслеживаемых клиентов
         """
         self.rate_limit = rate_limit
         self.time_window = time_window
-        self.requests: Dict[str, Tuple[int, float]] = {}  # client_id -> (count, start_time)
-    
-    def is_rate_limited(self, client_id: str) -> Tuple[bool, Optional[int], Optional[float]]:
+        self.max_clients = max_clients
+        self.refill_rate = rate_limit / time_window  # токенов в секунду
+        # client_id -> [токены, время последнего пополнения]; порядок - от давно неактивных к недавним
+        self.requests: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = Lock()
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    def is_rate_limited(self, client_id: str, cost: int = 1) -> Tuple[bool, Optional[int], Optional[float]]:
         """
-        Проверяет, превышен ли лимит для клиента
-        
+        Проверяет, превышен ли лимит для клиента, и списывает стоимость запроса
+
         Args:
             client_id: Идентификатор клиента (обычно IP-адрес)
-            
+            cost: Стоимость запроса в токенах
+
         Returns:
             Tuple из:
             - bool: превышен ли лимит
             - int или None: количество оставшихся запросов (None если превышен)
-            - float или None: время до сброса лимита в секундах (None если не превышен)
-        """
-        current_time = time.time()
-        
-        # Если клиент не найден, инициализируем счетчик
-        if client_id not in self.requests:
-            self.requests[client_id] = (1, current_time)
-            return False, self.rate_limit - 1, None
-        
-        count, start_time = self.requests[client_id]
-        time_elapsed = current_time - start_time
-        
-        # Если прошло достаточно времени, сбрасываем счетчик
-        if time_elapsed > self.time_window:
-            self.requests[client_id] = (1, current_time)
-            return False, self.rate_limit - 1, None
-        
-        # Если лимит превышен, возвращаем время до сброса
-        if count >= self.rate_limit:
-            time_remaining = self.time_window - time_elapsed
-            return True, None, time_remaining
-        
-        # Увеличиваем счетчик
-        self.requests[client_id] = (count + 1, start_time)
-        return False, self.rate_limit - (count + 1), None
-    
+            - float или None: время до появления нужного количества токенов в секундах (None если не превышен)
+        """
+        now = time.monotonic()
+        requests = self.requests
+        rate_limit = self.rate_limit
+
+        with self._lock:
+            bucket = requests.get(client_id)
+            if bucket is None:
+                # Таблица растет только при появлении нового клиента, поэтому здесь же
+                # удаляем самого давнего клиента, если его корзина уже полная
+                if requests:
+                    oldest_id, oldest = next(iter(requests.items()))
+                    if oldest[0] + (now - oldest[1]) * self.refill_rate >= rate_limit:
+                        del requests[oldest_id]
+                    elif len(requests) >= self.max_clients:
+                        del requests[oldest_id]
+                        self.evictions += 1
+                tokens = rate_limit
+                bucket = requests[client_id] = [tokens, now]
+            else:
+                requests.move_to_end(client_id)
+                tokens = bucket[0] + (now - bucket[1]) * self.refill_rate
+                if tokens > rate_limit:
+                    tokens = rate_limit
+                bucket[1] = now
+
+            if tokens < cost:
+                bucket[0] = tokens
+                self.limited += 1
+                return True, None, (cost - tokens) / self.refill_rate
+
+            bucket[0] = tokens - cost
+            self.allowed += 1
+            return False, int(bucket[0]), None
+
+    async def is_rate_limited_async(self, client_id: str, cost: int = 1) -> Tuple[bool, Optional[int], Optional[float]]:
+        """Вариант is_rate_limited для middleware (корзины в памяти проверяются без ожидания)"""
+        return self.is_rate_limited(client_id, cost)
+
     def clear_expired(self):
-        """Очищает устаревшие записи для экономии памяти"""
-        current_time = time.time()
-        expired_keys = []
-        
-        for client_id, (_, start_time) in self.requests.items():
-            if current_time - start_time > self.time_window:
-                expired_keys.append(client_id)
-        
-        for key in expired_keys:
-            del self.requests[key]
+        """Удаляет клиентов, корзины которых полностью пополнились (их состояние совпадает с начальным)"""
+        now = time.monotonic()
+        with self._lock:
+            while self.requests:
+                client_id, (tokens, updated_at) = next(iter(self.requests.items()))
+                if tokens + (now - updated_at) * self.refill_rate < self.rate_limit:
+                    break
+                del self.requests[client_id]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает количество отслеживаемых клиентов и счетчики решений"""
+        with self._lock:
+            return {
+                "clients": len(self.requests),
+                "max_clients": self.max_clients,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "evictions": self.evictions,
+            }
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitStore(ABC):
     """
-    Middleware для ограничения частоты запросов
+    Общее для всех воркеров хранилище корзин токенов.
+
+    Единственная операция acquire атомарно пополняет корзину клиента и выдает
+    из нее от need до want токенов (или ничего, если их меньше need).
+    """
+    name = "base"
+
+    @abstractmethod
+    def acquire(self, key: str, capacity: int, refill_rate: float, need: int, want: int) -> Tuple[int, float]:
+        """
+        Выдает токены из корзины
+
+        Args:
+            key: Ключ корзины (лимитер и клиент)
+            capacity: Емкость корзины
+            refill_rate: Скорость пополнения в токенах в секунду
+            need: Минимальное количество токенов, без которого запрос отклоняется
+            want: Желаемое количество токенов (need с запасом для следующих запросов)
+
+        Returns:
+            Tuple из количества выданных токенов (0 если отказано)
+            и количества токенов, оставшихся в корзине
+        """
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Корзины токенов в общем файле SQLite (режим WAL) для процессов на одной машине.
+
+    Пополнение и списание выполняются в одной транзакции BEGIN IMMEDIATE.
+    Корзины, которые уже пополнились до полной, периодически удаляются.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        """
+        Args:
+            path: Путь к файлу SQLite
+            purge_every: Через сколько операций удалять полные корзины
+        """
+        self.path = path
+        self.purge_every = purge_every
+        self._local = local()
+        self._lock = Lock()
+        self._acquires = 0
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    full_at REAL NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets (full_at);
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key: str, capacity: int, refill_rate: float, need: int, want: int) -> Tuple[int, float]:
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * refill_rate)
+            granted = min(int(tokens), want) if tokens >= need else 0
+            tokens -= granted
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                "updated_at = excluded.updated_at, full_at = excluded.full_at",
+                (key, tokens, now, now + (capacity - tokens) / refill_rate),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._acquires += 1
+            purge = self._acquires % self.purge_every == 0
+        if purge:
+            conn.execute(
+                "DELETE FROM rate_limit_buckets WHERE key IN "
+                "(SELECT key FROM rate_limit_buckets WHERE full_at < ? LIMIT 500)",
+                (now,),
+            )
+        return granted, tokens
+
+
+# Пополнение и списание токенов одним скриптом на сервере (атомарно для всех воркеров)
+_REDIS_ACQUIRE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local need = tonumber(ARGV[4])
+local want = tonumber(ARGV[5])
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(state[2])) * rate)
+end
+local granted = 0
+if tokens >= need then
+    granted = math.min(math.floor(tokens), want)
+end
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {granted, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Корзины токенов на сервере с протоколом Redis (Redis, Valkey, KeyDB и т.п.).
+
+    Каждая корзина - хеш с количеством токенов и временем обновления;
+    сервер сам удаляет ее, когда она пополняется до полной. Требует пакет redis.
+    """
+    name = "redis"
+
+    def __init__(self, url: str):
+        """
+        Args:
+            url: URL сервера, например redis://localhost:6379/0
+        """
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self.url = url
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._acquire = self._client.register_script(_REDIS_ACQUIRE_SCRIPT)
+
+    def acquire(self, key: str, capacity: int, refill_rate: float, need: int, want: int) -> Tuple[int, float]:
+        granted, tokens = self._acquire(keys=[key], args=[capacity, refill_rate, time.time(), need, want])
+        return int(granted), float(tokens)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Ограничение частоты запросов с общими для всех воркеров корзинами токенов.
+
+    Чтобы не обращаться к хранилищу на каждый запрос, процесс берет токены
+    активного клиента пачками (до lease_size) и расходует их локально в течение
+    lease_ttl секунд; неизрасходованные токены по истечении этого срока сгорают.
+    Размер пачки зависит от того, сколько клиент израсходовал из предыдущей,
+    поэтому редкие запросы списывают ровно свою стоимость. Суммарно все воркеры
+    могут пропустить сверх лимита не больше lease_size токенов на воркер.
+
+    Если хранилище недоступно, лимитер на retry_interval секунд переходит
+    к корзинам в памяти процесса (поведение RateLimiter).
     """
     def __init__(
-        self, 
-        app: ASGIApp, 
+        self,
+        store: RateLimitStore,
+        rate_limit: int,
+        time_window: int = 60,
+        max_clients: int = 10000,
+        lease_size: int = 10,
+        lease_ttl: float = 1.0,
+        retry_interval: float = 5.0,
+        namespace: str = "ratelimit"
+    ):
+        """
+        Args:
+            store: Общее хранилище корзин
+            rate_limit: Максимальное количество запросов (емкость корзины)
+            time_window: Время полного пополнения корзины в секундах
+            max_clients: Максимальное количество отслеживаемых клиентов в процессе
+            lease_size: Сколько токенов брать из хранилища за одно обращение
+            lease_ttl: Сколько секунд можно расходовать полученные токены
+            retry_interval: Через сколько секунд повторить обращение к недоступному хранилищу
+            namespace: Пространство имен ключей в хранилище
+        """
+        super().__init__(rate_limit, time_window, max_clients=max_clients)
+        self.store = store
+        self.lease_size = max(1, min(lease_size, rate_limit))
+        self.lease_ttl = lease_ttl
+        self.retry_interval = retry_interval
+        # Разные лимиты не должны делить корзины
+        self.key_prefix = f"{namespace}:{rate_limit}/{time_window}:"
+        # client_id -> [токены, срок действия, остаток в хранилище, израсходовано из пачки,
+        #               отказ без обращения к хранилищу до, время повтора для Retry-After]
+        self._leases: "OrderedDict[str, List]" = OrderedDict()
+        self._store_retry_at = 0.0
+        self.store_calls = 0
+        self.store_errors = 0
+
+    def _lease_for(self, client_id: str, now: float) -> List:
+        """Возвращает запись клиента, добавляя ее с учетом ограничения max_clients (вызывается под блокировкой)"""
+        leases = self._leases
+        lease = leases.get(client_id)
+        if lease is None:
+            if len(leases) >= self.max_clients:
+                leases.popitem(last=False)
+                self.evictions += 1
+            elif leases:
+                oldest_id, oldest = next(iter(leases.items()))
+                if oldest[1] <= now and oldest[4] <= now:
+                    del leases[oldest_id]
+            lease = leases[client_id] = [0, now, 0.0, 0, 0.0, 0.0]
+        else:
+            leases.move_to_end(client_id)
+        return lease
+
+    def _check_lease(self, client_id: str, cost: int, now: float) -> Tuple[Optional[Tuple], int, int]:
+        """
+        Проверяет лимит по локальной пачке токенов без обращения к хранилищу
+
+        Returns:
+            Tuple из результата проверки (None, если нужно обратиться к хранилищу),
+            остатка пачки и количества токенов, израсходованных из нее
+        """
+        with self._lock:
+            lease = self._leases.get(client_id)
+            leftover, used = 0, 0
+            if lease is not None:
+                valid = lease[1] > now
+                if valid and lease[0] >= cost:
+                    self._leases.move_to_end(client_id)
+                    lease[0] -= cost
+                    lease[3] += cost
+                    self.allowed += 1
+                    return (False, int(lease[0] + lease[2]), None), 0, 0
+                # Недавний отказ хранилища повторяется без обращения к нему
+                if lease[4] > now:
+                    self.limited += 1
+                    return (True, None, lease[5] - now), 0, 0
+                if valid:
+                    leftover, used = lease[0], lease[3]
+            degraded = now < self._store_retry_at
+
+        if degraded:
+            return super().is_rate_limited(client_id, cost), 0, 0
+        return None, leftover, used
+
+    def _store_request(self, client_id: str, cost: int, leftover: int, used: int) -> Tuple:
+        """Аргументы для RateLimitStore.acquire"""
+        # Запас на следующие запросы растет вдвое с каждой израсходованной пачкой,
+        # клиенту без недавних запросов выдается ровно стоимость запроса
+        need = cost - leftover
+        want = max(need, min(self.lease_size, 2 * used))
+        return self.key_prefix + client_id, self.rate_limit, self.refill_rate, need, want
+
+    def _store_failed(self, client_id: str, cost: int, now: float, error: Exception) -> Tuple[bool, Optional[int], Optional[float]]:
+        """Переходит на лимиты процесса, если хранилище недоступно"""
+        logger.warning(f"Rate limit store '{self.store.name}' is unavailable, using per-process limits: {error}")
+        with self._lock:
+            self._store_retry_at = now + self.retry_interval
+            self.store_errors += 1
+        return super().is_rate_limited(client_id, cost)
+
+    def _apply_grant(
+        self, client_id: str, cost: int, now: float, leftover: int, need: int, granted: int, store_tokens: float
+    ) -> Tuple[bool, Optional[int], Optional[float]]:
+        """Сохраняет пачку токенов, выданную хранилищем, и списывает из нее стоимость запроса"""
+        with self._lock:
+            self.store_calls += 1
+            lease = self._lease_for(client_id, now)
+            if granted == 0:
+                # Оставшиеся локально токены сохраняются до конца срока пачки
+                retry_after = (need - store_tokens) / self.refill_rate
+                lease[4] = now + min(retry_after, self.lease_ttl)
+                lease[5] = now + retry_after
+                self.limited += 1
+                return True, None, retry_after
+
+            tokens = leftover + granted - cost
+            lease[:] = [tokens, now + self.lease_ttl, store_tokens, cost, 0.0, 0.0]
+            self.allowed += 1
+            return False, int(tokens + store_tokens), None
+
+    def is_rate_limited(self, client_id: str, cost: int = 1) -> Tuple[bool, Optional[int], Optional[float]]:
+        """Синхронная проверка: обращение к хранилищу блокирует вызывающий поток"""
+        now = time.monotonic()
+        result, leftover, used = self._check_lease(client_id, cost, now)
+        if result is not None:
+            return result
+
+        request = self._store_request(client_id, cost, leftover, used)
+        try:
+            granted, store_tokens = self.store.acquire(*request)
+        except Exception as e:
+            return self._store_failed(client_id, cost, now, e)
+        return self._apply_grant(client_id, cost, now, leftover, request[3], granted, store_tokens)
+
+    async def is_rate_limited_async(self, client_id: str, cost: int = 1) -> Tuple[bool, Optional[int], Optional[float]]:
+        """Асинхронная проверка: обращение к хранилищу выполняется в пуле потоков, не блокируя цикл событий"""
+        now = time.monotonic()
+        result, leftover, used = self._check_lease(client_id, cost, now)
+        if result is not None:
+            return result
+
+        request = self._store_request(client_id, cost, leftover, used)
+        try:
+            granted, store_tokens = await anyio.to_thread.run_sync(self.store.acquire, *request)
+        except Exception as e:
+            return self._store_failed(client_id, cost, now, e)
+        return self._apply_grant(client_id, cost, now, leftover, request[3], granted, store_tokens)
+
+    def clear_expired(self):
+        """Удаляет истекшие пачки токенов и полные локальные корзины"""
+        now = time.monotonic()
+        with self._lock:
+            for client_id in [c for c, lease in self._leases.items() if lease[1] <= now and lease[4] <= now]:
+                del self._leases[client_id]
+        super().clear_expired()
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = super().get_stats()
+        with self._lock:
+            stats.update({
+                "backend": self.store.name,
+                "leases": len(self._leases),
+                "store_calls": self.store_calls,
+                "store_errors": self.store_errors,
+                "degraded": time.monotonic() < self._store_retry_at,
+            })
+        return stats
+
+
+def _create_rate_limit_store(backend: str) -> Optional[RateLimitStore]:
+    if backend == "local":
+        return None
+    if backend == "sqlite":
+        return SQLiteRateLimitStore(settings.RATE_LIMIT_URL or "./rate_limit.db")
+    if backend == "redis":
+        return RedisRateLimitStore(settings.RATE_LIMIT_URL or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+# Хранилища создаются один раз на процесс и используются всеми лимитерами
+_stores: Dict[str, Optional[RateLimitStore]] = {}
+_stores_lock = Lock()
+
+
+def create_rate_limiter(
+    rate_limit: int,
+    time_window: int = 60,
+    max_clients: int = 10000,
+    backend: Optional[str] = None
+) -> RateLimiter:
+    """
+    Создает лимитер в хранилище из настроек
+
+    Args:
+        rate_limit: Максимальное количество запросов (емкость корзины)
+        time_window: Время полного пополнения корзины в секундах
+        max_clients: Максимальное количество отслеживаемых клиентов
+        backend: Тип хранилища ("local", "sqlite" или "redis"), по умолчанию RATE_LIMIT_BACKEND
+
+    Returns:
+        RateLimiter в памяти процесса или SharedRateLimiter с общим хранилищем
+    """
+    backend = backend or settings.RATE_LIMIT_BACKEND
+    with _stores_lock:
+        if backend not in _stores:
+            _stores[backend] = _create_rate_limit_store(backend)
+        store = _stores[backend]
+    if store is None:
+        return RateLimiter(rate_limit, time_window, max_clients=max_clients)
+    return SharedRateLimiter(
+        store,
+        rate_limit,
+        time_window,
+        max_clients=max_clients,
+        lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+        lease_ttl=settings.RATE_LIMIT_LEASE_MS / 1000,
+        retry_interval=settings.RATE_LIMIT_BACKEND_RETRY,
+        namespace=f"{settings.CACHE_NAMESPACE}:ratelimit",
+    )
+
+
+def _rate_limit_headers(limiter: RateLimiter, retry_after: float) -> Dict[str, str]:
+    """Заголовки ответа 429"""
+    return {
+        "Retry-After": str(math.ceil(retry_after)),
+        "X-RateLimit-Limit": str(limiter.rate_limit),
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": str(math.ceil(time.time() + retry_after))
+    }
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware для ограничения частоты запросов.
+
+    Работает напрямую с сообщениями ASGI: проверяет лимит до вызова приложения
+    и добавляет заголовки X-RateLimit-* в сообщение http.response.start,
+    не оборачивая ответ и не создавая отдельную задачу на каждый запрос.
+    Тяжелые эндпоинты могут стоить больше одного токена (route_costs).
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
         rate_limit: int = 100,
         time_window: int = 60,
-        exclude_paths: Optional[list] = None
+        exclude_paths: Optional[list] = None,
+        route_costs: Optional[Dict[str, int]] = None,
+        max_clients: int = 10000
     ):
-        super().__init__(app)
-        self.rate_limiter = RateLimiter(rate_limit, time_window)
-        self.exclude_paths = exclude_paths or ["/docs", "/openapi.json", "/redoc", "/favicon.ico"]
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Пропускаем исключенные пути
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
-        
+        """
+        Args:
+            app: ASGI приложение
+            rate_limit: Максимальное количество запросов стоимостью 1 за time_window
+            time_window: Временное окно в секундах
+            exclude_paths: Список путей без ограничения
+            route_costs: Стоимость запроса в токенах по префиксам путей (по умолчанию 1)
+            max_clients: Максимальное количество отслеживаемых клиентов
+        """
+        self.app = app
+        self.rate_limiter = create_rate_limiter(rate_limit, time_window, max_clients=max_clients)
+        # Префиксы собираются в кортеж один раз: str.startswith проверяет их за один вызов
+        self.exclude_paths = tuple(exclude_paths or ["/docs", "/openapi.json", "/redoc", "/favicon.ico"])
+        self._limit_header = str(rate_limit)
+        # Более длинные префиксы проверяются первыми
+        self.route_costs = dict(route_costs or {})
+        prefixes = sorted(self.route_costs, key=len, reverse=True)
+        self._costs_regex = re.compile("|".join(re.escape(prefix) for prefix in prefixes) or r"(?!)")
+
+    def _cost(self, path: str) -> int:
+        match = self._costs_regex.match(path)
+        return self.route_costs[match.group(0)] if match is not None else 1
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Пропускаем не-HTTP запросы и исключенные пути
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
         # Получаем IP клиента
-        client_id = request.client.host if request.client else "unknown"
-        
+        client = scope.get("client")
+        client_id = client[0] if client else "unknown"
+
         # Проверяем, не превышен ли лимит
-        is_limited, remaining, retry_after = self.rate_limiter.is_rate_limited(client_id)
-        
+        is_limited, remaining, retry_after = await self.rate_limiter.is_rate_limited_async(client_id, self._cost(scope["path"]))
+
         if is_limited:
             logger.warning(f"Rate limit exceeded for {client_id}, retry after {retry_after:.1f} seconds")
-            
+
             # Возвращаем ошибку 429 Too Many Requests
-            return Response(
+            response = JSONResponse(
                 content={"detail": "Too many requests"},
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                headers={
-                    "Retry-After": str(int(retry_after)),
-                    "X-RateLimit-Limit": str(self.rate_limiter.rate_limit),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(int(time.time() + retry_after))
-                }
+                headers=_rate_limit_headers(self.rate_limiter, retry_after)
             )
-        
-        # Добавляем заголовки с информацией о лимитах
-        response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(self.rate_limiter.rate_limit)
-        response.headers["X-RateLimit-Remaining"] = str(remaining) if remaining is not None else "0"
-        
-        # Периодически очищаем устаревшие записи
-        if hash(client_id) % 10 == 0:  # Примерно в 10% случаев
-            self.rate_limiter.clear_expired()
-        
-        return response
+            await response(scope, receive, send)
+            return
+
+        remaining_header = str(remaining) if remaining is not None else "0"
+
+        async def send_with_headers(message: Message) -> None:
+            # Добавляем заголовки с информацией о лимитах
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = self._limit_header
+                headers["X-RateLimit-Remaining"] = remaining_header
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 
 # Создаем экземпляры rate limiter для различных API
-general_rate_limiter = RateLimiter(rate_limit=100, time_window=60)  # 100 запросов в минуту
-auth_rate_limiter = RateLimiter(rate_limit=10, time_window=60)      # 10 запросов в минуту для авторизации
+general_rate_limiter = create_rate_limiter(rate_limit=100, time_window=60)  # 100 запросов в минуту
+auth_rate_limiter = create_rate_limiter(rate_limit=10, time_window=60)      # 10 запросов в минуту для авторизации
 
 
-def limit_rate(request: Request, limiter: RateLimiter = general_rate_limiter):
+def limit_rate(request: Request, limiter: RateLimiter = general_rate_limiter, cost: int = 1):
     """
     Функция для ручного ограничения частоты запросов в отдельных эндпоинтах
-    
+
     Args:
         request: Объект запроса FastAPI
         limiter: Экземпляр RateLimiter
-    
+        cost: Стоимость запроса в токенах
+
     Raises:
         HTTPException: Если превышен лимит запросов
     """
     client_id = request.client.host if request.client else "unknown"
-    is_limited, remaining, retry_after = limiter.is_rate_limited(client_id)
-    
+    is_limited, remaining, retry_after = limiter.is_rate_limited(client_id, cost)
+
     if is_limited:
         logger.warning(f"Rate limit exceeded for {client_id}, retry after {retry_after:.1f} seconds")
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Too many requests",
-            headers={
-                "Retry-After": str(int(retry_after)),
-                "X-RateLimit-Limit": str(limiter.rate_limit),
-                "X-RateLimit-Remaining": "0",
-                "X-RateLimit-Reset": str(int(time.time() + retry_after))
-            }
-        ) 
\ No newline at end of file
+            headers=_rate_limit_headers(limiter, retry_after)
+        )
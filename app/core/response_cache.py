@@ -0,0 +1,175 @@
+import re
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import Cache, CACHE_SCOPE_GLOBAL, CACHE_SCOPE_ROLE, CACHE_SCOPE_USER
+from app.core.config import settings
+from app.core.security import get_cached_principal
+
+# Максимальный размер тела ответа, который сохраняется в кэше
+MAX_CACHED_BODY = 1024 * 1024
+
+
+class ResponseCache(Cache):
+    """
+    Кэш готовых HTTP-ответов (статус, заголовки и тело).
+
+    Отличается от обычного кэша в памяти счетчиком поколений: он увеличивается
+    при каждой инвалидации, и ответ, вычисление которого началось до нее,
+    не сохраняется, чтобы не вернуть в кэш устаревшие данные.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._generation = 0
+        self._generation_lock = Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate_tags(self, *tags: str) -> int:
+        with self._generation_lock:
+            self._generation += 1
+        return super().invalidate_tags(*tags)
+
+    def clear(self) -> None:
+        with self._generation_lock:
+            self._generation += 1
+        super().clear()
+
+    def set_if_current(self, generation: int, key: str, value: Any, ttl: int, tags: Tuple[str, ...]) -> bool:
+        """Сохраняет ответ, если с начала его вычисления не было инвалидаций"""
+        with self._generation_lock:
+            if generation != self._generation:
+                return False
+            self.set(key, value, ttl=ttl, tags=tags)
+            return True
+
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware серверного кэша готовых ответов для справочных эндпоинтов.
+
+    Кэширование включается явно для префиксов путей из rules. Ключ строится
+    по методу, пути, нормализованной строке запроса и области видимости:
+    роли или ID пользователя (scope="role"/"user") либо без пользователя
+    (scope="global", только для публичных эндпоинтов). Пользователь определяется
+    без обращения к БД по уже проверенному токену (get_cached_principal);
+    если это невозможно, запрос обрабатывается приложением как обычно.
+    Сохраняются только успешные ответы на GET одним сообщением без Set-Cookie.
+    Записи помечаются тегами правила и инвалидируются вместе с остальным кэшем.
+    """
+
+    def __init__(self, app: ASGIApp, rules: Dict[str, Dict[str, Any]], cache: Optional[ResponseCache] = None):
+        """
+        Args:
+            app: ASGI приложение
+            rules: Настройки по префиксам путей: {"ttl": секунды, "scope": область, "tags": теги}
+            cache: Хранилище ответов (по умолчанию глобальный response_cache)
+        """
+        self.app = app
+        self.cache = cache if cache is not None else response_cache
+        self.rules: Dict[str, Tuple[int, str, Tuple[str, ...]]] = {}
+        for prefix, rule in rules.items():
+            scope = rule.get("scope", CACHE_SCOPE_ROLE)
+            if scope not in (CACHE_SCOPE_GLOBAL, CACHE_SCOPE_ROLE, CACHE_SCOPE_USER):
+                raise ValueError(f"Unknown response cache scope: {scope}")
+            self.rules[prefix] = (int(rule.get("ttl", 60)), scope, tuple(rule.get("tags", ())))
+        # Более длинные префиксы проверяются первыми
+        prefixes = sorted(self.rules, key=len, reverse=True)
+        self._rules_regex = re.compile("|".join(re.escape(prefix) for prefix in prefixes) or r"(?!)")
+
+    def _scope_key(self, scope_type: str, headers: Headers) -> Optional[str]:
+        """Возвращает часть ключа для области видимости или None, если кэш использовать нельзя"""
+        if scope_type == CACHE_SCOPE_GLOBAL:
+            return "*"
+        authorization = headers.get("Authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        user = get_cached_principal(token)
+        if user is None:
+            return None
+        if scope_type == CACHE_SCOPE_USER:
+            return f"user={user.id}"
+        return f"role={getattr(user.role, 'value', user.role)}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        match = self._rules_regex.match(path)
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        # Клиент явно просит не использовать кэш
+        if "no-cache" in headers.get("Cache-Control", ""):
+            await self.app(scope, receive, send)
+            return
+
+        ttl, scope_type, tags = self.rules[match.group(0)]
+        scope_key = self._scope_key(scope_type, headers)
+        if scope_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        key = f"response:{scope_key}:GET:{path}?{query}"
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            status, raw_headers, body = cached
+            await send({"type": "http.response.start", "status": status, "headers": list(raw_headers)})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        generation = self.cache.generation
+        status: Optional[int] = None
+        raw_headers: Tuple[Tuple[bytes, bytes], ...] = ()
+        chunks: List[bytes] = []
+        size = 0
+        cacheable = True
+
+        async def send_and_store(message: Message) -> None:
+            nonlocal status, raw_headers, size, cacheable
+            if message["type"] == "http.response.start":
+                # Заголовки запоминаются до отправки: внешние middleware дополняют их своими
+                status = message["status"]
+                raw_headers = tuple(message["headers"])
+                response_headers = Headers(raw=message["headers"])
+                cache_control = response_headers.get("Cache-Control", "")
+                cacheable = (
+                    status == 200
+                    and "set-cookie" not in response_headers
+                    and "no-store" not in cache_control
+                    and "private" not in cache_control
+                )
+            elif message["type"] == "http.response.body" and cacheable:
+                body = message.get("body", b"")
+                chunks.append(body)
+                size += len(body)
+                if size > MAX_CACHED_BODY:
+                    cacheable = False
+                    chunks.clear()
+                elif not message.get("more_body", False):
+                    self.cache.set_if_current(generation, key, (status, raw_headers, b"".join(chunks)), ttl, tags)
+            await send(message)
+
+        await self.app(scope, receive, send_and_store)
+
+
+# Глобальный кэш готовых ответов
+response_cache = ResponseCache(
+    ttl=60,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+)
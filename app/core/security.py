@@ -1,18 +1,29 @@
+import hashlib
+import hmac
+import secrets
 from datetime import datetime, timedelta, UTC
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from app.db.database import get_db
 from app.db.async_database import get_async_db
-from app.models.models import User, UserRole
+from app.db.load_plans import AUTH_PRINCIPAL
+from app.models.models import User, UserRole, RefreshToken
 from app.schemas.schemas import TokenData
 from app.core.config import settings
+from app.core.principal_cache import principal_cache, UserSnapshot
+from app.core.password_pool import password_hashing_pool
+from app.core.token_cache import verified_token_cache
+from app.core.token_revocation import token_revocation_list
+from app.core.logging import get_logger
+
+logger = get_logger("security")
 
 # Настройки безопасности
 SECRET_KEY = settings.SECRET_KEY  # В реальной системе используйте переменные окружения
@@ -36,6 +47,16 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+# Асинхронная проверка пароля в выделенном пуле, чтобы не блокировать цикл событий
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hashing_pool.run(verify_password, plain_password, hashed_password)
+
+
+# Асинхронное хеширование пароля в выделенном пуле
+async def get_password_hash_async(password):
+    return await password_hashing_pool.run(get_password_hash, password)
+
+
 # Функция для аутентификации пользователя (синхронная, для совместимости)
 def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
@@ -53,7 +74,7 @@ async def authenticate_user_async(db: AsyncSession, username: str, password: str
     user = result.scalar_one_or_none()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -65,11 +86,155 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now(UTC) + expires_delta
     else:
         expire = datetime.now(UTC) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # jti позволяет отозвать конкретный токен до истечения его срока
+    to_encode.update({"exp": expire, "jti": secrets.token_hex(16)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+# Функция для декодирования токена доступа с кэшем уже проверенных токенов
+def decode_access_token(token: str) -> dict:
+    # Срок действия проверяется кэшем при каждом обращении,
+    # истекший токен уходит на полную проверку и отклоняется jwt.decode
+    payload = verified_token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        verified_token_cache.set(token, payload)
+    return payload
+
+
+# Функция для вычисления ключевого хеша refresh-токена
+# (вместо bcrypt: токен случайный, поэтому достаточно HMAC и поиска по индексу)
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def _utcnow() -> datetime:
+    # refresh-токены хранят время в UTC без часового пояса
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+# Асинхронное создание refresh-токена
+async def create_refresh_token_async(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    """
+    Создает refresh-токен и сохраняет его хеш в БД
+
+    Args:
+        db: Асинхронная сессия БД
+        user_id: ID пользователя
+        family_id: Цепочка ротаций (новая цепочка, если не указана)
+
+    Returns:
+        Refresh-токен в открытом виде (в БД не хранится)
+    """
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        user_id=user_id,
+        expires_at=_utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    await db.commit()
+    return token
+
+
+# Асинхронный отзыв цепочки refresh-токенов
+async def revoke_refresh_token_family_async(db: AsyncSession, family_id: str) -> None:
+    query = update(RefreshToken).where(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None)
+    ).values(revoked_at=_utcnow())
+    await db.execute(query)
+    await db.commit()
+
+
+# Асинхронный отзыв всех refresh-токенов пользователя (смена пароля, деактивация)
+async def revoke_user_refresh_tokens_async(db: AsyncSession, user_id: int) -> None:
+    query = update(RefreshToken).where(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked_at.is_(None)
+    ).values(revoked_at=_utcnow())
+    await db.execute(query)
+    await db.commit()
+
+
+# Асинхронный отзыв цепочки, к которой относится refresh-токен пользователя (выход из системы)
+async def revoke_refresh_token_async(db: AsyncSession, token: str, user_id: int) -> bool:
+    """
+    Отзывает цепочку ротаций, к которой относится refresh-токен
+
+    Args:
+        db: Асинхронная сессия БД
+        token: Refresh-токен в открытом виде
+        user_id: ID пользователя, которому должен принадлежать токен
+
+    Returns:
+        True, если токен найден и цепочка отозвана
+    """
+    query = select(RefreshToken.family_id).where(
+        RefreshToken.token_hash == hash_refresh_token(token),
+        RefreshToken.user_id == user_id
+    )
+    result = await db.execute(query)
+    family_id = result.scalar_one_or_none()
+    if family_id is None:
+        return False
+    await revoke_refresh_token_family_async(db, family_id)
+    return True
+
+
+# Асинхронная ротация refresh-токена
+async def rotate_refresh_token_async(db: AsyncSession, token: str) -> Tuple[User, str]:
+    """
+    Проверяет refresh-токен, помечает его использованным и выдает новый токен той же цепочки.
+    Повторное предъявление уже использованного токена отзывает всю цепочку.
+
+    Returns:
+        Tuple из пользователя и нового refresh-токена
+
+    Raises:
+        HTTPException: 401, если токен не найден, истек, отозван или пользователь неактивен
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Недействительный refresh-токен",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    query = select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))
+    result = await db.execute(query)
+    stored_token = result.scalar_one_or_none()
+    if stored_token is None:
+        raise credentials_exception
+    
+    # Помечаем токен использованным. Условие на revoked_at защищает
+    # от гонки двух одновременных запросов с одним и тем же токеном
+    now = _utcnow()
+    query = update(RefreshToken).where(
+        RefreshToken.id == stored_token.id,
+        RefreshToken.revoked_at.is_(None)
+    ).values(revoked_at=now)
+    result = await db.execute(query)
+    if result.rowcount != 1:
+        logger.warning(f"Refresh token reuse detected for user_id={stored_token.user_id}, revoking token family")
+        await revoke_refresh_token_family_async(db, stored_token.family_id)
+        raise credentials_exception
+    
+    if stored_token.expires_at <= now:
+        await db.commit()
+        raise credentials_exception
+    
+    query = AUTH_PRINCIPAL.apply(select(User)).where(User.id == stored_token.user_id)
+    result = await db.execute(query)
+    user = result.scalar_one_or_none()
+    if user is None or not user.is_active:
+        await db.commit()
+        raise credentials_exception
+    
+    new_token = await create_refresh_token_async(db, user.id, stored_token.family_id)
+    return user, new_token
+
+
 # Функция для получения текущего пользователя (синхронная, для совместимости)
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -78,7 +243,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -99,7 +264,7 @@ async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncS
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -107,17 +272,50 @@ async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncS
     except JWTError:
         raise credentials_exception
     
-    query = select(User).filter(User.username == token_data.username)
+    # Проверяем, не отозван ли токен (без обращения к БД, если фильтр отвечает "нет")
+    jti = payload.get("jti")
+    if jti and await token_revocation_list.is_revoked(db, jti):
+        raise credentials_exception
+    
+    # Сначала ищем пользователя в кэше, чтобы не обращаться к БД на каждый запрос
+    cached_user = principal_cache.get(token_data.username)
+    if cached_user is not None:
+        return cached_user
+    
+    query = AUTH_PRINCIPAL.apply(select(User)).filter(User.username == token_data.username)
     result = await db.execute(query)
     user = result.scalar_one_or_none()
     
     if user is None:
         raise credentials_exception
+    
+    snapshot = UserSnapshot.from_user(user)
+    principal_cache.set(token_data.username, snapshot)
+    return snapshot
+
+
+# Функция для получения пользователя без обращения к БД и без проверки подписи токена
+def get_cached_principal(token: str) -> Optional[UserSnapshot]:
+    """
+    Возвращает активного пользователя, если токен уже проверен, заведомо не отозван
+    (фильтр отвечает "нет") и пользователь есть в кэше. Иначе возвращает None:
+    тогда запрос должен пройти обычную проверку get_current_user_async.
+    """
+    payload = verified_token_cache.get(token)
+    if payload is None:
+        return None
+    username = payload.get("sub")
+    jti = payload.get("jti")
+    if username is None or (jti and token_revocation_list.might_be_revoked(jti)):
+        return None
+    user = principal_cache.get(username)
+    if user is None or not user.is_active:
+        return None
     return user
 
 
 # Функция для получения активного пользователя
-async def get_current_active_user(current_user: User = Depends(get_current_user_async)):
+async def get_current_active_user(current_user: UserSnapshot = Depends(get_current_user_async)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Неактивный пользователь")
     return current_user
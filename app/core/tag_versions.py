@@ -0,0 +1,63 @@
+import hashlib
+import uuid
+from threading import Lock
+from typing import Any, Dict, Iterable, Tuple
+
+
+class TagVersions:
+    """
+    Монотонные счетчики версий для тегов кэша.
+
+    Счетчик тега увеличивается при каждой инвалидации тега в этом процессе
+    или на другом воркере (через шину инвалидации), поэтому по версии можно
+    построить ETag, не обращаясь к БД. Версии разных процессов не согласованы,
+    поэтому в ETag входит эпоха процесса: ETag другого воркера просто не совпадет.
+    Эпоха меняется и при потере сообщений шины, когда счетчикам нельзя доверять.
+    Учитываются только теги с заданными префиксами.
+    """
+
+    def __init__(self, prefixes: Tuple[str, ...]):
+        """
+        Args:
+            prefixes: Префиксы тегов, для которых ведутся версии
+        """
+        self.prefixes = prefixes
+        self._versions: Dict[str, int] = {}
+        self._epoch = uuid.uuid4().hex[:8]
+        self._lock = Lock()
+
+    def bump(self, tags: Iterable[str]) -> None:
+        """Увеличивает версии инвалидированных тегов"""
+        with self._lock:
+            for tag in tags:
+                if tag.startswith(self.prefixes):
+                    self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def reset(self) -> None:
+        """Начинает новую эпоху: все ранее выданные ETag перестают совпадать"""
+        with self._lock:
+            self._versions.clear()
+            self._epoch = uuid.uuid4().hex[:8]
+
+    def get(self, tag: str) -> int:
+        return self._versions.get(tag, 0)
+
+    def etag(self, tag: str, *params: Any) -> str:
+        """
+        Строит слабый ETag по версии тега и параметрам представления
+
+        Args:
+            tag: Тег, версия которого определяет актуальность данных
+            params: Параметры запроса и пользователя, от которых зависит ответ
+
+        Returns:
+            ETag вида W/"<эпоха>.<версия>.<хеш параметров>"
+        """
+        with self._lock:
+            epoch, version = self._epoch, self._versions.get(tag, 0)
+        params_hash = hashlib.blake2b(repr((tag,) + params).encode(), digest_size=8).hexdigest()
+        return f'W/"{epoch}.{version}.{params_hash}"'
+
+
+# Версии тегов списков заявок (общий список, по автору и по исполнителю)
+tag_versions = TagVersions(prefixes=("tickets:",))
@@ -0,0 +1,103 @@
+import hashlib
+import time
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class VerifiedTokenCache:
+    """
+    LRU-кэш уже проверенных JWT-токенов.
+
+    Ключом является SHA-256 от токена, значением - декодированные claims и время
+    истечения. Повторное предъявление того же токена не требует проверки подписи
+    и разбора claims, но срок действия проверяется при каждом обращении.
+    """
+    def __init__(self, max_size: int = 2048):
+        """
+        Инициализирует кэш
+
+        Args:
+            max_size: Максимальное количество токенов в кэше (0 отключает кэш)
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], Optional[float]]]" = OrderedDict()
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает claims проверенного токена или None, если токена нет в кэше или он истек
+
+        Args:
+            token: JWT-токен
+        """
+        if self.max_size <= 0:
+            return None
+
+        key = self._digest(token)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            claims, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def set(self, token: str, claims: Dict[str, Any]) -> None:
+        """
+        Сохраняет claims токена, подпись которого уже проверена
+
+        Args:
+            token: JWT-токен
+            claims: Декодированные claims
+        """
+        if self.max_size <= 0:
+            return
+
+        expires_at = claims.get("exp")
+        key = self._digest(token)
+        with self.lock:
+            self._entries[key] = (claims, float(expires_at) if expires_at is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очищает кэш"""
+        with self.lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает размер кэша и долю попаданий"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Глобальный кэш проверенных токенов
+verified_token_cache = VerifiedTokenCache(max_size=settings.VERIFIED_TOKEN_CACHE_SIZE)
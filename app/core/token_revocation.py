@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+from datetime import datetime, UTC
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.invalidation_bus import invalidation_bus
+from app.core.logging import get_logger
+from app.db.async_database import AsyncSessionLocal
+from app.models.models import RevokedToken
+
+logger = get_logger("token_revocation")
+
+
+# Префикс сообщений шины инвалидации об отозванных токенах
+REVOKED_TOKEN_TAG_PREFIX = "revoked-token:"
+
+
+def revoked_token_tag(jti: str) -> str:
+    return f"{REVOKED_TOKEN_TAG_PREFIX}{jti}"
+
+
+def _utcnow() -> datetime:
+    # Время истечения отозванных токенов хранится в UTC без часового пояса
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class BloomFilter:
+    """
+    Фильтр Блума фиксированного размера.
+
+    Отвечает "точно нет" или "возможно да"; занимаемая память не зависит
+    от количества добавленных элементов.
+    """
+    def __init__(self, size_bits: int, num_hashes: int = 7):
+        """
+        Args:
+            size_bits: Размер битового массива
+            num_hashes: Количество хеш-функций
+        """
+        self.size_bits = size_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray((size_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenRevocationList:
+    """
+    Список отозванных токенов доступа.
+
+    Идентификаторы отозванных токенов (jti) хранятся в таблице revoked_tokens,
+    а в памяти процесса - фильтр Блума, который перестраивается при запуске
+    и периодически. Для неотозванного токена (обычный случай) фильтр отвечает
+    "нет" без обращения к БД; обращение к БД происходит только при
+    положительном ответе фильтра. Отозванные jti рассылаются остальным
+    воркерам через шину инвалидации и сразу добавляются в их фильтры.
+    """
+    def __init__(self, size_bits: int = 1 << 20, sync_interval: int = 60, purge_batch_size: int = 500):
+        """
+        Args:
+            size_bits: Размер фильтра Блума в битах
+            sync_interval: Интервал перестроения фильтра и очистки таблицы (в секундах)
+            purge_batch_size: Количество истекших записей, удаляемых за один запрос
+        """
+        self.size_bits = size_bits
+        self.sync_interval = sync_interval
+        self.purge_batch_size = purge_batch_size
+        self._filter = BloomFilter(size_bits)
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._rebuild_requested: Optional[asyncio.Event] = None
+        # jti, добавленные во время перестроения фильтра (иначе новый фильтр их потеряет)
+        self._added_during_rebuild: Optional[List[str]] = None
+        self.filter_negatives = 0
+        self.db_checks = 0
+        self.false_positives = 0
+        self.purged = 0
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        """
+        Проверяет, отозван ли токен
+
+        Args:
+            db: Асинхронная сессия БД
+            jti: Идентификатор токена
+        """
+        if jti not in self._filter:
+            self.filter_negatives += 1
+            return False
+
+        self.db_checks += 1
+        query = select(RevokedToken.jti).where(RevokedToken.jti == jti)
+        result = await db.execute(query)
+        revoked = result.scalar_one_or_none() is not None
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """Проверяет токен только по фильтру Блума, без обращения к БД"""
+        return jti in self._filter
+
+    def add(self, jti: str) -> None:
+        """Добавляет jti в фильтр (в том числе отозванный на другом воркере)"""
+        with self._lock:
+            self._filter.add(jti)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(jti)
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        """
+        Отзывает токен до момента его истечения
+
+        Args:
+            db: Асинхронная сессия БД
+            jti: Идентификатор токена
+            expires_at: Время истечения токена (UTC)
+        """
+        existing = await db.get(RevokedToken, jti)
+        if existing is None:
+            db.add(RevokedToken(jti=jti, expires_at=expires_at))
+            await db.commit()
+        self.add(jti)
+        # Остальные воркеры добавляют jti в свои фильтры, не дожидаясь перестроения
+        invalidation_bus.publish([revoked_token_tag(jti)])
+        logger.info(f"Access token revoked: {jti}")
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Перестраивает фильтр по неистекшим записям таблицы"""
+        with self._lock:
+            self._added_during_rebuild = []
+        try:
+            query = select(RevokedToken.jti).where(RevokedToken.expires_at > _utcnow())
+            result = await db.execute(query)
+            new_filter = BloomFilter(self.size_bits)
+            for jti in result.scalars():
+                new_filter.add(jti)
+        except BaseException:
+            with self._lock:
+                self._added_during_rebuild = None
+            raise
+        with self._lock:
+            for jti in self._added_during_rebuild:
+                new_filter.add(jti)
+            self._added_during_rebuild = None
+            self._filter = new_filter
+        logger.debug(f"Token revocation filter rebuilt: {new_filter.count} entries")
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """Удаляет истекшие записи пачками по purge_batch_size"""
+        total = 0
+        while True:
+            batch = select(RevokedToken.jti).where(
+                RevokedToken.expires_at <= _utcnow()
+            ).limit(self.purge_batch_size)
+            result = await db.execute(delete(RevokedToken).where(RevokedToken.jti.in_(batch)))
+            await db.commit()
+            total += result.rowcount
+            if result.rowcount < self.purge_batch_size:
+                break
+        self.purged += total
+        return total
+
+    def request_rebuild(self) -> None:
+        """Перестраивает фильтр, не дожидаясь интервала (можно вызывать из любого потока)"""
+        if self._loop is not None and self._rebuild_requested is not None:
+            self._loop.call_soon_threadsafe(self._rebuild_requested.set)
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._rebuild_requested.wait(), self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._rebuild_requested.clear()
+            try:
+                async with AsyncSessionLocal() as db:
+                    purged = await self.purge_expired(db)
+                    await self.rebuild(db)
+                if purged:
+                    logger.info(f"Purged {purged} expired revoked tokens")
+            except Exception as e:
+                logger.error(f"Error in token revocation maintenance: {str(e)}")
+
+    async def start(self) -> None:
+        """Строит фильтр и запускает периодическую очистку"""
+        async with AsyncSessionLocal() as db:
+            await self.rebuild(db)
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._rebuild_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._maintenance_loop())
+
+    def stop(self) -> None:
+        """Останавливает периодическую очистку"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики фильтра"""
+        return {
+            "filter_entries": self._filter.count,
+            "filter_size_bytes": len(self._filter.bits),
+            "filter_negatives": self.filter_negatives,
+            "db_checks": self.db_checks,
+            "false_positives": self.false_positives,
+            "purged": self.purged,
+        }
+
+
+# Глобальный список отозванных токенов
+token_revocation_list = TokenRevocationList(
+    size_bits=settings.TOKEN_REVOCATION_FILTER_BITS,
+    sync_interval=settings.TOKEN_REVOCATION_SYNC_INTERVAL,
+    purge_batch_size=settings.TOKEN_REVOCATION_PURGE_BATCH,
+)
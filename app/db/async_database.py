@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
 from app.core.config import settings
+from app.core.deadline import install_deadline_hooks
 from app.core.logging import get_logger
 
 logger = get_logger("async_database")
@@ -24,6 +25,9 @@ async_engine = create_async_engine(
     echo=False,
 )
 
+# Запросы к БД прерываются по истечении срока HTTP-запроса
+install_deadline_hooks(async_engine.sync_engine)
+
 # Создаем асинхронную фабрику сессий
 AsyncSessionLocal = async_sessionmaker(
     autocommit=False,
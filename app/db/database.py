@@ -3,6 +3,7 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import QueuePool
 
 from app.core.config import settings
+from app.core.deadline import install_deadline_hooks
 from app.core.logging import get_logger
 
 logger = get_logger("database")
@@ -17,6 +18,9 @@ engine = create_engine(
     pool_pre_ping=True,  # Проверка соединения перед использованием
 )
 
+# Запросы к БД прерываются по истечении срока HTTP-запроса
+install_deadline_hooks(engine)
+
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
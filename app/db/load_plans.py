@@ -0,0 +1,64 @@
+from typing import Any, Iterable, List
+
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app.models.models import AuditLog, Ticket, User
+
+
+class LoadPlan:
+    """
+    План загрузки связей для конкретного эндпоинта.
+
+    Связи моделей по умолчанию не загружаются. План явно перечисляет, какие связи
+    нужно загрузить заранее (selectin или joined), а все остальные помечаются
+    raiseload, чтобы случайное обращение к ним сразу приводило к ошибке,
+    а не к скрытым дополнительным запросам.
+    """
+    def __init__(
+        self,
+        name: str,
+        model: Any,
+        selectin: Iterable[Any] = (),
+        joined: Iterable[Any] = ()
+    ):
+        """
+        Инициализирует план загрузки
+
+        Args:
+            name: Имя плана (для логов и проверок)
+            model: Модель, к запросам которой применяется план
+            selectin: Связи, загружаемые отдельным запросом SELECT ... IN
+            joined: Связи, загружаемые через JOIN в основном запросе
+        """
+        self.name = name
+        self.model = model
+        self.selectin = tuple(selectin)
+        self.joined = tuple(joined)
+
+    def options(self) -> List[Any]:
+        """Возвращает опции загрузки для select() или Query"""
+        options = [selectinload(relation) for relation in self.selectin]
+        options.extend(joinedload(relation) for relation in self.joined)
+        options.append(raiseload("*"))
+        return options
+
+    def apply(self, query):
+        """Применяет план к запросу (select() или Query)"""
+        return query.options(*self.options())
+
+    def __repr__(self):
+        return f"<LoadPlan(name='{self.name}', model={self.model.__name__}, selectin={len(self.selectin)}, joined={len(self.joined)})>"
+
+
+# Схема Ticket содержит только внешние ключи, поэтому связанные объекты не нужны
+TICKET_LIST = LoadPlan("ticket_list", Ticket)
+TICKET_DETAIL = LoadPlan("ticket_detail", Ticket)
+
+# Схема User не содержит связей
+USER_LIST = LoadPlan("user_list", User)
+
+# Для аутентификации нужны только колонки пользователя
+AUTH_PRINCIPAL = LoadPlan("auth_principal", User)
+
+# Журнал аудита показывает данные пользователя, выполнившего действие
+AUDIT_LOG_LIST = LoadPlan("audit_log_list", AuditLog, selectin=[AuditLog.user])
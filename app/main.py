@@ -5,14 +5,24 @@ from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.api.api import api_router
 from app.core.config import settings
 from app.core.logging import setup_logging, get_logger
 from app.core.rate_limiter import RateLimitMiddleware
+from app.core.admission import AdmissionControlMiddleware
+from app.core.deadline import DeadlineMiddleware
 from app.core.compression import GzipMiddleware
 from app.core.http_cache import HTTPCacheMiddleware
+from app.core.password_pool import password_hashing_pool
+from app.core.token_revocation import token_revocation_list
+from app.core.cache import global_cache, local_cache, stale_refresher
+from app.core.cache_tags import apply_remote_invalidation, reset_local_caches, TAG_CATEGORIES, TAG_EQUIPMENT
+from app.core.response_cache import ResponseCacheMiddleware, response_cache
+from app.core.invalidation_bus import invalidation_bus
 from app.db.database import engine
 from app.models import models
 
@@ -39,6 +49,40 @@ app = FastAPI(
 cors_origins = settings.get_cors_origins(environment)
 logger.info(f"CORS origins: {cors_origins}")
 
+# Срок выполнения запросов к API, по истечении которого прерываются запросы к БД.
+# Добавляется первым, чтобы время ожидания в очереди контроля допуска не входило в срок
+app.add_middleware(
+    DeadlineMiddleware,
+    default_timeout=settings.REQUEST_DEADLINE_MS / 1000,
+    route_timeouts={
+        f"{settings.API_V1_STR}/statistics": settings.REPORT_REQUEST_DEADLINE_MS / 1000,
+        f"{settings.API_V1_STR}/audit-logs": settings.REPORT_REQUEST_DEADLINE_MS / 1000,
+    },
+)
+
+# Контроль допуска запросов к БД. Добавляется ближе к приложению, чем остальные: ответы
+# из кэша готовых ответов не занимают места, а ответ 503 проходит через CORS
+app.add_middleware(
+    AdmissionControlMiddleware,
+    exclude_paths=(f"{settings.API_V1_STR}/monitoring", f"{settings.API_V1_STR}/openapi.json"),
+    # Создание заявок, смена статуса и назначение исполнителей
+    critical_paths=(f"{settings.API_V1_STR}/tickets", f"{settings.API_V1_STR}/async-tickets"),
+    # Отчеты и просмотр журнала аудита не должны вытеснять работу с заявками
+    low_priority_paths=(f"{settings.API_V1_STR}/statistics", f"{settings.API_V1_STR}/audit-logs"),
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
+
+# Серверный кэш готовых ответов для справочников. Добавляется сразу после контроля
+# допуска, чтобы быть ближе к приложению: CORS-заголовки и заголовки лимитов не попадают в кэш
+if settings.RESPONSE_CACHE_ENABLED:
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        rules={
+            f"{settings.API_V1_STR}/categories": {"ttl": settings.RESPONSE_CACHE_TTL, "scope": "role", "tags": (TAG_CATEGORIES,)},
+            f"{settings.API_V1_STR}/equipment": {"ttl": settings.RESPONSE_CACHE_TTL, "scope": "role", "tags": (TAG_EQUIPMENT,)},
+        },
+    )
+
 # Настройка CORS - важно для работы с фронтендом
 app.add_middleware(
     CORSMiddleware,
@@ -54,6 +98,12 @@ app.add_middleware(
     RateLimitMiddleware,
     rate_limit=300,  # 300 запросов в минуту (можно настроить через env)
     time_window=60,
+    # Тяжелые отчеты расходуют больше токенов, чем обычные запросы к заявкам
+    route_costs={
+        f"{settings.API_V1_STR}/statistics": 10,
+        f"{settings.API_V1_STR}/audit-logs": 5,
+    },
+    max_clients=10000,
 )
 
 # Добавляем middleware для сжатия ответов gzip
@@ -76,38 +126,66 @@ app.add_middleware(
 )
 
 # Middleware для отладки запросов и добавления CORS заголовков
-@app.middleware("http")
-async def debug_requests(request: Request, call_next):
-    try:
+class DebugRequestsMiddleware:
+    """ASGI middleware: логирует запросы и добавляет CORS заголовки, не оборачивая ответ"""
+
+    _CORS_METHODS = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
+
+    def __init__(self, app: ASGIApp, cors_origins: list):
+        self.app = app
+        self.cors_origins = set(cors_origins)
+        self.allow_any_origin = "*" in self.cors_origins
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request_origin = Headers(scope=scope).get("origin")
+        origin = request_origin or "Unknown"
         # Логируем детали запроса для отладки
-        origin = request.headers.get("origin", "Unknown")
-        logger.debug(f"Request: {request.method} {request.url.path} from {origin}")
-        
-        # Выполняем запрос
-        response = await call_next(request)
-        
-        # Логируем статус ответа
-        logger.debug(f"Response: {response.status_code}")
-        
+        logger.debug(f"Request: {method} {scope['path']} from {origin}")
         # Принудительно добавляем заголовки CORS для OPTIONS запросов
         # и при отсутствии origin в разрешенных
-        if request.method == "OPTIONS" or (origin and origin not in cors_origins and "*" not in cors_origins):
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            
-        return response
-    except Exception as e:
-        logger.error(f"Error in request handling: {str(e)}", exc_info=True)
-        error_response = JSONResponse(status_code=500, content={"detail": str(e)})
-        
-        # Добавляем CORS заголовки даже для ошибок
-        origin = request.headers.get("origin", "*")
-        error_response.headers["Access-Control-Allow-Origin"] = origin
-        error_response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        return error_response
+        force_cors = method == "OPTIONS" or (origin not in self.cors_origins and not self.allow_any_origin)
+
+        response_started = False
+
+        async def send_with_cors(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                # Логируем статус ответа
+                logger.debug(f"Response: {message['status']}")
+                if force_cors:
+                    headers = MutableHeaders(scope=message)
+                    headers["Access-Control-Allow-Origin"] = origin
+                    headers["Access-Control-Allow-Credentials"] = "true"
+                    headers["Access-Control-Allow-Methods"] = self._CORS_METHODS
+                    headers["Access-Control-Allow-Headers"] = "*"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cors)
+        except Exception as e:
+            logger.error(f"Error in request handling: {str(e)}", exc_info=True)
+            # Если ответ уже начал отправляться, заменить его нельзя
+            if response_started:
+                raise
+            # Добавляем CORS заголовки даже для ошибок
+            error_response = JSONResponse(
+                status_code=500,
+                content={"detail": str(e)},
+                headers={
+                    "Access-Control-Allow-Origin": request_origin or "*",
+                    "Access-Control-Allow-Credentials": "true",
+                },
+            )
+            await error_response(scope, receive, send)
+
+
+app.add_middleware(DebugRequestsMiddleware, cors_origins=cors_origins)
 
 # Обработчики исключений
 @app.exception_handler(StarletteHTTPException)
@@ -169,6 +247,18 @@ if __name__ == "__main__":
     # В тестах мы подменяем этот вызов
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
+# Загружаем список отозванных токенов при запуске
+@app.on_event("startup")
+async def startup_event():
+    """Обработчик события запуска приложения"""
+    await token_revocation_list.start()
+    logger.info("Token revocation filter loaded")
+    global_cache.start_expiry()
+    local_cache.start_expiry()
+    if settings.RESPONSE_CACHE_ENABLED:
+        response_cache.start_expiry()
+    invalidation_bus.start(apply_remote_invalidation, reset_local_caches)
+
 # Очищаем ресурсы при завершении работы
 @app.on_event("shutdown")
 def shutdown_event():
@@ -176,4 +266,11 @@ def shutdown_event():
     if resource_monitor._running:
         resource_monitor.stop()
         logger.info("Resource monitoring stopped")
+    password_hashing_pool.shutdown()
+    token_revocation_list.stop()
+    global_cache.stop_expiry()
+    local_cache.stop_expiry()
+    response_cache.stop_expiry()
+    stale_refresher.shutdown()
+    invalidation_bus.stop()
     logger.info("Application shutdown") 
\ No newline at end of file
@@ -77,41 +77,39 @@ class User(Base):
     role = Column(String, default=UserRole.USER)
     is_active = Column(Boolean, default=True)
     
+    # Связи не загружаются по умолчанию: эндпоинты явно объявляют,
+    # что нужно загрузить, через планы из app/db/load_plans.py
+    
     # Связь с заявками (пользователь может создать много заявок)
-    tickets = relationship("Ticket", foreign_keys="Ticket.creator_id", back_populates="creator", lazy="selectin")
+    tickets = relationship("Ticket", foreign_keys="Ticket.creator_id", back_populates="creator")
     
     # Связь с заявками агента (агент может обрабатывать много заявок)
     assigned_tickets = relationship("Ticket", 
                                  foreign_keys="Ticket.assigned_to_id", 
-                                 back_populates="assigned_to",
-                                 lazy="selectin")
+                                 back_populates="assigned_to")
     
     # Связь с уведомлениями
-    notifications = relationship("Notification", back_populates="user", lazy="selectin")
+    notifications = relationship("Notification", back_populates="user")
     
     # Связь с вложениями
-    attachments = relationship("Attachment", back_populates="uploaded_by_user", lazy="selectin")
+    attachments = relationship("Attachment", back_populates="uploaded_by_user")
     
     # Связь с оборудованием (созданным пользователем)
     created_equipment = relationship("Equipment", 
                                   foreign_keys="Equipment.created_by_id", 
-                                  back_populates="created_by",
-                                  lazy="selectin")
+                                  back_populates="created_by")
     
     # Связь с оборудованием (обновленным пользователем)
     updated_equipment = relationship("Equipment", 
                                   foreign_keys="Equipment.updated_by_id", 
-                                  back_populates="updated_by",
-                                  lazy="selectin")
+                                  back_populates="updated_by")
     
     # Связь с записями о техническом обслуживании
-    maintenance_records = relationship("Maintenance", back_populates="performed_by_user", lazy="selectin")
+    maintenance_records = relationship("Maintenance", back_populates="performed_by_user")
 
     __table_args__ = (
         # Убедимся, что username уникален
         UniqueConstraint('username', name='uq_users_username'),
-        # Индекс для поиска по email
-        Index('ix_users_email', 'email'),
         # Индекс для поиска по роли
         Index('ix_users_role', 'role'),
     )
@@ -133,7 +131,7 @@ class TicketCategory(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Связь с заявками
-    tickets = relationship("Ticket", back_populates="category", lazy="selectin")
+    tickets = relationship("Ticket", back_populates="category")
     
     def __repr__(self):
         return f"<TicketCategory(id={self.id}, name='{self.name}')>"
@@ -156,24 +154,24 @@ class Ticket(Base):
     
     # Внешний ключ на создателя
     creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    creator = relationship("User", foreign_keys=[creator_id], back_populates="tickets", lazy="selectin")
+    creator = relationship("User", foreign_keys=[creator_id], back_populates="tickets")
     
     # Внешний ключ на исполнителя (агента)
     assigned_to_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    assigned_to = relationship("User", foreign_keys=[assigned_to_id], back_populates="assigned_tickets", lazy="selectin")
+    assigned_to = relationship("User", foreign_keys=[assigned_to_id], back_populates="assigned_tickets")
     
     # Внешний ключ на категорию
     category_id = Column(Integer, ForeignKey("ticket_categories.id"), nullable=True)
-    category = relationship("TicketCategory", back_populates="tickets", lazy="selectin")
+    category = relationship("TicketCategory", back_populates="tickets")
     
     # Внешний ключ на оборудование
     equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=True)
     
     # Связь с вложениями
-    attachments = relationship("Attachment", back_populates="ticket", cascade="all, delete-orphan", lazy="selectin")
+    attachments = relationship("Attachment", back_populates="ticket", cascade="all, delete-orphan")
     
     # Связь с сообщениями к заявке
-    messages = relationship("TicketMessage", back_populates="ticket", cascade="all, delete-orphan", lazy="selectin")
+    messages = relationship("TicketMessage", back_populates="ticket", cascade="all, delete-orphan")
     
     # Добавляем индексы для ускорения запросов
     __table_args__ = (
@@ -329,7 +327,7 @@ class AuditLog(Base):
     
     # Внешний ключ на пользователя, выполнившего действие
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    user = relationship("User", backref="audit_logs", lazy="selectin")
+    user = relationship("User", backref="audit_logs")
 
     __table_args__ = (
         # Индекс для поиска по пользователю
@@ -340,4 +338,37 @@ class AuditLog(Base):
         Index('ix_audit_logs_action_type', 'action_type'),
         # Индекс для поиска по типу сущности и ID
         Index('ix_audit_logs_entity', 'entity_type', 'entity_id'),
-    ) 
\ No newline at end of file
+    ) 
+
+# Модель refresh-токена (хранится только ключевой хеш токена)
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String(64), nullable=False)  # HMAC-SHA256 токена в hex
+    family_id = Column(String(32), nullable=False)  # Цепочка ротаций, начатая одним входом
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)  # Время использования или отзыва
+    
+    __table_args__ = (
+        # Уникальный индекс для поиска по хешу токена
+        Index('ix_refresh_tokens_token_hash', 'token_hash', unique=True),
+        # Индекс для отзыва всей цепочки при повторном использовании токена
+        Index('ix_refresh_tokens_family_id', 'family_id'),
+        # Индекс для отзыва всех токенов пользователя
+        Index('ix_refresh_tokens_user_id', 'user_id'),
+    )
+
+
+# Модель отозванного токена доступа (запись хранится до истечения токена)
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(32), primary_key=True)  # Идентификатор токена
+    expires_at = Column(DateTime, nullable=False)  # Время истечения токена (UTC)
+    
+    __table_args__ = (
+        # Индекс для пакетной очистки истекших записей
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
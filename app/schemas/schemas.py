@@ -93,6 +93,19 @@ class UserMe(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+# Схема запроса на обновление токена доступа
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+# Схема запроса на выход: refresh-токен сессии, которую нужно завершить,
+# или all_sessions для выхода на всех устройствах
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+    all_sessions: bool = False
 
 
 # Схема данных в токене
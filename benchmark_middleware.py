@@ -0,0 +1,175 @@
+"""
+Замер накладных расходов стека middleware на один запрос.
+
+Сравнивает три варианта одного и того же приложения:
+  - bare: без middleware;
+  - legacy: прежняя реализация на BaseHTTPMiddleware (логика из истории репозитория,
+    упрощенная до того, что влияет на время: проверки путей и заголовки);
+  - asgi: текущие ASGI middleware из app.core и app.main.
+
+Запросы передаются приложению напрямую через интерфейс ASGI, без сети,
+поэтому в результате видна только стоимость самих middleware.
+
+Запуск: python benchmark_middleware.py [количество запросов]
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Добавляем текущую директорию в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.compression import GzipMiddleware
+from app.core.http_cache import HTTPCacheMiddleware
+from app.core.rate_limiter import RateLimitMiddleware, RateLimiter
+
+SMALL_BODY = {"status": "ok"}
+LARGE_BODY = {"items": [{"id": i, "name": f"Категория {i}", "description": "x" * 40} for i in range(50)]}
+CORS_ORIGINS = ["*"]
+
+
+async def small(request):
+    return JSONResponse(SMALL_BODY)
+
+
+async def large(request):
+    return JSONResponse(LARGE_BODY)
+
+
+ROUTES = [Route("/api/v1/small", small), Route("/api/v1/categories/", large)]
+
+
+class LegacyRateLimit(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.rate_limiter = RateLimiter(10 ** 9, 60)
+        self.exclude_paths = ["/docs", "/openapi.json", "/redoc", "/favicon.ico"]
+
+    async def dispatch(self, request, call_next):
+        if any(request.url.path.startswith(path) for path in self.exclude_paths):
+            return await call_next(request)
+        client_id = request.client.host if request.client else "unknown"
+        _, remaining, _ = self.rate_limiter.is_rate_limited(client_id)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(self.rate_limiter.rate_limit)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        return response
+
+
+class LegacyGzip(BaseHTTPMiddleware):
+    # Прежняя версия обращалась к response.body, которого у ответа call_next нет,
+    # и отдавала ответ несжатым; здесь воспроизводится только эта стоимость
+    async def dispatch(self, request, call_next):
+        if "gzip" not in request.headers.get("Accept-Encoding", "").lower():
+            return await call_next(request)
+        response = await call_next(request)
+        if int(response.headers.get("Content-Length", "0")) < 1000:
+            return response
+        return response
+
+
+class LegacyHTTPCache(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.exclude_paths = ["/api/v1/auth", "/api/v1/notifications", "/api/v1/users/me", "/api/v1/tickets"]
+        self.path_groups = [
+            ["/docs", "/redoc", "/static", "/favicon.ico", "/api/v1/categories"],
+            ["/api/v1/equipment", "/api/v1/tickets/categories"],
+            ["/api/v1/statistics/tickets-summary", "/api/v1/statistics/agent-performance"],
+            ["/api/v1/monitoring/system", "/api/v1/monitoring/database"],
+        ]
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET" or any(request.url.path.startswith(p) for p in self.exclude_paths):
+            return await call_next(request)
+        response = await call_next(request)
+        path = request.url.path
+        for group in self.path_groups:
+            if any(path.startswith(p) for p in group):
+                break
+        response.headers["Cache-Control"] = "public, max-age=30, stale-while-revalidate=30"
+        return response
+
+
+class LegacyDebugRequests(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        origin = request.headers.get("origin", "Unknown")
+        response = await call_next(request)
+        if request.method == "OPTIONS" or (origin and origin not in CORS_ORIGINS and "*" not in CORS_ORIGINS):
+            response.headers["Access-Control-Allow-Origin"] = origin
+        return response
+
+
+def build_apps():
+    from app.main import DebugRequestsMiddleware
+
+    http_cache_excludes = ["/api/v1/auth", "/api/v1/notifications", "/api/v1/users/me", "/api/v1/tickets"]
+    return {
+        "bare": Starlette(routes=ROUTES),
+        "legacy": Starlette(routes=ROUTES, middleware=[
+            Middleware(LegacyDebugRequests),
+            Middleware(LegacyHTTPCache),
+            Middleware(LegacyGzip),
+            Middleware(LegacyRateLimit),
+        ]),
+        "asgi": Starlette(routes=ROUTES, middleware=[
+            Middleware(DebugRequestsMiddleware, cors_origins=CORS_ORIGINS),
+            Middleware(HTTPCacheMiddleware, default_max_age=30, exclude_paths=http_cache_excludes),
+            Middleware(GzipMiddleware, minimum_size=1000, compression_level=6),
+            Middleware(RateLimitMiddleware, rate_limit=10 ** 9, time_window=60),
+        ]),
+    }
+
+
+async def run_requests(app, path: str, count: int) -> float:
+    """Выполняет count GET-запросов и возвращает среднее время на запрос в микросекундах"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"accept-encoding", b"gzip, deflate")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Прогрев
+    for _ in range(min(200, count)):
+        await app(dict(scope), receive, send)
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / count * 1_000_000
+
+
+async def main(count: int) -> None:
+    apps = build_apps()
+    for path in ("/api/v1/small", "/api/v1/categories/"):
+        results = {name: await run_requests(app, path, count) for name, app in apps.items()}
+        print(f"{path} ({count} запросов)")
+        for name, per_request in results.items():
+            overhead = per_request - results["bare"]
+            print(f"  {name:<7} {per_request:8.1f} мкс/запрос, накладные расходы {overhead:7.1f} мкс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
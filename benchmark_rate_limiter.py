@@ -0,0 +1,82 @@
+"""
+Замер стоимости проверки лимита запросов (RateLimiter.is_rate_limited).
+
+Сравнивает прежний лимитер с фиксированным окном (воспроизведен ниже
+по истории репозитория) и текущий token bucket в двух сценариях:
+  - hot: один активный клиент;
+  - many: поток запросов от множества разных клиентов, превышающего max_clients.
+
+Для каждого варианта выводится время одной проверки и размер таблицы клиентов:
+у прежней реализации она растет без ограничений до вызова clear_expired().
+Вариант shared - общий для воркеров лимитер с хранилищем во временном файле
+SQLite; клиенты получают токены пачками, поэтому к файлу обращается не каждая проверка.
+
+Запуск: python benchmark_rate_limiter.py [количество проверок]
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Tuple
+
+# Добавляем текущую директорию в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.rate_limiter import RateLimiter, SharedRateLimiter, SQLiteRateLimitStore
+
+
+class LegacyRateLimiter:
+    """Прежняя реализация: фиксированное окно, словарь без ограничения размера"""
+
+    def __init__(self, rate_limit: int, time_window: int = 60):
+        self.rate_limit = rate_limit
+        self.time_window = time_window
+        self.requests: Dict[str, Tuple[int, float]] = {}
+
+    def is_rate_limited(self, client_id: str, cost: int = 1):
+        current_time = time.time()
+        if client_id not in self.requests:
+            self.requests[client_id] = (1, current_time)
+            return False, self.rate_limit - 1, None
+        count, start_time = self.requests[client_id]
+        if current_time - start_time > self.time_window:
+            self.requests[client_id] = (1, current_time)
+            return False, self.rate_limit - 1, None
+        if count >= self.rate_limit:
+            return True, None, self.time_window - (current_time - start_time)
+        self.requests[client_id] = (count + 1, start_time)
+        return False, self.rate_limit - count - 1, None
+
+
+def run(limiter, client_ids, count: int) -> float:
+    """Выполняет count проверок и возвращает среднее время одной проверки в наносекундах"""
+    check = limiter.is_rate_limited
+    total = len(client_ids)
+    started = time.perf_counter()
+    for i in range(count):
+        check(client_ids[i % total])
+    return (time.perf_counter() - started) / count * 1_000_000_000
+
+
+def main(count: int) -> None:
+    max_clients = 10000
+    scenarios = {
+        "hot": ["10.0.0.1"],
+        "many": [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(max_clients * 5)],
+    }
+    store = SQLiteRateLimitStore(os.path.join(tempfile.mkdtemp(), "rate_limit.db"))
+    for name, client_ids in scenarios.items():
+        print(f"{name} ({count} проверок, {len(client_ids)} клиентов)")
+        limiters = {
+            "legacy": LegacyRateLimiter(300, 60),
+            "bucket": RateLimiter(300, 60, max_clients=max_clients),
+            "shared": SharedRateLimiter(store, 300, 60, max_clients=max_clients, namespace=name),
+        }
+        for limiter_name, limiter in limiters.items():
+            per_check = run(limiter, client_ids, count)
+            tracked = len(limiter._leases) if isinstance(limiter, SharedRateLimiter) else len(limiter.requests)
+            print(f"  {limiter_name:<7} {per_check:7.0f} нс/проверка, клиентов в таблице: {tracked}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
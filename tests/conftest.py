@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+import pytest
+
+# Тесты работают с отдельной временной БД; переменная должна быть задана до импорта приложения
+_db_dir = tempfile.mkdtemp(prefix="ticket-system-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db.database import SessionLocal
+from app.db.init_db import init_db
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Клиент приложения с инициализированной БД (администратор admin/admin)"""
+    db = SessionLocal()
+    try:
+        init_db(db)
+    finally:
+        db.close()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def login(client):
+    """Возвращает функцию входа, отдающую ответ /auth/token (access_token и refresh_token)"""
+    def _login(username: str = "admin", password: str = "admin") -> dict:
+        response = client.post(
+            "/api/v1/auth/token",
+            data={"username": username, "password": password}
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+    return _login
+
+
+def auth_headers(access_token: str) -> dict:
+    return {"Authorization": f"Bearer {access_token}"}
@@ -0,0 +1,83 @@
+from datetime import datetime, UTC
+
+from app.core.cache_tags import apply_remote_invalidation
+from app.core.security import decode_access_token
+from app.core.token_revocation import revoked_token_tag
+from app.db.database import SessionLocal
+from app.models.models import RevokedToken
+from tests.conftest import auth_headers
+
+
+def test_refresh_rejected_after_logout_with_refresh_token(client, login):
+    tokens = login()
+
+    response = client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers=auth_headers(tokens["access_token"])
+    )
+    assert response.status_code == 200
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_logout_without_refresh_token_revokes_all_sessions(client, login):
+    first = login()
+    second = login()
+
+    response = client.post("/api/v1/auth/logout", headers=auth_headers(first["access_token"]))
+    assert response.status_code == 200
+
+    for tokens in (first, second):
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 401
+
+
+def test_logout_keeps_other_sessions(client, login):
+    current = login()
+    other = login()
+
+    response = client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": current["refresh_token"]},
+        headers=auth_headers(current["access_token"])
+    )
+    assert response.status_code == 200
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": other["refresh_token"]})
+    assert response.status_code == 200
+
+
+def test_logout_all_sessions(client, login):
+    current = login()
+    other = login()
+
+    response = client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": current["refresh_token"], "all_sessions": True},
+        headers=auth_headers(current["access_token"])
+    )
+    assert response.status_code == 200
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": other["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_token_revoked_on_other_worker_is_rejected(client, login):
+    tokens = login()
+    headers = auth_headers(tokens["access_token"])
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+    # Другой воркер записал отзыв в БД, но фильтр этого процесса о нем не знает
+    payload = decode_access_token(tokens["access_token"])
+    db = SessionLocal()
+    try:
+        db.add(RevokedToken(jti=payload["jti"], expires_at=datetime.fromtimestamp(payload["exp"], UTC).replace(tzinfo=None)))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+    apply_remote_invalidation([revoked_token_tag(payload["jti"])])
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 401
@@ -0,0 +1,46 @@
+import threading
+
+import anyio
+
+from app.core import cache as cache_module
+from app.core.cache import SQLiteCacheBackend, cache_result
+
+
+class RecordingSQLiteCache(SQLiteCacheBackend):
+    """Запоминает потоки, в которых выполнялись обращения к хранилищу"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, key, default=None):
+        self.threads.append(threading.get_ident())
+        return super().get(key, default)
+
+    def set(self, key, value, ttl=None, tags=()):
+        self.threads.append(threading.get_ident())
+        super().set(key, value, ttl, tags)
+
+
+def test_async_cache_result_keeps_shared_backend_off_event_loop(tmp_path, monkeypatch):
+    backend = RecordingSQLiteCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(cache_module, "global_cache", backend)
+    calls = []
+
+    @cache_result(prefix="test_offload", ttl=60)
+    async def compute(value: int):
+        calls.append(value)
+        return value * 2
+
+    async def run():
+        loop_thread = threading.get_ident()
+        results = [await compute(21), await compute(21)]
+        return loop_thread, results
+
+    loop_thread, results = anyio.run(run)
+
+    assert results == [42, 42]
+    assert calls == [21]
+    # get (промах), set и get (попадание)
+    assert len(backend.threads) == 3
+    assert loop_thread not in backend.threads
@@ -0,0 +1,52 @@
+from sqlalchemy import update
+
+from app.core.cache_tags import apply_remote_invalidation, reset_local_caches, user_tag
+from app.core.principal_cache import principal_cache
+from app.db.database import SessionLocal
+from app.models.models import User
+from tests.conftest import auth_headers
+
+
+def _create_user(client, login, username):
+    admin_headers = auth_headers(login()["access_token"])
+    response = client.post(
+        "/api/v1/users/",
+        json={"username": username, "password": "password123", "role": "user"},
+        headers=admin_headers
+    )
+    assert response.status_code == 201, response.text
+    user_id = response.json()["id"]
+    headers = auth_headers(login(username, "password123")["access_token"])
+    return user_id, headers
+
+
+def _deactivate_elsewhere(user_id):
+    """Деактивирует пользователя в БД, как это сделал бы другой воркер"""
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.id == user_id).values(is_active=False))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_remote_user_tag_evicts_principal(client, login):
+    user_id, headers = _create_user(client, login, "remote_evict")
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+    _deactivate_elsewhere(user_id)
+    # Снимок из кэша этого воркера еще действует
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+    apply_remote_invalidation([user_tag(user_id)])
+    assert principal_cache.get("remote_evict") is None
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 400
+
+
+def test_lost_messages_reset_principals(client, login):
+    user_id, headers = _create_user(client, login, "remote_reset")
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+    _deactivate_elsewhere(user_id)
+    reset_local_caches()
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 400
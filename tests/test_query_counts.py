@@ -0,0 +1,88 @@
+"""
+Количество SQL-запросов на основных эндпоинтах.
+
+Числа зафиксированы явно: появление лишнего запроса (ленивая загрузка связи,
+N+1 в цикле по заявкам) должно ломать тест. Кэши результатов и пользователей
+очищаются перед каждым запросом, поэтому учитывается и проверка пользователя.
+"""
+import pytest
+from sqlalchemy import event
+
+from app.core.cache import global_cache, local_cache
+from app.core.principal_cache import principal_cache
+from app.core.response_cache import response_cache
+from app.db.async_database import async_engine
+from app.db.database import engine
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def statements():
+    """Список SQL-запросов синхронного и асинхронного движков"""
+    executed = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", count_statement)
+    yield executed
+    for target in engines:
+        event.remove(target, "before_cursor_execute", count_statement)
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    response = client.post("/api/v1/auth/token", data={"username": "admin", "password": "admin"})
+    headers = auth_headers(response.json()["access_token"])
+    # Несколько заявок, чтобы списки были непустыми
+    for number in range(3):
+        response = client.post(
+            "/api/v1/tickets/",
+            json={"title": f"Заявка {number}", "description": "Проверка", "room_number": "101"},
+            headers=headers
+        )
+        assert response.status_code == 201, response.text
+    return headers
+
+
+@pytest.fixture(scope="module")
+def ticket_id(client, headers):
+    return client.get("/api/v1/tickets/", headers=headers).json()[0]["id"]
+
+
+def _count(client, statements, path, headers, cold=True):
+    """Выполняет GET-запрос и возвращает количество SQL-запросов"""
+    if cold:
+        global_cache.clear()
+        local_cache.clear()
+        response_cache.clear()
+        principal_cache.clear()
+    statements.clear()
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+# Пользователь + заявки без связей
+@pytest.mark.parametrize("path", ["/api/v1/tickets/", "/api/v1/async-tickets/async"])
+def test_ticket_list(client, statements, headers, path):
+    assert _count(client, statements, path, headers) == 2
+
+
+# Пользователь + заявка
+@pytest.mark.parametrize("path", ["/api/v1/tickets/{}", "/api/v1/async-tickets/async/{}"])
+def test_ticket_detail(client, statements, headers, ticket_id, path):
+    assert _count(client, statements, path.format(ticket_id), headers) == 2
+
+
+# Пользователь + список пользователей
+def test_user_list(client, statements, headers):
+    assert _count(client, statements, "/api/v1/users/", headers) == 2
+
+
+# Один запрос пользователя, повторная проверка токена обслуживается из кэша
+def test_auth_principal(client, statements, headers):
+    assert _count(client, statements, "/api/v1/users/me/", headers) == 1
+    assert _count(client, statements, "/api/v1/users/me/", headers, cold=False) == 0
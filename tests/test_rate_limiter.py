@@ -0,0 +1,39 @@
+import anyio
+
+from app.core.rate_limiter import SharedRateLimiter, SQLiteRateLimitStore
+
+
+def _limiters(tmp_path, rate_limit):
+    store = SQLiteRateLimitStore(str(tmp_path / "rate_limit.db"))
+    # Корзина пополняется за час, поэтому за время теста новых токенов не появляется
+    return [
+        SharedRateLimiter(store, rate_limit, time_window=3600, lease_size=4, lease_ttl=60)
+        for _ in range(2)
+    ]
+
+
+def test_shared_limit_is_combined_across_limiters(tmp_path):
+    limiters = _limiters(tmp_path, rate_limit=10)
+
+    allowed = 0
+    for _ in range(30):
+        for limiter in limiters:
+            is_limited, _, _ = limiter.is_rate_limited("127.0.0.1")
+            allowed += not is_limited
+
+    assert allowed == 10
+    assert all(limiter.store_calls > 0 for limiter in limiters)
+
+
+def test_shared_limit_async_path(tmp_path):
+    limiters = _limiters(tmp_path, rate_limit=10)
+
+    async def run():
+        allowed = 0
+        for _ in range(30):
+            for limiter in limiters:
+                is_limited, _, _ = await limiter.is_rate_limited_async("127.0.0.1")
+                allowed += not is_limited
+        return allowed
+
+    assert anyio.run(run) == 10
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+from app.core.response_cache import ResponseCacheMiddleware
+from app.main import app
+
+_CHECK = (
+    "from app.core.response_cache import ResponseCacheMiddleware; from app.main import app; "
+    "print(any(m.cls is ResponseCacheMiddleware for m in app.user_middleware))"
+)
+
+
+def test_response_cache_enabled_by_default():
+    assert any(middleware.cls is ResponseCacheMiddleware for middleware in app.user_middleware)
+
+
+def test_response_cache_can_be_disabled(tmp_path):
+    # Middleware регистрируется при импорте приложения, поэтому проверяем в отдельном процессе
+    env = dict(os.environ, RESPONSE_CACHE_ENABLED="false", DATABASE_URL=f"sqlite:///{tmp_path / 'test.db'}")
+    result = subprocess.run(
+        [sys.executable, "-c", _CHECK],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == "False"
@@ -0,0 +1,34 @@
+import pytest
+
+from app.core import cache_tags
+from tests.conftest import auth_headers
+
+
+@pytest.fixture
+def headers(login):
+    return auth_headers(login()["access_token"])
+
+
+def test_ticket_list_revalidated_from_versions(client, headers):
+    response = client.get("/api/v1/tickets/", headers=headers)
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/v1/tickets/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post(
+        "/api/v1/tickets/",
+        json={"title": "Принтер", "description": "Не печатает", "room_number": "101"},
+        headers=headers
+    )
+    response = client.get("/api/v1/tickets/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_no_version_etag_for_workers_without_bus(client, headers, monkeypatch):
+    monkeypatch.setattr(cache_tags, "TAG_VERSIONS_COHERENT", False)
+
+    response = client.get("/api/v1/tickets/", headers=headers)
+    assert response.status_code == 200
+    # Остается только сильный ETag по телу ответа, который строит HTTPCacheMiddleware
+    assert not response.headers["ETag"].startswith("W/")
@@ -62,6 +62,26 @@ api.interceptors.request.use(
   }
 );
 
+// Один общий запрос обновления токена на все параллельные запросы с ошибкой 401:
+// refresh-токен одноразовый, повторное использование отзывает всю сессию
+let refreshPromise = null;
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refresh_token');
+    refreshPromise = axios.post(`${baseURL}/auth/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Добавим интерцептор для обработки ошибок ответа
 api.interceptors.response.use(
   (response) => {
@@ -71,10 +91,27 @@ api.interceptors.response.use(
     }
     return response;
   },
-  (error) => {
+  async (error) => {
     // Логируем ошибки для отладки
     console.error('API Error:', error.response?.status, error.response?.data);
     
+    // Если токен доступа истек, пробуем один раз обновить его по refresh-токену
+    const originalConfig = error.config;
+    if (
+      error.response && error.response.status === 401 &&
+      originalConfig && !originalConfig._retry &&
+      localStorage.getItem('refresh_token')
+    ) {
+      originalConfig._retry = true;
+      try {
+        const accessToken = await refreshAccessToken();
+        originalConfig.headers.Authorization = `Bearer ${accessToken}`;
+        return api(originalConfig);
+      } catch (refreshError) {
+        console.error('Token refresh failed:', refreshError.response?.status);
+      }
+    }
+    
     // Если получаем 401 Unauthorized, значит токен истек или недействителен
     if (error.response && error.response.status === 401) {
       console.error('Unauthorized access detected, clearing token');
@@ -109,6 +146,7 @@ const authBaseURL = 'http://localhost:8000';
 export const clearAuthData = () => {
   // Очищаем localStorage
   localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
   localStorage.removeItem('auth_retry_count');
   
   // Очищаем sessionStorage, относящийся к авторизации
@@ -150,8 +188,20 @@ export const authAPI = {
     });
   },
   
+  // Завершает только текущую сессию: сервер отзывает цепочку переданного refresh-токена
   logout: () => {
-    return api.post('/auth/logout', {});
+    return api.post('/auth/logout', { refresh_token: localStorage.getItem('refresh_token') })
+      .finally(() => {
+        localStorage.removeItem('refresh_token');
+      });
+  },
+
+  // Выход на всех устройствах: сервер отзывает все refresh-токены пользователя
+  logoutAll: () => {
+    return api.post('/auth/logout', { all_sessions: true })
+      .finally(() => {
+        localStorage.removeItem('refresh_token');
+      });
   },
   // В данном API регистрация не предусмотрена через отдельный метод
 };
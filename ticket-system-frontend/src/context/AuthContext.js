@@ -101,12 +101,15 @@ export const AuthProvider = ({ children }) => {
       
       // Получаем токен
       const response = await authAPI.login(userData);
-      const { access_token } = response.data;
+      const { access_token, refresh_token } = response.data;
       
       console.log('Token received successfully');
       
-      // Сохраняем токен
+      // Сохраняем токен доступа и refresh-токен
       localStorage.setItem('token', access_token);
+      if (refresh_token) {
+        localStorage.setItem('refresh_token', refresh_token);
+      }
       
       try {
         console.log('Fetching user data with token');
@@ -191,11 +194,12 @@ export const AuthProvider = ({ children }) => {
     }
   };
 
-  const logout = async () => {
+  // everywhere = true завершает сессии пользователя на всех устройствах
+  const logout = async (everywhere = false) => {
     try {
       // Вызываем API для логирования выхода, если есть токен
       if (localStorage.getItem('token')) {
-        await authAPI.logout();
+        await (everywhere === true ? authAPI.logoutAll() : authAPI.logout());
       }
     } catch (error) {
       console.error('Ошибка при выходе из системы:', error);